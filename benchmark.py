@@ -0,0 +1,406 @@
+# Course: CS261 - Data Structures
+# Assignment: 6
+# Description:  This program contains a reproducible benchmark harness for the
+#               HashMap implementations. It measures throughput and latency
+#               percentiles of the main operations for a grid of map types,
+#               hash functions, key distributions and sizes, and writes the
+#               results as JSON so two runs can be compared for regressions.
+#
+#               python benchmark.py --sizes 1000,100000 --out new.json
+#               python benchmark.py --compare old.json new.json
+#               python benchmark.py --threads 1,2,4,8 --sizes 100000
+
+
+import argparse
+import bisect
+import itertools
+import json
+import platform
+import random
+import sys
+import threading
+import time
+from array import array
+
+import hash_map_concurrent
+import hash_map_oa
+import hash_map_oa_flat
+import hash_map_sc
+import hash_map_sc_pool
+from a6_include import DynamicArray
+
+
+MAPS = {
+    'sc': hash_map_sc.HashMap,
+    'sc_pool': hash_map_sc_pool.HashMap,
+    'oa': hash_map_oa.HashMap,
+    'oa_flat': hash_map_oa_flat.HashMap,
+    'robin_hood': hash_map_oa.RobinHoodHashMap,
+}
+
+DISTRIBUTIONS = ('uniform', 'zipf', 'anagrams')
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+# ------------------------- Workloads ----------------------------------- #
+
+def make_keys(distribution: str, size: int, rng: random.Random) -> list:
+    """
+    Returns a list of size distinct keys for the given distribution. Anagram
+    keys are permutations of the same letters, so every one of them collides
+    under hash_function_1.
+    """
+    if distribution == 'anagrams':
+        letters = 'abcdefghijklm'
+        length = 1
+        while _factorial(length) < size:
+            length += 1
+        return [''.join(p) for p in
+                itertools.islice(itertools.permutations(letters[:length]), size)]
+
+    keys = ['key' + str(i) for i in rng.sample(range(size * 10), size)]
+    return keys
+
+
+def _factorial(n: int) -> int:
+    """Return n factorial."""
+    result = 1
+    for i in range(2, n + 1):
+        result *= i
+    return result
+
+
+def make_accesses(distribution: str, keys: list, count: int,
+                  rng: random.Random) -> list:
+    """
+    Returns count keys drawn from keys. Zipf accesses favour a few hot keys
+    (exponent 1), all other distributions draw uniformly.
+    """
+    if distribution == 'zipf':
+        cumulative = list(itertools.accumulate(1 / rank for rank in
+                                               range(1, len(keys) + 1)))
+        total = cumulative[-1]
+        return [keys[min(bisect.bisect(cumulative, rng.random() * total),
+                         len(keys) - 1)] for _ in range(count)]
+    return [keys[rng.randrange(len(keys))] for _ in range(count)]
+
+
+# ------------------------- Measurement --------------------------------- #
+
+def _summarize(latencies: array, elapsed: float) -> dict:
+    """Return throughput and latency percentiles for one operation."""
+    ordered = sorted(latencies)
+    count = len(ordered)
+    result = {
+        'ops': count,
+        'seconds': elapsed,
+        'ops_per_sec': count / elapsed if elapsed else 0.0,
+    }
+    for percentile in PERCENTILES:
+        index = min(count - 1, int(count * percentile / 100))
+        result[f'p{percentile}_ns'] = ordered[index]
+    result['max_ns'] = ordered[-1]
+    return result
+
+
+def _time_each(function, arguments: list) -> array:
+    """Call function once per argument and return each call's latency in ns."""
+    timer = time.perf_counter_ns
+    latencies = array('Q')
+    record = latencies.append
+    for argument in arguments:
+        start = timer()
+        function(argument)
+        record(timer() - start)
+    return latencies
+
+
+def _time_all(function, arguments: list) -> float:
+    """Call function once per argument and return the total time in seconds."""
+    start = time.perf_counter()
+    for argument in arguments:
+        function(argument)
+    return time.perf_counter() - start
+
+
+def _time_once(function, *arguments) -> dict:
+    """Time a single whole-table operation."""
+    start = time.perf_counter()
+    function(*arguments)
+    elapsed = time.perf_counter() - start
+    return {'ops': 1, 'seconds': elapsed,
+            'ops_per_sec': 1 / elapsed if elapsed else 0.0}
+
+
+def bench_map(map_name: str, hash_name: str, distribution: str,
+              size: int, seed: int) -> dict:
+    """
+    Benchmarks one map type with one hash function and key distribution.
+    Throughput comes from an uninstrumented pass and latency percentiles from
+    a second pass that times every call, so timer overhead does not skew the
+    throughput numbers.
+
+    :return:    dictionary of operation name to measurements
+    """
+    rng = random.Random(seed)
+    map_class = MAPS[map_name]
+    keys = make_keys(distribution, size, rng)
+    misses = ['miss' + key for key in keys]
+    accesses = make_accesses(distribution, keys, size, rng)
+    results = {}
+
+    def put_pair(key):
+        hash_map.put(key, key)
+
+    # put: throughput on one fresh map, latencies on another
+    hash_map = map_class(11, hash_name)
+    elapsed = _time_all(put_pair, keys)
+    hash_map = map_class(11, hash_name)
+    results['put'] = _summarize(_time_each(put_pair, keys), elapsed)
+
+    results['get_hit'] = _summarize(_time_each(hash_map.get, accesses),
+                                    _time_all(hash_map.get, accesses))
+    results['get_miss'] = _summarize(_time_each(hash_map.get, misses),
+                                     _time_all(hash_map.get, misses))
+    results['get_keys_and_values'] = _time_once(hash_map.get_keys_and_values)
+    results['resize_table'] = _time_once(hash_map.resize_table,
+                                         hash_map.get_capacity() * 2)
+
+    # remove: throughput and latencies each empty a copy of the map
+    removals = keys[:]
+    rng.shuffle(removals)
+    latencies = _time_each(hash_map.remove, removals)
+    hash_map = map_class(11, hash_name)
+    for key in keys:
+        hash_map.put(key, key)
+    results['remove'] = _summarize(latencies,
+                                   _time_all(hash_map.remove, removals))
+
+    if map_name == 'sc':
+        values = DynamicArray(accesses)
+        results['find_mode'] = _time_once(hash_map_sc.find_mode, values)
+
+    return results
+
+
+def run(maps: list, hash_names: list, distributions: list, sizes: list,
+        seed: int, log=sys.stderr) -> dict:
+    """
+    Runs the benchmark grid and returns the results together with enough
+    metadata to tell runs apart.
+    """
+    results = []
+    for size, distribution, hash_name, map_name in itertools.product(
+            sizes, distributions, hash_names, maps):
+        print(f"{map_name:<11}{hash_name:<17}{distribution:<10}{size:>10}",
+              file=log, flush=True)
+        results.append({
+            'map': map_name,
+            'hash': hash_name,
+            'distribution': distribution,
+            'size': size,
+            'operations': bench_map(map_name, hash_name, distribution,
+                                    size, seed),
+        })
+
+    return {'meta': _meta(seed), 'results': results}
+
+
+def _meta(seed: int) -> dict:
+    """Return metadata identifying the interpreter and run."""
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'gil_enabled': getattr(sys, '_is_gil_enabled', lambda: True)(),
+        'seed': seed,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+# ------------------------- Thread scaling ------------------------------ #
+
+def _locked_operations(hash_map) -> tuple:
+    """Return get and put functions that serialize hash_map behind one lock."""
+    lock = threading.Lock()
+
+    def get(key):
+        with lock:
+            return hash_map.get(key)
+
+    def put(key, value):
+        with lock:
+            hash_map.put(key, value)
+
+    return get, put
+
+
+def bench_threads(thread_counts: list, size: int, hash_name: str,
+                  seed: int, writes: float = 0.1) -> list:
+    """
+    Measures the throughput of a mixed workload (gets of existing keys, with
+    the given fraction of puts) split evenly over each number of threads,
+    for the ConcurrentHashMap and for a chaining HashMap behind one global
+    lock. Each measurement does size operations in total on a map that
+    already holds size keys.
+
+    :return:    list of measurements, one per map and thread count
+    """
+    rng = random.Random(seed)
+    keys = make_keys('uniform', size, rng)
+    operations = [(key, rng.random() < writes)
+                  for key in make_accesses('zipf', keys, size, rng)]
+
+    results = []
+    for map_name in ('sc_locked', 'concurrent'):
+        single = None
+        for threads in thread_counts:
+            if map_name == 'concurrent':
+                hash_map = hash_map_concurrent.ConcurrentHashMap(
+                    11, hash_name, expected_size=size)
+                get, put = hash_map.get, hash_map.put
+            else:
+                hash_map = hash_map_sc.HashMap(11, hash_name,
+                                               expected_size=size)
+                get, put = _locked_operations(hash_map)
+            for key in keys:
+                put(key, key)
+
+            # Every thread starts on the barrier together with the timer
+            barrier = threading.Barrier(threads + 1)
+
+            def work(share):
+                barrier.wait()
+                for key, write in share:
+                    if write:
+                        put(key, key)
+                    else:
+                        get(key)
+
+            workers = [threading.Thread(target=work,
+                                        args=(operations[n::threads],))
+                       for n in range(threads)]
+            for worker in workers:
+                worker.start()
+            barrier.wait()
+            start = time.perf_counter()
+            for worker in workers:
+                worker.join()
+            elapsed = time.perf_counter() - start
+
+            ops_per_sec = len(operations) / elapsed if elapsed else 0.0
+            if single is None:
+                single = ops_per_sec
+            results.append({
+                'map': map_name,
+                'threads': threads,
+                'ops': len(operations),
+                'seconds': elapsed,
+                'ops_per_sec': ops_per_sec,
+                'speedup': ops_per_sec / single if single else 0.0,
+            })
+    return results
+
+
+def compare(old: dict, new: dict, threshold: float) -> list:
+    """
+    Compares the throughput of matching benchmarks of two runs. Two thread
+    scaling runs are compared by map, thread count and size, as a 'mixed'
+    operation, and only if both ran with the GIL or both without it.
+
+    :return:    list of (benchmark name, operation, old ops/sec, new ops/sec,
+                relative change) for every operation that got slower by more
+                than the threshold fraction
+    """
+    if ('threads' in old) != ('threads' in new):
+        raise ValueError("Cannot compare a thread scaling run with a "
+                         "benchmark grid run")
+    if 'threads' in new and (old['meta'].get('gil_enabled')
+                             != new['meta'].get('gil_enabled')):
+        raise ValueError("Cannot compare thread scaling runs with and "
+                         "without the GIL")
+
+    def index(run_results):
+        if 'threads' in run_results:
+            return {(r['map'], r['threads'], r['size']):
+                    {'operations': {'mixed': r}}
+                    for r in run_results['threads']}
+        return {(r['map'], r['hash'], r['distribution'], r['size']): r
+                for r in run_results['results']}
+
+    old_index = index(old)
+    regressions = []
+    for name, result in index(new).items():
+        if name not in old_index:
+            continue
+        for operation, measured in result['operations'].items():
+            before = old_index[name]['operations'].get(operation)
+            if not before or not before['ops_per_sec']:
+                continue
+            change = measured['ops_per_sec'] / before['ops_per_sec'] - 1
+            if change < -threshold:
+                regressions.append(('/'.join(map(str, name)), operation,
+                                    before['ops_per_sec'],
+                                    measured['ops_per_sec'], change))
+    return regressions
+
+
+def main(argv: list = None) -> int:
+    """Command line entry point, returns the process exit status."""
+    parser = argparse.ArgumentParser(
+        description='Benchmark the HashMap implementations.')
+    parser.add_argument('--maps', default=','.join(MAPS))
+    parser.add_argument('--hash', default='hash_function_1,hash_function_2')
+    parser.add_argument('--dist', default=','.join(DISTRIBUTIONS))
+    parser.add_argument('--sizes', default='1000,10000',
+                        help='comma separated, e.g. 1000,100000,10000000')
+    parser.add_argument('--seed', type=int, default=261)
+    parser.add_argument('--out', help='write JSON results to this file')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'),
+                        help='compare two result files instead of running')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='slowdown fraction reported as a regression')
+    parser.add_argument('--threads',
+                        help='comma separated thread counts, runs the thread '
+                             'scaling benchmark for each size instead')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0]) as old_file, open(args.compare[1]) as new_file:
+            try:
+                regressions = compare(json.load(old_file), json.load(new_file),
+                                      args.threshold)
+            except ValueError as error:
+                parser.error(str(error))
+        for name, operation, before, after, change in regressions:
+            print(f"{name:<50}{operation:<22}{before:>14.0f}{after:>14.0f}"
+                  f"{change:>+9.1%}")
+        return 1 if regressions else 0
+
+    sizes = [int(float(size)) for size in args.sizes.split(',')]
+    if args.threads:
+        thread_counts = [int(count) for count in args.threads.split(',')]
+        hash_name = args.hash.split(',')[0]
+        results = {'meta': _meta(args.seed), 'threads': []}
+        for size in sizes:
+            for result in bench_threads(thread_counts, size, hash_name,
+                                        args.seed):
+                print(f"{result['map']:<12}{result['threads']:>4}{size:>10}"
+                      f"{result['ops_per_sec']:>14.0f}{result['speedup']:>8.2f}",
+                      file=sys.stderr, flush=True)
+                results['threads'].append(dict(result, size=size))
+    else:
+        results = run(args.maps.split(','), args.hash.split(','),
+                      args.dist.split(','), sizes, args.seed)
+    output = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, 'w') as out_file:
+            out_file.write(output)
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
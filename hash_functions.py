@@ -0,0 +1,506 @@
+# Course: CS261 - Data Structures
+# Assignment: 6
+# Description:  This program contains additional hash functions for use with
+#               the HashMap implementations, along with a registry so a hash
+#               function can be chosen by name when constructing a HashMap.
+#               The two sample hash functions from a6_include are registered
+#               as well. Running this file prints a distribution quality
+#               report comparing all registered hash functions.
+#               hash_many and hash_indices hash whole batches of keys, using
+#               NumPy for the two sample hash functions when it is installed.
+
+
+import itertools
+import os
+import struct
+import time
+
+from a6_include import hash_function_1, hash_function_2
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+_MASK = (1 << 64) - 1
+
+# FNV-1a 64 bit parameters
+_FNV_OFFSET = 0xcbf29ce484222325
+_FNV_PRIME = 0x100000001b3
+
+# xxHash64 primes
+_P1 = 11400714785074694791
+_P2 = 14029467366897019727
+_P3 = 1609587929392839161
+_P4 = 9650029242287828579
+_P5 = 2870177450012600261
+
+# Multiplier used to mix the built-in hash, 2**64 divided by the golden ratio
+_GOLDEN = 0x9e3779b97f4a7c15
+
+# Keys hashed per NumPy chunk, and the most code points a chunk may take.
+# Every key of a chunk is padded to its longest key, so chunks with long keys
+# are split further to hold at most this many keys times that length
+_BATCH = 1 << 16
+_VECTOR_ELEMENTS = 1 << 21
+
+# Longest key the vectorized sample hash functions accept, which keeps
+# hash_function_2 well inside 64 bits; longer keys are hashed one at a time
+_MAX_VECTOR_LENGTH = 1 << 16
+
+
+def _to_bytes(key) -> bytes:
+    """Return the bytes a byte oriented hash function should consume for key."""
+    if isinstance(key, str):
+        return key.encode('utf-8')
+    if isinstance(key, (bytes, bytearray, memoryview)):
+        return bytes(key)
+    return str(key).encode('utf-8')
+
+
+def _rotl(value: int, bits: int) -> int:
+    """Rotate a 64 bit value left by the given number of bits."""
+    return ((value << bits) | (value >> (64 - bits))) & _MASK
+
+
+# ------------------------- Hash functions ------------------------------ #
+
+def make_builtin_hash(seed: int = 0) -> callable:
+    """
+    Returns a hash function that wraps the built-in hash() and mixes in the
+    given seed. String and bytes hashes are already randomized per process
+    by the interpreter, the seed additionally separates tables from each other.
+    """
+    seed &= _MASK
+
+    def builtin_hash(key) -> int:
+        hash_value = ((hash(key) ^ seed) * _GOLDEN) & _MASK
+        return hash_value ^ (hash_value >> 32)
+
+    return builtin_hash
+
+
+builtin_hash = make_builtin_hash()
+
+
+def fnv1a_hash(key) -> int:
+    """64 bit FNV-1a hash of the key's bytes."""
+    hash_value = _FNV_OFFSET
+    for byte in _to_bytes(key):
+        hash_value = ((hash_value ^ byte) * _FNV_PRIME) & _MASK
+    return hash_value
+
+
+def _xxh64_round(acc: int, lane: int) -> int:
+    """Single xxHash64 accumulator round."""
+    acc = (acc + lane * _P2) & _MASK
+    return (_rotl(acc, 31) * _P1) & _MASK
+
+
+def _xxh64_merge(acc: int, lane: int) -> int:
+    """Merge one accumulator into the xxHash64 state."""
+    acc ^= _xxh64_round(0, lane)
+    return (acc * _P1 + _P4) & _MASK
+
+
+def xxh64(data: bytes, seed: int = 0) -> int:
+    """
+    xxHash64 of the given bytes. Consumes input eight bytes at a time, which
+    keeps the per key Python loop much shorter than a byte at a time hash.
+    """
+    length = len(data)
+    index = 0
+
+    if length >= 32:
+        v1 = (seed + _P1 + _P2) & _MASK
+        v2 = (seed + _P2) & _MASK
+        v3 = seed & _MASK
+        v4 = (seed - _P1) & _MASK
+        for lane1, lane2, lane3, lane4 in struct.iter_unpack(
+                '<4Q', data[:length - length % 32]):
+            v1 = _xxh64_round(v1, lane1)
+            v2 = _xxh64_round(v2, lane2)
+            v3 = _xxh64_round(v3, lane3)
+            v4 = _xxh64_round(v4, lane4)
+        index = length - length % 32
+
+        hash_value = (_rotl(v1, 1) + _rotl(v2, 7)
+                      + _rotl(v3, 12) + _rotl(v4, 18)) & _MASK
+        for lane in (v1, v2, v3, v4):
+            hash_value = _xxh64_merge(hash_value, lane)
+    else:
+        hash_value = (seed + _P5) & _MASK
+
+    hash_value = (hash_value + length) & _MASK
+
+    while index + 8 <= length:
+        lane = struct.unpack_from('<Q', data, index)[0]
+        hash_value ^= _xxh64_round(0, lane)
+        hash_value = (_rotl(hash_value, 27) * _P1 + _P4) & _MASK
+        index += 8
+
+    if index + 4 <= length:
+        lane = struct.unpack_from('<I', data, index)[0]
+        hash_value ^= (lane * _P1) & _MASK
+        hash_value = (_rotl(hash_value, 23) * _P2 + _P3) & _MASK
+        index += 4
+
+    while index < length:
+        hash_value ^= (data[index] * _P5) & _MASK
+        hash_value = (_rotl(hash_value, 11) * _P1) & _MASK
+        index += 1
+
+    # Final avalanche
+    hash_value ^= hash_value >> 33
+    hash_value = (hash_value * _P2) & _MASK
+    hash_value ^= hash_value >> 29
+    hash_value = (hash_value * _P3) & _MASK
+    return hash_value ^ (hash_value >> 32)
+
+
+def xxh64_hash(key) -> int:
+    """xxHash64 of the key's bytes, using the xxhash package when installed."""
+    if xxhash is not None:
+        return xxhash.xxh64_intdigest(_to_bytes(key))
+    return xxh64(_to_bytes(key))
+
+
+def siphash24(key: bytes, data: bytes) -> int:
+    """SipHash-2-4 of the given bytes under a 16 byte key."""
+    k0, k1 = struct.unpack('<2Q', key)
+    v0 = k0 ^ 0x736f6d6570736575
+    v1 = k1 ^ 0x646f72616e646f6d
+    v2 = k0 ^ 0x6c7967656e657261
+    v3 = k1 ^ 0x7465646279746573
+
+    # Pad the final block with the message length in its top byte
+    length = len(data)
+    tail = length % 8
+    last = ((length & 0xff) << 56) | int.from_bytes(data[length - tail:], 'little')
+    blocks = list(struct.unpack('<%dQ' % (length // 8), data[:length - tail]))
+    blocks.append(last)
+
+    for block in blocks:
+        v3 ^= block
+        for _ in range(2):
+            v0 = (v0 + v1) & _MASK
+            v1 = _rotl(v1, 13) ^ v0
+            v0 = _rotl(v0, 32)
+            v2 = (v2 + v3) & _MASK
+            v3 = _rotl(v3, 16) ^ v2
+            v0 = (v0 + v3) & _MASK
+            v3 = _rotl(v3, 21) ^ v0
+            v2 = (v2 + v1) & _MASK
+            v1 = _rotl(v1, 17) ^ v2
+            v2 = _rotl(v2, 32)
+        v0 ^= block
+
+    v2 ^= 0xff
+    for _ in range(4):
+        v0 = (v0 + v1) & _MASK
+        v1 = _rotl(v1, 13) ^ v0
+        v0 = _rotl(v0, 32)
+        v2 = (v2 + v3) & _MASK
+        v3 = _rotl(v3, 16) ^ v2
+        v0 = (v0 + v3) & _MASK
+        v3 = _rotl(v3, 21) ^ v0
+        v2 = (v2 + v1) & _MASK
+        v1 = _rotl(v1, 17) ^ v2
+        v2 = _rotl(v2, 32)
+
+    return v0 ^ v1 ^ v2 ^ v3
+
+
+def make_siphash(key: bytes = None) -> callable:
+    """
+    Returns a SipHash-2-4 hash function keyed with the given 16 bytes, or with
+    a random key when none is given. Use it for keys that come from untrusted
+    input, since collisions cannot be precomputed without knowing the key.
+    """
+    if key is None:
+        key = os.urandom(16)
+    if len(key) != 16:
+        raise ValueError("SipHash key must be 16 bytes")
+
+    def siphash(map_key) -> int:
+        return siphash24(key, _to_bytes(map_key))
+
+    return siphash
+
+
+def make_mixed_hash(function) -> callable:
+    """
+    Returns a hash function that mixes the result of the given one so that its
+    low bits depend on all of its bits. Tables with a power of two capacity
+    pick a bucket from the low bits alone, which the sample hash functions
+    leave poorly spread.
+    """
+    function = get_hash_function(function)
+
+    def mixed_hash(key) -> int:
+        hash_value = (function(key) * _GOLDEN) & _MASK
+        return hash_value ^ (hash_value >> 32)
+
+    # The wrapped function, so saved tables can record which one it was
+    mixed_hash.function = function
+    return mixed_hash
+
+
+def displacement_hashes(hash_value: int, salt: int = 0) -> (int, int):
+    """
+    Returns the two 32 bit halves of the mixed hash that a perfect hash table
+    combines with the displacement of a key's bucket. The second is odd. A
+    table whose keys cannot all be placed is rebuilt with another salt.
+    """
+    hash_value = (((hash_value ^ salt * _P1) & _MASK) * _GOLDEN) & _MASK
+    hash_value ^= hash_value >> 29
+    return hash_value >> 32, (hash_value & 0xffffffff) | 1
+
+
+def displaced_index(hash_value: int, displacement: int, size: int,
+                    salt: int = 0) -> int:
+    """
+    Returns the slot, out of size slots, of a key with the given hash whose
+    bucket has the given displacement d0 * size + d1: the slot is
+    (f1 + d0 * f2 + d1) % size for the key's displacement_hashes f1 and f2.
+    """
+    f1, f2 = displacement_hashes(hash_value, salt)
+    d0, d1 = divmod(displacement, size)
+    return (f1 + d0 * f2 + d1) % size
+
+
+# ------------------------- Registry ------------------------------------ #
+
+HASH_FUNCTIONS = {
+    'hash_function_1': hash_function_1,
+    'hash_function_2': hash_function_2,
+    'builtin': builtin_hash,
+    'fnv1a': fnv1a_hash,
+    'xxh64': xxh64_hash,
+    'siphash': make_siphash(),
+}
+
+# Registered hash functions whose results change from process to process, so
+# a table built with them cannot be searched from another process
+PROCESS_LOCAL = ('builtin', 'siphash')
+
+
+def register_hash_function(name: str, function: callable) -> None:
+    """Register a hash function so HashMaps can be constructed with its name."""
+    HASH_FUNCTIONS[name] = function
+
+
+def get_hash_function(function) -> callable:
+    """
+    Returns the hash function for a registered name. Callables are returned
+    unchanged, so HashMaps accept either a name or a function.
+    """
+    if callable(function):
+        return function
+    if function not in HASH_FUNCTIONS:
+        raise ValueError(f"Unknown hash function: {function!r}")
+    return HASH_FUNCTIONS[function]
+
+
+def hash_function_name(function) -> str:
+    """
+    Returns the name the given hash function is registered under, or None if
+    it is not registered.
+    """
+    for name, registered in HASH_FUNCTIONS.items():
+        if registered is function:
+            return name
+    return None
+
+
+# ------------------------- Batch hashing ------------------------------- #
+
+def _code_points(keys: list):
+    """
+    Returns a (len(keys), longest key) array of the string keys' code points,
+    with shorter keys padded by zeros.
+    """
+    chars = numpy.array(keys, dtype=str)
+    width = chars.dtype.itemsize // 4
+    return chars.view(numpy.uint32).reshape(len(keys), width)
+
+
+def _vector_hash_1(codes):
+    """hash_function_1 of every row of a code point array."""
+    return codes.sum(axis=1, dtype=numpy.uint64)
+
+
+def _vector_hash_2(codes):
+    """hash_function_2 of every row of a code point array."""
+    weights = numpy.arange(1, codes.shape[1] + 1, dtype=numpy.uint64)
+    return codes.astype(numpy.uint64) @ weights
+
+
+# Padding code points are zero, so they add nothing to either sum
+_VECTOR_HASHES = {
+    hash_function_1: _vector_hash_1,
+    hash_function_2: _vector_hash_2,
+}
+
+
+def _hash_chunks(keys: list, function: callable, capacity: int):
+    """
+    Yields (hashes, indices) list pairs for consecutive chunks of keys using
+    the vectorized form of function, or a single None if it cannot be used.
+
+    A chunk ends before the key that would take its padded size past
+    _VECTOR_ELEMENTS code points, and keys too long to vectorize are hashed
+    on their own by function, so one long key cannot make every other key
+    of a batch as long.
+    """
+    vector_hash = _VECTOR_HASHES.get(function) if numpy is not None else None
+    if vector_hash is None or set(map(type, keys)) != {str}:
+        yield None
+        return
+
+    def vector_chunk(chunk: list) -> tuple:
+        hashes = vector_hash(_code_points(chunk))
+        indices = hashes % numpy.uint64(capacity) if capacity else hashes
+        return hashes.tolist(), indices.tolist()
+
+    for batch_start in range(0, len(keys), _BATCH):
+        batch = keys[batch_start:batch_start + _BATCH]
+        lengths = list(map(len, batch))
+        if len(batch) * max(lengths) <= _VECTOR_ELEMENTS:
+            yield vector_chunk(batch)
+            continue
+
+        # Split the batch key by key
+        start, width = 0, 0
+        for end, length in enumerate(lengths):
+            if length > _MAX_VECTOR_LENGTH:
+                if start < end:
+                    yield vector_chunk(batch[start:end])
+                hash = function(batch[end])
+                yield [hash], [hash % capacity if capacity else hash]
+                start, width = end + 1, 0
+                continue
+
+            width = max(width, length)
+            if (end + 1 - start) * width > _VECTOR_ELEMENTS:
+                yield vector_chunk(batch[start:end])
+                start, width = end, length
+
+        if start < len(batch):
+            yield vector_chunk(batch[start:])
+
+
+def hash_many(keys, function) -> list:
+    """
+    Returns the hash of every key, identical to calling function on each of
+    them. With NumPy installed, string keys are hashed as one array for the
+    sample hash functions, any other function is called once per key.
+
+    :param keys:        iterable of keys to hash
+    :param function:    hash function or registered name
+
+    :return:    list of hashes in the same order as the keys
+    """
+    keys = list(keys)
+    function = get_hash_function(function)
+    hashes = []
+    for chunk in _hash_chunks(keys, function, 0):
+        if chunk is None:
+            return list(map(function, keys))
+        hashes.extend(chunk[0])
+    return hashes
+
+
+def hash_indices(keys, function, capacity: int) -> (list, list):
+    """
+    Returns the hash and bucket index (hash % capacity) of every key, both
+    computed in the same NumPy pass when hash_many would vectorize.
+
+    :param keys:        iterable of keys to hash
+    :param function:    hash function or registered name
+    :param capacity:    number of buckets
+
+    :return:    tuple of the list of hashes and the list of bucket indices
+    """
+    keys = list(keys)
+    function = get_hash_function(function)
+    hashes, indices = [], []
+    for chunk in _hash_chunks(keys, function, capacity):
+        if chunk is None:
+            hashes = list(map(function, keys))
+            return hashes, [hash % capacity for hash in hashes]
+        hashes.extend(chunk[0])
+        indices.extend(chunk[1])
+    return hashes, indices
+
+
+# ------------------------- Distribution quality ------------------------ #
+
+def distribution_report(keys: list, capacity: int, function) -> dict:
+    """
+    Measures how well a hash function spreads the given keys over a table of
+    the given capacity.
+
+    :param keys:        keys to hash
+    :param capacity:    number of buckets to spread the keys over
+    :param function:    hash function or registered name
+
+    :return:    dictionary with the number of distinct hashes, the longest
+                chain, the fraction of empty buckets, the chi-squared statistic
+                of the bucket counts (close to capacity for a uniform hash)
+                and the average time per hash in nanoseconds
+    """
+    function = get_hash_function(function)
+
+    start = time.perf_counter()
+    hashes = [function(key) for key in keys]
+    elapsed = time.perf_counter() - start
+
+    counts = [0] * capacity
+    for hash_value in hashes:
+        counts[hash_value % capacity] += 1
+
+    expected = len(keys) / capacity
+    chi_squared = sum((count - expected) ** 2 for count in counts) / expected
+
+    return {
+        'distinct_hashes': len(set(hashes)),
+        'max_chain': max(counts),
+        'empty_fraction': counts.count(0) / capacity,
+        'chi_squared': chi_squared,
+        'ns_per_hash': elapsed / len(keys) * 1e9,
+    }
+
+
+# ------------------- BASIC TESTING ---------------------------------------- #
+
+if __name__ == "__main__":
+
+    print("\nKnown answer tests")
+    print("------------------")
+    print(hex(xxh64(b'')), hex(xxh64(b'abc')))
+    print(hex(siphash24(bytes(range(16)), bytes(range(15)))))
+    print(hex(fnv1a_hash('')), hex(fnv1a_hash('a')))
+
+    key_sets = {
+        'sequential': ['str' + str(i) for i in range(20000)],
+        'anagrams': [''.join(p) for p in itertools.permutations('abcdefgh')][:20000],
+        'numeric': [str(i * 7919) for i in range(20000)],
+    }
+
+    for set_name, keys in key_sets.items():
+        print(f"\nDistribution - {set_name} keys, capacity 10007")
+        print("-" * 72)
+        print(f"{'function':<16}{'distinct':>10}{'max chain':>11}"
+              f"{'empty':>8}{'chi2':>12}{'ns/hash':>10}")
+        for name in HASH_FUNCTIONS:
+            report = distribution_report(keys, 10007, name)
+            print(f"{name:<16}{report['distinct_hashes']:>10}"
+                  f"{report['max_chain']:>11}{report['empty_fraction']:>8.2f}"
+                  f"{report['chi_squared']:>12.0f}{report['ns_per_hash']:>10.0f}")
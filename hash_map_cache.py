@@ -0,0 +1,424 @@
+# Course: CS261 - Data Structures
+# Assignment: 6
+# Description:  This program contains a bounded cache built on the separate
+#               chaining HashMap. Entries are stored as CacheNodes, chain nodes
+#               that are also linked into the eviction order of the cache's
+#               policy (LRU, LFU or CLOCK), so a hit is a single hash lookup
+#               followed by a few pointer updates and evicting an entry needs
+#               no search. The cache is bounded by a number of entries, a
+#               byte budget or both, and memoize caches a function's results.
+
+
+import functools
+import sys
+
+from a6_include import SLNode
+import hash_map_sc
+
+
+class CacheNode(SLNode):
+    """
+    Chain node of a Cache that is also a node of the doubly linked lists its
+    eviction policy keeps.
+    """
+
+    def __init__(self, key: object, value: object, hash: int, size: int = 0) -> None:
+        """Initialize a node for a new entry of the given size in bytes."""
+        super().__init__(key, value, None, hash)
+        self.before = None
+        self.after = None
+        self.frequency = 1
+        self.referenced = False
+        self.size = size
+
+
+# ------------------------- Eviction order ------------------------------ #
+
+def _new_ring() -> CacheNode:
+    """Return the sentinel of an empty circular doubly linked list."""
+    sentinel = CacheNode(None, None, None)
+    sentinel.before = sentinel.after = sentinel
+    return sentinel
+
+
+def _link_after(anchor: CacheNode, node: CacheNode) -> None:
+    """Link node into a list right after anchor."""
+    node.before = anchor
+    node.after = anchor.after
+    anchor.after.before = node
+    anchor.after = node
+
+
+def _unlink(node: CacheNode) -> None:
+    """Take node out of its list."""
+    node.before.after = node.after
+    node.after.before = node.before
+    node.before = node.after = None
+
+
+class _LRUPolicy:
+    """
+    Least recently used: hits move an entry to the front of the list, and
+    the entry at the back is evicted.
+    """
+
+    def __init__(self) -> None:
+        self._ring = _new_ring()
+
+    def add(self, node: CacheNode) -> None:
+        _link_after(self._ring, node)
+
+    def touch(self, node: CacheNode) -> None:
+        _unlink(node)
+        _link_after(self._ring, node)
+
+    def remove(self, node: CacheNode) -> None:
+        _unlink(node)
+
+    def victim(self) -> CacheNode:
+        return self._ring.before
+
+    def clear(self) -> None:
+        self._ring = _new_ring()
+
+
+class _LFUPolicy:
+    """
+    Least frequently used: every frequency has its own list in recency
+    order, and the least recently used entry of the lowest frequency is
+    evicted. Hits move an entry to the list of the next frequency.
+    """
+
+    def __init__(self) -> None:
+        self._rings = {}
+        self._lowest = 1
+
+    def add(self, node: CacheNode) -> None:
+        self._push(node)
+        if node.frequency < self._lowest:
+            self._lowest = node.frequency
+
+    def _push(self, node: CacheNode) -> None:
+        """Link node at the front of the list of its frequency."""
+        ring = self._rings.get(node.frequency)
+        if ring is None:
+            ring = self._rings[node.frequency] = _new_ring()
+        _link_after(ring, node)
+
+    def _pull(self, node: CacheNode) -> None:
+        """Unlink node, dropping the list of its frequency if it empties."""
+        _unlink(node)
+        ring = self._rings[node.frequency]
+        if ring.after is ring:
+            del self._rings[node.frequency]
+
+    def touch(self, node: CacheNode) -> None:
+        self._pull(node)
+        if node.frequency == self._lowest and node.frequency not in self._rings:
+            self._lowest += 1
+        node.frequency += 1
+        self._push(node)
+
+    def remove(self, node: CacheNode) -> None:
+        self._pull(node)
+
+    def victim(self) -> CacheNode:
+        # Removing entries directly can leave the lowest frequency behind
+        if self._lowest not in self._rings:
+            self._lowest = min(self._rings)
+        return self._rings[self._lowest].before
+
+    def clear(self) -> None:
+        self._rings = {}
+        self._lowest = 1
+
+
+class _ClockPolicy:
+    """
+    CLOCK (second chance): entries sit on a circle that a hand sweeps. Hits
+    only set an entry's referenced bit; the hand clears set bits as it
+    passes and evicts the first entry whose bit is already clear.
+    """
+
+    def __init__(self) -> None:
+        self._ring = _new_ring()
+        self._hand = self._ring
+
+    def add(self, node: CacheNode) -> None:
+        # New entries go just behind the hand, the last place it will reach
+        node.referenced = False
+        _link_after(self._hand.before, node)
+
+    def touch(self, node: CacheNode) -> None:
+        node.referenced = True
+
+    def remove(self, node: CacheNode) -> None:
+        if self._hand is node:
+            self._hand = node.after
+        _unlink(node)
+
+    def victim(self) -> CacheNode:
+        hand = self._hand
+        while hand is self._ring or hand.referenced:
+            hand.referenced = False
+            hand = hand.after
+        self._hand = hand
+        return hand
+
+    def clear(self) -> None:
+        self._ring = _new_ring()
+        self._hand = self._ring
+
+
+POLICIES = {
+    'lru': _LRUPolicy,
+    'lfu': _LFUPolicy,
+    'clock': _ClockPolicy,
+}
+
+
+def _shallow_size(key: object, value: object) -> int:
+    """Return the shallow size in bytes of a key and its value."""
+    return sys.getsizeof(key) + sys.getsizeof(value)
+
+
+# ------------------------- Cache --------------------------------------- #
+
+class Cache:
+    """
+    Bounded key / value cache. Before a new entry would take it past
+    max_entries entries, or past max_bytes in total, entries chosen by the
+    policy are evicted. Entry sizes come from sizeof(key, value), by default
+    the shallow sys.getsizeof of both. An entry larger than max_bytes on its
+    own is not cached.
+    """
+
+    def __init__(self,
+                 max_entries: int = 128,
+                 max_bytes: int = None,
+                 policy: str = 'lru',
+                 function: callable = 'builtin',
+                 sizeof: callable = None) -> None:
+        """
+        Initialize an empty cache. policy is 'lru', 'lfu' or 'clock'. The
+        default built-in hash accepts any hashable key.
+        """
+        if max_entries is None and max_bytes is None:
+            raise ValueError("A Cache needs max_entries, max_bytes or both")
+        if max_entries is not None and max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown cache policy: {policy!r}")
+
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._policy_name = policy
+        self._policy = POLICIES[policy]()
+        self._sizeof = (sizeof or _shallow_size) if max_bytes is not None else None
+
+        # One bucket per entry, so that a full cache never resizes and chains
+        # stay short
+        self._map = hash_map_sc.HashMap(max(11, max_entries or 0), function)
+        self._hash_function = self._map._hash_function
+
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get_size(self) -> int:
+        """
+        Return number of entries in the cache
+        """
+        return self._map.get_size()
+
+    def cache_info(self) -> dict:
+        """
+        Returns the hit, miss and eviction counters and the current size.
+        """
+        return {
+            'policy': self._policy_name,
+            'hits': self._hits,
+            'misses': self._misses,
+            'evictions': self._evictions,
+            'size': self._map.get_size(),
+            'bytes': self._bytes,
+            'max_entries': self._max_entries,
+            'max_bytes': self._max_bytes,
+        }
+
+    # ------------------------------------------------------------------ #
+
+    def _get(self, key: object, hash: int, default: object) -> object:
+        """Looks up a key whose hash is known, counting a hit or miss."""
+        node = self._map._find(key, hash)
+        if node is None:
+            self._misses += 1
+            return default
+        self._hits += 1
+        self._policy.touch(node)
+        return node.value
+
+    def _put(self, key: object, value: object, hash: int) -> None:
+        """Stores a key whose hash is known, evicting to make room first."""
+        size = self._sizeof(key, value) if self._sizeof else 0
+
+        # A replaced entry is taken out first so that it cannot be chosen to
+        # make room for itself. Its new node counts as a use of the old one
+        old = self._map._find(key, hash)
+        if old is not None:
+            self._discard(old)
+        if self._max_bytes is not None and size > self._max_bytes:
+            return
+
+        while ((self._max_entries is not None
+                and self._map.get_size() >= self._max_entries)
+               or (self._max_bytes is not None
+                   and self._bytes + size > self._max_bytes)):
+            self._discard(self._policy.victim())
+            self._evictions += 1
+
+        node = CacheNode(key, value, hash, size)
+        self._map._insert_node(node)
+        if old is not None:
+            node.frequency = old.frequency
+            self._policy.add(node)
+            self._policy.touch(node)
+        else:
+            self._policy.add(node)
+        self._bytes += size
+
+    def _discard(self, node: CacheNode) -> None:
+        """Removes an entry from the policy's lists and the map."""
+        self._policy.remove(node)
+        self._map._remove_node(node)
+        self._bytes -= node.size
+
+    def get(self, key: object, default: object = None) -> object:
+        """
+        Returns the value cached for the given key, or default, and counts a
+        hit or miss. A hit counts as a use of the entry for the policy.
+
+        :param key:     key to search for in the cache
+        :param default: value returned if the key is not cached
+
+        :return:        cached value or default
+        """
+        return self._get(key, self._hash_function(key), default)
+
+    def put(self, key: object, value: object) -> None:
+        """
+        Caches the value for the given key, replacing any value it had, and
+        evicts entries until the cache is within its limits again.
+
+        :param key:     key to be used in the key / value pair
+        :param value:   value to be used in the key / value pair
+
+        :return:        None
+        """
+        self._put(key, value, self._hash_function(key))
+
+    def contains_key(self, key: object) -> bool:
+        """
+        Returns True if the given key is cached. Neither the counters nor the
+        eviction order are affected.
+
+        :param key: key to be searched for in the cache
+
+        :return:    True/False depending on if key is found
+        """
+        return self._map._find(key, self._hash_function(key)) is not None
+
+    def remove(self, key: object) -> None:
+        """
+        Removes the given key from the cache if it is cached.
+
+        :param key: key of key / value pair to be removed from the cache
+
+        :return:    None
+        """
+        node = self._map._find(key, self._hash_function(key))
+        if node is not None:
+            self._discard(node)
+
+    def clear(self) -> None:
+        """
+        Removes every entry. The counters are kept.
+
+        :return:    None
+        """
+        self._map.clear()
+        self._policy.clear()
+        self._bytes = 0
+
+    def items(self):
+        """
+        Yields every cached (key, value) pair, in no particular order.
+        """
+        return self._map.items()
+
+
+# Separates positional from keyword arguments in memoize keys, so that no
+# positional arguments give the same key as a call with keyword arguments
+_KWD_MARK = object()
+
+
+def memoize(max_entries: int = 128,
+            max_bytes: int = None,
+            policy: str = 'lru',
+            sizeof: callable = None):
+    """
+    Decorator that caches a function's results in a Cache with the given
+    limits, keyed by its positional and keyword arguments, which must be
+    hashable. The cache is available as the wrapper's cache attribute.
+    """
+    missing = object()
+
+    def decorator(function):
+        cache = Cache(max_entries, max_bytes, policy, sizeof=sizeof)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            key = args
+            if kwargs:
+                key += (_KWD_MARK,) + tuple(sorted(kwargs.items()))
+            hash = cache._hash_function(key)
+            value = cache._get(key, hash, missing)
+            if value is missing:
+                value = function(*args, **kwargs)
+                cache._put(key, value, hash)
+            return value
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
+
+
+# ------------------- BASIC TESTING ---------------------------------------- #
+
+if __name__ == "__main__":
+
+    for policy in POLICIES:
+        print(f"\n{policy.upper()} cache")
+        print("-" * (len(policy) + 6))
+        cache = Cache(3, policy=policy)
+        for key in ['a', 'b', 'c', 'a', 'a', 'd', 'b', 'e', 'a']:
+            if cache.get(key) is None:
+                cache.put(key, key.upper())
+        print(sorted(key for key, _ in cache.items()), cache.cache_info())
+
+    print("\nmemoize")
+    print("-------")
+
+    @memoize(max_entries=100)
+    def fibonacci(n: int) -> int:
+        return n if n < 2 else fibonacci(n - 1) + fibonacci(n - 2)
+
+    print(fibonacci(80), fibonacci.cache.cache_info())
+
+    @memoize()
+    def arguments(*args, **kwargs) -> tuple:
+        return (args, kwargs)
+
+    print(arguments(1, x=2), arguments((1,), (('x', 2),)))
@@ -0,0 +1,289 @@
+# Course: CS261 - Data Structures
+# Assignment: 6
+# Description:  This program contains a thread-safe hash map built from
+#               separate chaining HashMaps. Keys are spread over a fixed
+#               number of segments by hash, and each segment is an ordinary
+#               hash_map_sc.HashMap guarded by its own lock, so writers to
+#               different segments never wait for each other and a segment
+#               grows under its own lock without stopping the others. Reads
+#               take no lock unless a write to their segment overlaps them.
+
+
+import threading
+from contextlib import contextmanager
+
+from a6_include import (DynamicArray,
+                        hash_function_1, hash_function_2)
+from hash_functions import get_hash_function
+import hash_map_sc
+
+
+class ConcurrentHashMap:
+    """
+    Thread-safe HashMap with the same basic API as hash_map_sc.HashMap.
+
+    Every segment has a lock and a sequence number. Writers hold the lock and
+    increment the sequence number before and after changing the segment, so
+    it is odd while a change, including a resize, is in progress. Readers
+    note the sequence number, search the segment without locking and only
+    fall back to searching under the lock if the number was odd or has moved
+    on since, which means their search may have seen a half finished change.
+    Operations on the whole map (clear, resize_table, get_keys_and_values)
+    take every segment lock, always in the same order.
+    """
+
+    def __init__(self,
+                 capacity: int = 11,
+                 function: callable = hash_function_1,
+                 segments: int = 16,
+                 expected_size: int = None) -> None:
+        """
+        Initialize new HashMap that uses separate chaining for collision
+        resolution and locks each of its segments separately
+
+        capacity and expected_size are for the whole map and are divided
+        evenly between the segments.
+        """
+        if segments < 1:
+            raise ValueError("A ConcurrentHashMap needs at least one segment")
+
+        self._hash_function = get_hash_function(function)
+        if expected_size is not None:
+            expected_size = -(-expected_size // segments)
+
+        # Segments never resize incrementally, since that would make reads
+        # move nodes
+        self._segments = [hash_map_sc.HashMap(-(-capacity // segments),
+                                              self._hash_function,
+                                              expected_size=expected_size)
+                          for _ in range(segments)]
+        self._locks = [threading.Lock() for _ in range(segments)]
+        self._sequences = [0] * segments
+
+    def get_size(self) -> int:
+        """
+        Return size of map, which may already be out of date if other threads
+        are writing to it
+        """
+        return sum(segment.get_size() for segment in self._segments)
+
+    def get_capacity(self) -> int:
+        """
+        Return capacity of map, the total number of buckets of all segments
+        """
+        return sum(segment.get_capacity() for segment in self._segments)
+
+    # ------------------------------------------------------------------ #
+
+    @contextmanager
+    def _write_all(self):
+        """
+        Holds the locks of all segments, acquired in segment order, and keeps
+        their sequence numbers odd while the whole map is changed.
+        """
+        acquired = 0
+        try:
+            for lock in self._locks:
+                lock.acquire()
+                acquired += 1
+            for index in range(len(self._segments)):
+                self._sequences[index] += 1
+            yield self._segments
+        finally:
+            if acquired == len(self._locks):
+                for index in range(len(self._segments)):
+                    self._sequences[index] += 1
+            for lock in self._locks[:acquired]:
+                lock.release()
+
+    @staticmethod
+    def _find(segment: hash_map_sc.HashMap, key: str, hash: int) -> object:
+        """
+        Returns the node for the given key in the given segment, or None.
+        The bucket array is read once and indexed by its own length, so a
+        search racing with a resize sees one consistent array.
+
+        :param segment: segment to search
+        :param key:     key to search for
+        :param hash:    hash of the key
+
+        :return:        node with matching key or None
+        """
+        buckets = segment._buckets._data
+        return buckets[hash % len(buckets)].contains(key, hash)
+
+    def put(self, key: str, value: object) -> None:
+        """
+        Updates the key / value pair in the hash map. If the given key already
+        exists in the hash map, its associated value is replaced with the new
+        value. If the given key is not in the hash map, a new key / value
+        pair is added.
+
+        :param key:     key to be used in the key / value pair
+        :param value:   value to be used in the key / value pair
+
+        :return:        None
+        """
+        hash = self._hash_function(key)
+        index = hash % len(self._segments)
+
+        # The sequence number stays odd while the segment is being changed
+        with self._locks[index]:
+            self._sequences[index] += 1
+            try:
+                self._segments[index]._put(key, value, hash, True)
+            finally:
+                self._sequences[index] += 1
+
+    def get(self, key: str) -> object:
+        """
+        Returns the value associated with the given key. If the key is not in
+        the hash map, the method returns None.
+
+        :param key: key to search for in hash map
+
+        :return:    value associated with key or None if key not found
+        """
+        hash = self._hash_function(key)
+        index = hash % len(self._segments)
+        segment = self._segments[index]
+
+        # Optimistic search without the lock
+        sequence = self._sequences[index]
+        if sequence % 2 == 0:
+            node = self._find(segment, key, hash)
+            value = node.value if node else None
+            if self._sequences[index] == sequence:
+                return value
+
+        with self._locks[index]:
+            node = self._find(segment, key, hash)
+            return node.value if node else None
+
+    def contains_key(self, key: str) -> bool:
+        """
+        Returns True if the given key is in the hash map, otherwise it returns False.
+
+        :param key: key to be searched for in hash map
+
+        :return:    True/False depending on if key is found
+        """
+        hash = self._hash_function(key)
+        index = hash % len(self._segments)
+        segment = self._segments[index]
+
+        # Optimistic search without the lock
+        sequence = self._sequences[index]
+        if sequence % 2 == 0:
+            found = self._find(segment, key, hash) is not None
+            if self._sequences[index] == sequence:
+                return found
+
+        with self._locks[index]:
+            return self._find(segment, key, hash) is not None
+
+    def remove(self, key: str) -> None:
+        """
+        Removes the given key and its associated value from the hash map. If
+        the key is not in the hash map, the method does nothing.
+
+        :param key: key of key / value pair to be removed from hash map
+
+        :return:    None
+        """
+        index = self._hash_function(key) % len(self._segments)
+
+        # The sequence number stays odd while the segment is being changed
+        with self._locks[index]:
+            self._sequences[index] += 1
+            try:
+                self._segments[index].remove(key)
+            finally:
+                self._sequences[index] += 1
+
+    def empty_buckets(self) -> int:
+        """
+        Returns the number of empty buckets in the hash table.
+
+        :return:    empty buckets in the hash table
+        """
+        return sum(segment.empty_buckets() for segment in self._segments)
+
+    def table_load(self) -> float:
+        """
+        Returns the current hash table load factor.
+
+        :return:    load factor of hash table
+        """
+        return self.get_size() / self.get_capacity()
+
+    def clear(self) -> None:
+        """
+        Clears the contents of the hash map. It does not change the underlying
+        hash table capacity.
+
+        :return:    None
+        """
+        with self._write_all() as segments:
+            for segment in segments:
+                segment.clear()
+
+    def resize_table(self, new_capacity: int) -> None:
+        """
+        Changes the capacity of the internal hash table, dividing the new
+        capacity evenly between the segments. All existing key / value pairs
+        will remain in the new hash map.
+
+        :param new_capacity:    new capacity of the hash map
+
+        :return:                None
+        """
+        if new_capacity < 1:
+            return
+
+        with self._write_all() as segments:
+            for segment in segments:
+                segment.resize_table(-(-new_capacity // len(segments)))
+
+    def get_keys_and_values(self) -> DynamicArray:
+        """
+        Returns a dynamic array where each index contains a tuple of a
+        key / value pair stored in the hash map, taken while no other thread
+        can change the map.
+
+        :return:    dynamic array containing all key / value pairs in hash map
+        """
+        key_val_arr = DynamicArray()
+        with self._write_all() as segments:
+            for segment in segments:
+                for pair in segment.items():
+                    key_val_arr.append(pair)
+        return key_val_arr
+
+
+# ------------------- BASIC TESTING ---------------------------------------- #
+
+if __name__ == "__main__":
+
+    print("\nConcurrent put / get")
+    print("--------------------")
+    m = ConcurrentHashMap(53, hash_function_2, segments=8)
+
+    def worker(start: int) -> None:
+        for i in range(start, start + 2000):
+            m.put('str' + str(i), i)
+        for i in range(start, start + 2000, 2):
+            m.remove('str' + str(i))
+
+    threads = [threading.Thread(target=worker, args=(n * 2000,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print(m.get_size(), m.get_capacity(), round(m.table_load(), 2))
+    print(all(m.get('str' + str(i)) == (i if i % 2 else None) for i in range(8000)))
+    m.resize_table(100)
+    print(m.get_size(), m.get_capacity(), m.contains_key('str1'), m.contains_key('str0'))
+    m.clear()
+    print(m.get_size(), m.get_keys_and_values().length())
@@ -0,0 +1,313 @@
+# Course: CS261 - Data Structures
+# Assignment: 6
+# Description:  This program contains an immutable hash map built with a
+#               minimal perfect hash function, for maps that are filled once
+#               and only read afterwards. Keys are split into small buckets
+#               by hash, and every bucket gets a displacement that sends each
+#               of its keys to a slot of its own (CHD, "compress, hash and
+#               displace"). The n keys fill exactly n slots of flat key and
+#               value arrays, and a lookup computes its one slot directly and
+#               compares a single key.
+
+
+from array import array
+
+from a6_include import DynamicArray, hash_function_2
+from hash_functions import (displaced_index, displacement_hashes,
+                            get_hash_function)
+import hash_map_persist
+
+
+# Average number of keys per displacement bucket. Larger buckets save space
+# but take longer to place
+_KEYS_PER_BUCKET = 4
+
+
+class FrozenHashMap:
+    """
+    Read-only HashMap with exactly one probe per lookup and no empty slots.
+    Create one with HashMap.freeze() or from any iterable of key / value
+    pairs with distinct keys.
+    """
+
+    def __init__(self, pairs=(), function: callable = 'xxh64') -> None:
+        """
+        Build the perfect hash table for the given key / value pairs.
+
+        Keys that share a full hash value can never be given slots of their
+        own, so the hash function must not have collisions on these keys.
+        The 64 bit 'xxh64' default makes that practically certain, which
+        hash_function_1 (equal for anagrams) does not.
+        """
+        function = get_hash_function(function)
+        pairs = list(pairs)
+        try:
+            hashes = array('Q', [function(key) for key, _ in pairs])
+        except OverflowError:
+            raise ValueError("Only hashes between 0 and 2**64 - 1 can be used") from None
+
+        size = len(pairs)
+        if len(set(hashes)) != size:
+            raise ValueError("The hash function gives some keys the same hash, "
+                             "or the same key was given twice")
+        buckets = max(1, -(-size // _KEYS_PER_BUCKET))
+        members = [[] for _ in range(buckets)]
+        for number, hash in enumerate(hashes):
+            members[hash % buckets].append(number)
+
+        # A bucket whose keys all have the same displacement hashes modulo the
+        # size cannot be placed, which another salt fixes
+        salt = 0
+        while True:
+            placed = self._place(hashes, members, salt)
+            if placed is not None:
+                break
+            salt += 1
+        displacements, slot_of = placed
+
+        keys = [None] * size
+        values = [None] * size
+        ordered = array('Q', bytes(8 * size))
+        for number, slot in enumerate(slot_of):
+            keys[slot], values[slot] = pairs[number]
+            ordered[slot] = hashes[number]
+
+        self._set_table(function, salt, displacements, ordered, keys, values)
+
+    @staticmethod
+    def _place(hashes: array, members: list, salt: int) -> tuple:
+        """
+        Searches a displacement for every bucket, largest buckets first.
+
+        :param hashes:  hash of every key
+        :param members: numbers of the keys in each bucket
+        :param salt:    salt of the displacement hashes
+
+        :return:        the displacements and the slot of every key, or None
+                        if some bucket cannot be placed
+        """
+        size = len(hashes)
+        displacements = array('Q', bytes(8 * len(members)))
+        slot_of = [0] * size
+        taken = bytearray(size)
+        free = 0
+
+        for bucket in sorted(range(len(members)),
+                             key=lambda bucket: len(members[bucket]), reverse=True):
+            numbers = members[bucket]
+            if not numbers:
+                break
+
+            # A single key can be sent straight to the first free slot
+            if len(numbers) == 1:
+                while taken[free]:
+                    free += 1
+                f1, _ = displacement_hashes(hashes[numbers[0]], salt)
+                displacements[bucket] = (free - f1) % size
+                taken[free] = 1
+                slot_of[numbers[0]] = free
+                continue
+
+            # Otherwise find d0 that spreads the keys apart and d1 that shifts
+            # them all onto free slots
+            parts = [displacement_hashes(hashes[number], salt) for number in numbers]
+            for d0 in range(size):
+                starts = [(f1 + d0 * f2) % size for f1, f2 in parts]
+                if len(set(starts)) == len(starts):
+                    d1 = FrozenHashMap._shift(taken, starts)
+                    if d1 >= 0:
+                        break
+            else:
+                return None
+
+            slots = [(start + d1) % size for start in starts]
+            displacements[bucket] = d0 * size + d1
+            for number, slot in zip(numbers, slots):
+                taken[slot] = 1
+                slot_of[number] = slot
+
+        return displacements, slot_of
+
+    @staticmethod
+    def _shift(taken: bytearray, starts: list) -> int:
+        """
+        Returns the smallest shift d1 that moves every start onto a free
+        slot, or -1 if there is none. Only shifts that put the first start on
+        a free slot are tried, found by scanning for the next zero byte.
+        """
+        size = len(taken)
+        first = starts[0]
+        for low, high in ((first, size), (0, first)):
+            candidate = taken.find(0, low, high)
+            while candidate >= 0:
+                d1 = (candidate - first) % size
+                if not any(taken[(start + d1) % size] for start in starts):
+                    return d1
+                candidate = taken.find(0, candidate + 1, high)
+        return -1
+
+    def _set_table(self, function: callable, salt: int, displacements: array,
+                   hashes: array, keys: list, values: list) -> None:
+        """Store a finished table."""
+        self._hash_function = function
+        self._salt = salt
+        self._displacements = displacements
+        self._hashes = hashes
+        self._keys = keys
+        self._values = values
+
+    @classmethod
+    def _from_table(cls, function: callable, salt: int, displacements: array,
+                    hashes: array, keys: list, values: list) -> "FrozenHashMap":
+        """
+        Returns a map using a table that was already built, such as one
+        loaded from a snapshot.
+        """
+        frozen_map = cls.__new__(cls)
+        frozen_map._set_table(function, salt, displacements, hashes, keys, values)
+        return frozen_map
+
+    def __str__(self) -> str:
+        """
+        Override string method to provide more readable output
+        """
+        out = ''
+        for slot, key in enumerate(self._keys):
+            out += f"{slot}: {key} -> {self._values[slot]}\n"
+        return out
+
+    def get_size(self) -> int:
+        """
+        Return size of map
+        """
+        return len(self._keys)
+
+    def get_capacity(self) -> int:
+        """
+        Return capacity of map, which equals its size
+        """
+        return len(self._keys)
+
+    def table_load(self) -> float:
+        """
+        Returns the hash table load factor, 1 unless the map is empty.
+
+        :return:    load factor of hash table
+        """
+        return 1.0 if self._keys else 0.0
+
+    def empty_buckets(self) -> int:
+        """
+        Returns the number of empty buckets in the hash table, always 0.
+
+        :return:    empty buckets in the hash table
+        """
+        return 0
+
+    # ------------------------------------------------------------------ #
+
+    def _slot(self, key: str) -> int:
+        """
+        Returns the slot holding the given key, or -1 if it is not in the map.
+        """
+        size = len(self._keys)
+        if not size:
+            return -1
+        hash = self._hash_function(key)
+        displacements = self._displacements
+        slot = displaced_index(hash, displacements[hash % len(displacements)],
+                               size, self._salt)
+        if self._hashes[slot] == hash and self._keys[slot] == key:
+            return slot
+        return -1
+
+    def get(self, key: str) -> object:
+        """
+        Returns the value associated with the given key. If the key is not in
+        the hash map, the method returns None.
+
+        :param key: key to search for in hash map
+
+        :return:    value associated with key or None if key not found
+        """
+        slot = self._slot(key)
+        return self._values[slot] if slot >= 0 else None
+
+    def contains_key(self, key: str) -> bool:
+        """
+        Returns True if the given key is in the hash map, otherwise it returns False.
+
+        :param key: key to be searched for in hash map
+
+        :return:    True/False depending on if key is found
+        """
+        return self._slot(key) >= 0
+
+    def get_keys_and_values(self) -> DynamicArray:
+        """
+        Returns a dynamic array where each index contains a tuple of a
+        key / value pair stored in the hash map.
+
+        :return:    dynamic array containing all key / value pairs in hash map
+        """
+        return DynamicArray(list(zip(self._keys, self._values)))
+
+    def keys(self):
+        """
+        Yields every key in the hash map.
+        """
+        return iter(self._keys)
+
+    def values(self):
+        """
+        Yields every value in the hash map.
+        """
+        return iter(self._values)
+
+    def items(self):
+        """
+        Yields every (key, value) pair in the hash map.
+        """
+        return zip(self._keys, self._values)
+
+    def save(self, path: str) -> None:
+        """
+        Saves the map to a snapshot file, which load or
+        hash_map_persist.MappedHashMap can read without searching for the
+        perfect hash function again.
+
+        :param path:    file to write
+
+        :return:        None
+        """
+        hash_map_persist.save_perfect(self, path)
+
+    @classmethod
+    def load(cls, path: str, function: callable = None) -> "FrozenHashMap":
+        """
+        Returns the map saved in a snapshot file. The function is only
+        needed if the saved map's hash function was not registered.
+
+        :param path:        file to read
+        :param function:    hash function of the saved map
+
+        :return:            the loaded map
+        """
+        return hash_map_persist.load_perfect(cls, path, function)
+
+
+# ------------------- BASIC TESTING ---------------------------------------- #
+
+if __name__ == "__main__":
+
+    print("\nFrozen get / contains_key")
+    print("-------------------------")
+    m = FrozenHashMap(('str' + str(i), i * 100) for i in range(150))
+    print(m.get_size(), m.get_capacity(), m.table_load(), m.empty_buckets())
+    print(m.get('str0'), m.get('str149'), m.get('str150'), m.contains_key('str12'))
+
+    print("\nFrozen from hash_function_2")
+    print("---------------------------")
+    m = FrozenHashMap((('key' + str(i), i) for i in range(10)), hash_function_2)
+    print(sorted(m.keys()) == sorted('key' + str(i) for i in range(10)),
+          [m.get('key' + str(i)) for i in range(10)])
@@ -0,0 +1,675 @@
+# Course: CS261 - Data Structures
+# Assignment: 6
+# Description:  This program contains a class for implementing hash maps that
+#               utilizes open addressing and quadratic probing to deal with hash
+#               collisions, like hash_map_oa.HashMap. Instead of one HashEntry
+#               object per slot, the table is stored as parallel flat arrays:
+#               keys, values, cached hashes and a one byte state per slot
+#               (empty / live / tombstone). Probing only touches the state and
+#               hash arrays until a candidate key has to be compared.
+
+
+from array import array
+
+from a6_include import (DynamicArray,
+                        hash_function_1, hash_function_2)
+from hash_functions import get_hash_function, hash_many
+from hash_map_stats import instrument
+from primes import is_prime, next_prime
+
+
+# Slot states stored in the state byte array
+_EMPTY = 0
+_LIVE = 1
+_TOMBSTONE = 2
+
+# Cached hashes are stored as unsigned 64 bit values
+_HASH_MASK = (1 << 64) - 1
+
+
+class HashMap:
+    def __init__(self, capacity: int, function,
+                 expected_size: int = None, stats: bool = False) -> None:
+        """
+        Initialize new HashMap that uses quadratic probing for collision
+        resolution and flat parallel arrays for storage
+
+        The hash function may be given as a callable or as the name of a
+        function registered in hash_functions, such as 'xxh64'.
+
+        When expected_size is given, the table starts out large enough to hold
+        that many entries without resizing.
+
+        When stats is True, the map records probe counts, resizes and hash
+        function time, which stats() returns.
+        """
+        # Keep the expected number of entries below the 0.5 load factor
+        if expected_size is not None and 2 * expected_size >= capacity:
+            capacity = 2 * expected_size + 1
+
+        # capacity must be a prime number
+        self._capacity = self._next_prime(capacity)
+        self._allocate(self._capacity)
+
+        self._hash_function = get_hash_function(function)
+        self._size = 0
+        self._tombstones = 0
+
+        # Structural changes so far, iterators use it to fail fast
+        self._modifications = 0
+
+        self._stats = instrument(self) if stats else None
+
+    def __str__(self) -> str:
+        """
+        Override string method to provide more readable output
+        """
+        out = ''
+        for i in range(self._capacity):
+            state = self._states[i]
+            if state == _EMPTY:
+                entry = None
+            else:
+                entry = (f"K: {self._keys[i]} V: {self._values[i]} "
+                         f"TS: {state == _TOMBSTONE}")
+            out += str(i) + ': ' + str(entry) + '\n'
+        return out
+
+    def _allocate(self, capacity: int) -> None:
+        """
+        Create fresh, empty slot arrays for the given capacity
+        """
+        self._keys = [None] * capacity
+        self._values = [None] * capacity
+        self._hashes = array('Q', bytes(8 * capacity))
+        self._states = bytearray(capacity)
+
+    def _next_prime(self, capacity: int) -> int:
+        """
+        Increment from given number to find the closest prime number
+        """
+        return next_prime(capacity)
+
+    @staticmethod
+    def _is_prime(capacity: int) -> bool:
+        """
+        Determine if given integer is a prime number and return boolean
+        """
+        return is_prime(capacity)
+
+    def get_size(self) -> int:
+        """
+        Return size of map
+        """
+        return self._size
+
+    def get_capacity(self) -> int:
+        """
+        Return capacity of map
+        """
+        return self._capacity
+
+    # ------------------------------------------------------------------ #
+
+    def _find(self, key: str, hash: int) -> int:
+        """
+        Returns the slot index holding the given key, or -1 if the key is not
+        in the hash map.
+
+        :param key:     key to search for
+        :param hash:    masked hash of the key
+
+        :return:        slot index of the key or -1 if not found
+        """
+        states, hashes, keys = self._states, self._hashes, self._keys
+        capacity = self._capacity
+        init_index = hash % capacity
+
+        # Probe until an empty slot ends the sequence
+        for j in range(capacity):
+            quad_index = (init_index + j * j) % capacity
+            state = states[quad_index]
+            if state == _EMPTY:
+                return -1
+            if (state == _LIVE and hashes[quad_index] == hash
+                    and keys[quad_index] == key):
+                return quad_index
+        return -1
+
+    def put(self, key: str, value: object) -> None:
+        """
+        Updates the key / value pair in the hash map. If the given key already
+        exists in the hash map, its associated value is replaced with the new
+        value. If the given key is not in the hash map, a new key / value pair
+        is added.
+
+        :param key:         key to be used in the key / value pair
+        :param value:       value to be used in the key / value pair
+
+        :return:        None
+        """
+        self._put(key, value, self._hash_function(key) & _HASH_MASK)
+
+    def _put(self, key: str, value: object, hash: int) -> None:
+        """
+        Updates the key / value pair in the hash map using an already computed
+        masked hash of the key, which is cached in the hash array.
+
+        :param key:         key to be used in the key / value pair
+        :param value:       value to be used in the key / value pair
+        :param hash:        masked hash of the key
+
+        :return:        None
+        """
+        # Resizes table once live slots and tombstones fill half of it. The
+        # table grows if enough of them are live, otherwise it is compacted at
+        # the same capacity to clear out the tombstones
+        if (self._size + self._tombstones) / self._capacity >= 0.5:
+            if self.table_load() >= 0.25:
+                self.resize_table(self._capacity * 2)
+            else:
+                self.compact()
+
+        self._insert(key, value, hash)
+
+    def _insert(self, key: str, value: object, hash: int) -> None:
+        """
+        Updates or adds the key / value pair without any load factor checks,
+        so the caller must make sure the table has room.
+
+        :param key:         key to be used in the key / value pair
+        :param value:       value to be used in the key / value pair
+        :param hash:        masked hash of the key
+
+        :return:        None
+        """
+        states, hashes, keys = self._states, self._hashes, self._keys
+        capacity = self._capacity
+        init_index = hash % capacity
+        free_index = -1
+
+        # Probe for the key, remembering the first reusable slot on the way
+        for j in range(capacity):
+            quad_index = (init_index + j * j) % capacity
+            state = states[quad_index]
+            if state == _EMPTY:
+                if free_index == -1:
+                    free_index = quad_index
+                break
+            elif state == _TOMBSTONE:
+                if free_index == -1:
+                    free_index = quad_index
+            elif hashes[quad_index] == hash and keys[quad_index] == key:
+                self._values[quad_index] = value
+                return
+
+        # Key is not present so insert it into the first reusable slot
+        if states[free_index] == _TOMBSTONE:
+            self._tombstones -= 1
+        keys[free_index] = key
+        self._values[free_index] = value
+        hashes[free_index] = hash
+        states[free_index] = _LIVE
+        self._size += 1
+        self._modifications += 1
+
+    def table_load(self) -> float:
+        """
+        Returns the current hash table load factor
+
+        :return:    hash table load factor
+        """
+        return self._size / self._capacity
+
+    def empty_buckets(self) -> int:
+        """
+        Returns the number of empty buckets in the hash table.
+
+        :return:    empty buckets in the hash table
+        """
+        return self._capacity - self._size - self._tombstones
+
+    def resize_table(self, new_capacity: int) -> None:
+        """
+        Changes the capacity of the internal hash table. All existing key / value
+        pairs will remain in the new hash map, and all hash table links will be
+        rehashed.
+
+        :param new_capacity:    new capacity of the hash map
+
+        :return:                None
+        """
+        # Check if new capacity is valid
+        if new_capacity < self._size:
+            return
+
+        # Store old arrays
+        old_keys, old_values = self._keys, self._values
+        old_hashes, old_states = self._hashes, self._states
+
+        if self._is_prime(new_capacity):
+            self._capacity = new_capacity
+        else:
+            self._capacity = self._next_prime(new_capacity)
+
+        # Keep doubling until every entry fits below the load factor limit, so
+        # the rebuild never has to resize again partway through
+        while self._size > 0 and (self._size - 1) / self._capacity >= 0.5:
+            self._capacity = self._next_prime(self._capacity * 2)
+
+        self._allocate(self._capacity)
+        self._relocate(old_keys, old_values, old_hashes, old_states)
+        self._tombstones = 0
+        self._modifications += 1
+
+    def compact(self) -> None:
+        """
+        Rebuilds the hash table in place at its current capacity, clearing out
+        all tombstones left behind by removed entries.
+
+        :return:    None
+        """
+        self.resize_table(self._capacity)
+
+    def reserve(self, size: int) -> None:
+        """
+        Makes room for the given total number of entries, so that inserting
+        up to that many keys never resizes the table. The capacity is chosen
+        to keep the load factor below 0.5, and tombstones are cleared out if
+        they would get in the way.
+
+        :param size:    number of entries the hash map should hold
+
+        :return:        None
+        """
+        new_capacity = self._capacity
+        if size / new_capacity >= 0.5:
+            new_capacity = self._next_prime(2 * size + 1)
+
+        if (new_capacity != self._capacity
+                or (size + self._tombstones) / self._capacity >= 0.5):
+            self.resize_table(new_capacity)
+
+    def _relocate(self, old_keys: list, old_values: list,
+                  old_hashes: array, old_states: bytearray) -> None:
+        """
+        Moves all live slots of old slot arrays into the current, empty table
+        in one pass using their cached hashes. Keys are known to be unique and
+        the table is known to have room, so no duplicate checks, load checks or
+        size updates are done.
+
+        :param old_keys:    key array to move slots out of
+        :param old_values:  value array to move slots out of
+        :param old_hashes:  cached hash array to move slots out of
+        :param old_states:  state array to move slots out of
+
+        :return:            None
+        """
+        keys, values = self._keys, self._values
+        hashes, states = self._hashes, self._states
+        capacity = self._capacity
+
+        for num in range(len(old_states)):
+            if old_states[num] != _LIVE:
+                continue
+
+            # Quadratic probe for the first empty slot
+            hash = old_hashes[num]
+            init_index = hash % capacity
+            for j in range(capacity):
+                quad_index = (init_index + j * j) % capacity
+                if states[quad_index] == _EMPTY:
+                    keys[quad_index] = old_keys[num]
+                    values[quad_index] = old_values[num]
+                    hashes[quad_index] = hash
+                    states[quad_index] = _LIVE
+                    break
+
+    def get(self, key: str) -> object:
+        """
+        Returns the value associated with the given key. If the key is not in
+        the hash map, the method returns None.
+
+        :param key: key to search for in hash map
+
+        :return:    value associated with key or None if key not found
+        """
+        index = self._find(key, self._hash_function(key) & _HASH_MASK)
+        if index != -1:
+            return self._values[index]
+
+    def contains_key(self, key: str) -> bool:
+        """
+        Returns True if the given key is in the hash map, otherwise it returns
+        False.
+
+        :param key: key to be searched for
+
+        :return: True/False depending on if key is found
+        """
+        if self._size == 0:
+            return False
+        return self._find(key, self._hash_function(key) & _HASH_MASK) != -1
+
+    def remove(self, key: str) -> None:
+        """
+        Removes the given key and its associated value from the hash map if it
+        is in the hash map.
+
+        :param key: key of key / value pair to be removed from hash map
+
+        :return:    None
+        """
+        index = self._find(key, self._hash_function(key) & _HASH_MASK)
+        if index == -1:
+            return
+
+        # Mark the slot as a tombstone and drop references to key and value
+        self._states[index] = _TOMBSTONE
+        self._keys[index] = None
+        self._values[index] = None
+        self._size -= 1
+        self._tombstones += 1
+        self._modifications += 1
+
+    def clear(self) -> None:
+        """
+        Clears the contents of the hash map. It does not change the underlying
+        hash table capacity.
+
+        :return:    None
+        """
+        self._allocate(self._capacity)
+        self._size = 0
+        self._tombstones = 0
+        self._modifications += 1
+
+    def get_keys_and_values(self) -> DynamicArray:
+        """
+        Returns a dynamic array where each index contains a tuple of a
+        key / value pair stored in the hash map.
+
+        :return:    dynamic array key / value pair tuples
+        """
+        states, keys, values = self._states, self._keys, self._values
+        key_val_arr = DynamicArray()
+        for num in range(self._capacity):
+            if states[num] == _LIVE:
+                key_val_arr.append((keys[num], values[num]))
+        return key_val_arr
+
+    def keys(self):
+        """
+        Returns a generator over the keys of the hash map, see items().
+
+        :return:    generator of keys
+        """
+        for key, _ in self.items():
+            yield key
+
+    def values(self):
+        """
+        Returns a generator over the values of the hash map, see items().
+
+        :return:    generator of values
+        """
+        for _, value in self.items():
+            yield value
+
+    def items(self):
+        """
+        Returns a generator over the key / value pairs of the hash map, in the
+        same order as get_keys_and_values but without building an array of
+        them first. Updating the value of an existing key while iterating is
+        allowed, but adding or removing keys, clearing or resizing the map
+        makes the next step of the generator raise RuntimeError.
+
+        :return:    generator of (key, value) tuples
+        """
+        states, keys, values = self._states, self._keys, self._values
+        modifications = self._modifications
+        for num in range(self._capacity):
+            if states[num] == _LIVE:
+                if self._modifications != modifications:
+                    raise RuntimeError("HashMap changed during iteration")
+                yield keys[num], values[num]
+
+        # Changes made after the last pair was returned may have hidden pairs
+        if self._modifications != modifications:
+            raise RuntimeError("HashMap changed during iteration")
+
+    def iter_batches(self, n: int):
+        """
+        Returns a generator over the key / value pairs of the hash map in
+        dynamic arrays of n pairs each (the last one may be shorter), with the
+        same modification checks as items().
+
+        :param n:   number of pairs per batch
+
+        :return:    generator of dynamic arrays of (key, value) tuples
+        """
+        if n < 1:
+            raise ValueError("Batch size must be at least 1")
+
+        batch = []
+        for item in self.items():
+            batch.append(item)
+            if len(batch) == n:
+                yield DynamicArray(batch)
+                batch = []
+        if batch:
+            yield DynamicArray(batch)
+
+    # ------------------------------------------------------------------ #
+
+    def put_many(self, pairs) -> None:
+        """
+        Updates the hash map with every key / value pair of the given iterable,
+        like calling put for each of them. The table is resized at most once,
+        up front, to fit the whole batch.
+
+        :param pairs:   iterable of key / value pairs
+
+        :return:        None
+        """
+        pairs = list(pairs)
+
+        # Size the table for the batch as if every key were new
+        self.reserve(self._size + len(pairs))
+
+        insert = self._insert
+        hashes = self._hash_batch([key for key, _ in pairs])
+        for (key, value), hash in zip(pairs, hashes):
+            insert(key, value, hash)
+
+    def _hash_batch(self, keys: list) -> list:
+        """
+        Returns the masked hash of every key, hashing the whole batch at once.
+
+        :param keys:    list of keys to hash
+
+        :return:        list of masked hashes in the same order as the keys
+        """
+        return [hash & _HASH_MASK for hash in hash_many(keys, self._hash_function)]
+
+    def get_many(self, keys) -> DynamicArray:
+        """
+        Returns a dynamic array with the value associated with each of the
+        given keys, or None for keys that are not in the hash map.
+
+        :param keys:    iterable of keys to search for
+
+        :return:        dynamic array of values in the same order as the keys
+        """
+        keys = list(keys)
+        find = self._find
+        slot_values = self._values
+
+        values = []
+        for key, hash in zip(keys, self._hash_batch(keys)):
+            index = find(key, hash)
+            values.append(slot_values[index] if index != -1 else None)
+        return DynamicArray(values)
+
+    def contains_many(self, keys) -> DynamicArray:
+        """
+        Returns a dynamic array with True or False for each of the given keys
+        depending on if the key is in the hash map.
+
+        :param keys:    iterable of keys to search for
+
+        :return:        dynamic array of booleans in the same order as the keys
+        """
+        keys = list(keys)
+        find = self._find
+        return DynamicArray([find(key, hash) != -1 for key, hash
+                             in zip(keys, self._hash_batch(keys))])
+
+    def remove_many(self, keys) -> None:
+        """
+        Removes each of the given keys and its associated value from the hash
+        map. Keys that are not in the hash map are ignored.
+
+        :param keys:    iterable of keys to remove
+
+        :return:        None
+        """
+        keys = list(keys)
+        find = self._find
+        states, slot_keys, values = self._states, self._keys, self._values
+
+        removed = 0
+        for key, hash in zip(keys, self._hash_batch(keys)):
+            index = find(key, hash)
+            if index != -1:
+                states[index] = _TOMBSTONE
+                slot_keys[index] = None
+                values[index] = None
+                removed += 1
+
+        self._size -= removed
+        self._tombstones += removed
+        self._modifications += removed
+
+    def stats(self) -> dict:
+        """
+        Returns the statistics recorded since the map was created, or None if
+        it was created without stats=True.
+
+        :return:    dictionary of operation probe counts, cluster lengths,
+                    resizes and hash function time, or None
+        """
+        if self._stats is None:
+            return None
+        return self._stats.snapshot(self)
+
+    def _probe_length(self, key: str, hash: int) -> int:
+        """
+        Returns the number of slots a lookup of the given key inspects, up to
+        the key or the empty slot that ends its probe sequence.
+
+        :param key:     key to search for
+        :param hash:    hash of the key
+
+        :return:        number of slots inspected
+        """
+        states, hashes, keys = self._states, self._hashes, self._keys
+        capacity = self._capacity
+        hash &= _HASH_MASK
+        init_index = hash % capacity
+
+        for j in range(capacity):
+            quad_index = (init_index + j * j) % capacity
+            state = states[quad_index]
+            if state == _EMPTY or (state == _LIVE and hashes[quad_index] == hash
+                                   and keys[quad_index] == key):
+                return j + 1
+        return capacity
+
+    def _length_histogram(self) -> dict:
+        """
+        Returns a dictionary of cluster length to the number of clusters of
+        that length, where a cluster is a run of live or tombstone slots
+        between two empty ones.
+
+        :return:    cluster length histogram
+        """
+        histogram = {}
+        length = 0
+        for state in self._states:
+            if state != _EMPTY:
+                length += 1
+            elif length:
+                histogram[length] = histogram.get(length, 0) + 1
+                length = 0
+        if length:
+            histogram[length] = histogram.get(length, 0) + 1
+        return histogram
+
+
+# ------------------- BASIC TESTING ---------------------------------------- #
+
+if __name__ == "__main__":
+
+    print("\nPDF - put example 1")
+    print("-------------------")
+    m = HashMap(53, hash_function_1)
+    for i in range(150):
+        m.put('str' + str(i), i * 100)
+        if i % 25 == 24:
+            print(m.empty_buckets(), round(m.table_load(), 2), m.get_size(), m.get_capacity())
+
+    print("\nPDF - put example 2")
+    print("-------------------")
+    m = HashMap(41, hash_function_2)
+    for i in range(50):
+        m.put('str' + str(i // 3), i * 100)
+        if i % 10 == 9:
+            print(m.empty_buckets(), round(m.table_load(), 2), m.get_size(), m.get_capacity())
+
+    print("\nPDF - resize example 2")
+    print("----------------------")
+    m = HashMap(79, hash_function_2)
+    keys = [i for i in range(1, 1000, 13)]
+    for key in keys:
+        m.put(str(key), key * 42)
+    print(m.get_size(), m.get_capacity())
+
+    for capacity in range(111, 1000, 117):
+        m.resize_table(capacity)
+
+        m.put('some key', 'some value')
+        result = m.contains_key('some key')
+        m.remove('some key')
+
+        for key in keys:
+            # all inserted keys must be present
+            result &= m.contains_key(str(key))
+            # NOT inserted keys must be absent
+            result &= not m.contains_key(str(key + 1))
+        print(capacity, result, m.get_size(), m.get_capacity(), round(m.table_load(), 2))
+
+    print("\nPDF - remove example 1")
+    print("----------------------")
+    m = HashMap(53, hash_function_1)
+    print(m.get('key1'))
+    m.put('key1', 10)
+    print(m.get('key1'))
+    m.remove('key1')
+    print(m.get('key1'))
+    m.remove('key4')
+
+    print("\nPDF - get_keys_and_values example 1")
+    print("------------------------")
+    m = HashMap(11, hash_function_2)
+    for i in range(1, 6):
+        m.put(str(i), str(i * 10))
+    print(m.get_keys_and_values())
+
+    m.resize_table(2)
+    print(m.get_keys_and_values())
+
+    m.put('20', '200')
+    m.remove('1')
+    m.resize_table(12)
+    print(m.get_keys_and_values())
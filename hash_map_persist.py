@@ -0,0 +1,635 @@
+# Course: CS261 - Data Structures
+# Assignment: 6
+# Description:  This program contains the snapshot file format used to save
+#               and load HashMaps. A snapshot stores the table exactly as it
+#               is laid out in memory: capacity, hash function name, cached
+#               hashes and the bucket or slot table, with each key / value
+#               pair pickled into one blob. Loading rebuilds the table from
+#               the cached hashes without calling the hash function, and
+#               MappedHashMap answers get and contains_key straight from a
+#               memory mapped snapshot without loading it at all.
+#
+#               File layout (little endian, sections aligned to 8 bytes):
+#                   magic b'HMAP', version (u16), layout (u8), flags (u8),
+#                   CRC-32 of everything after it (u32), capacity, size,
+#                   tombstones (u64 each), max_load (f64), name length (u16),
+#                   hash function name
+#                   chaining:          bucket starts (u64 * capacity + 1),
+#                                      hashes (u64 * size),
+#                                      entry offsets (u64 * size + 1)
+#                   open addressing:   hashes (u64 * capacity),
+#                                      entry offsets (u64 * capacity + 1),
+#                                      slot states (u8 * capacity)
+#                   perfect hashing:   displacements (u64 * capacity),
+#                                      hashes (u64 * size),
+#                                      entry offsets (u64 * size + 1)
+#               A perfect hash table's capacity is its number of displacement
+#               buckets and its tombstones field holds the salt.
+#                   pickled (key, value) entries
+
+
+import mmap
+import os
+import pickle
+import struct
+import zlib
+from array import array
+
+from a6_include import HashEntry
+from hash_functions import (PROCESS_LOCAL, displaced_index, get_hash_function,
+                            hash_function_name, make_mixed_hash)
+
+
+_MAGIC = b'HMAP'
+_VERSION = 1
+
+# Table layouts
+CHAINING = 0
+QUADRATIC = 1
+ROBIN_HOOD = 2
+PERFECT = 3
+
+# Flags: the map mixes its hash function for a power of two capacity
+_MIXED = 1
+
+# Open addressing slot states
+_EMPTY = 0
+_LIVE = 1
+_TOMBSTONE = 2
+
+# The checksum covers everything after the first header part
+_PREFIX = struct.Struct('<4sHBBI')
+_HEADER = struct.Struct('<QQQdH')
+# Entries are written in chunks of about this many bytes
+_WRITE_CHUNK = 1 << 20
+
+
+# ------------------------- Saving -------------------------------------- #
+
+def _function_identity(hash_map) -> (str, int):
+    """
+    Returns the registered name of the map's hash function, or '' if it is
+    not registered, and the flags describing how the map wraps it.
+    """
+    stats = getattr(hash_map, '_stats', None)
+    function = stats.hash_function if stats else hash_map._hash_function
+
+    flags = 0
+    if hasattr(function, 'function'):
+        function = function.function
+        flags |= _MIXED
+
+    name = hash_function_name(function) or ''
+    if name in PROCESS_LOCAL:
+        raise ValueError(f"The {name!r} hash function gives different hashes "
+                         f"in every process, so this map cannot be saved")
+    return name, flags
+
+
+def _padding(length: int) -> bytes:
+    """Return the zero bytes that align a section of the given length."""
+    return bytes(-length % 8)
+
+
+def _write(path: str, layout: int, flags: int, name: str, capacity: int,
+           size: int, tombstones: int, max_load: float, sections: list,
+           entries: list) -> None:
+    """
+    Writes a snapshot file. The file is written next to path and renamed
+    over it once complete, so a failed save leaves any old snapshot intact.
+    """
+    name = name.encode()
+    header = _HEADER.pack(capacity, size, tombstones, max_load, len(name)) + name
+    parts = [header + _padding(_PREFIX.size + len(header))]
+    for section in sections:
+        parts.append(section)
+        parts.append(_padding(memoryview(section).nbytes))
+
+    temporary = path + '.tmp'
+    crc = 0
+    try:
+        with open(temporary, 'wb') as file:
+            file.write(bytes(_PREFIX.size))
+            for part in parts:
+                crc = zlib.crc32(part, crc)
+                file.write(part)
+
+            chunk = bytearray()
+            for entry in entries:
+                chunk += entry
+                if len(chunk) >= _WRITE_CHUNK:
+                    crc = zlib.crc32(chunk, crc)
+                    file.write(chunk)
+                    chunk = bytearray()
+            crc = zlib.crc32(chunk, crc)
+            file.write(chunk)
+
+            file.seek(0)
+            file.write(_PREFIX.pack(_MAGIC, _VERSION, layout, flags, crc))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+
+def _dump(key, value) -> bytes:
+    """Return the pickled entry for a key / value pair."""
+    return pickle.dumps((key, value), pickle.HIGHEST_PROTOCOL)
+
+
+def _hash_array(size: int) -> array:
+    """Return a zeroed array of unsigned 64 bit values."""
+    return array('Q', bytes(8 * size))
+
+
+def save_chaining(hash_map, path: str) -> None:
+    """
+    Saves a separate chaining HashMap to a snapshot file, chain by chain in
+    the order of the bucket array.
+
+    :param hash_map:    map to save
+    :param path:        file to write
+
+    :return:            None
+    """
+    hash_map._finish_rehash()
+    name, flags = _function_identity(hash_map)
+    capacity = hash_map._capacity
+
+    starts = _hash_array(capacity + 1)
+    hashes = _hash_array(hash_map._size)
+    offsets = _hash_array(hash_map._size + 1)
+    entries = []
+    count = 0
+    position = 0
+    try:
+        for index, bucket in enumerate(hash_map._buckets._data):
+            for node in bucket:
+                entry = _dump(node.key, node.value)
+                hashes[count] = node.hash
+                count += 1
+                position += len(entry)
+                offsets[count] = position
+                entries.append(entry)
+            starts[index + 1] = count
+    except OverflowError:
+        raise ValueError("Only hashes between 0 and 2**64 - 1 can be saved") from None
+
+    _write(path, CHAINING, flags, name, capacity, count, 0, 0.0,
+           [starts, hashes, offsets], entries)
+
+
+def save_open_addressing(hash_map, path: str, layout: int = QUADRATIC) -> None:
+    """
+    Saves an open addressing HashMap to a snapshot file, slot by slot,
+    keeping tombstones so every probe sequence stays the same.
+
+    :param hash_map:    map to save
+    :param path:        file to write
+    :param layout:      QUADRATIC or ROBIN_HOOD, how the map probes
+
+    :return:            None
+    """
+    hash_map._finish_rehash()
+    name, flags = _function_identity(hash_map)
+    capacity = hash_map._capacity
+
+    hashes = _hash_array(capacity)
+    offsets = _hash_array(capacity + 1)
+    states = bytearray(capacity)
+    entries = []
+    position = 0
+    try:
+        for index, bucket in enumerate(hash_map._buckets._data):
+            if bucket is not None:
+                if bucket.is_tombstone:
+                    states[index] = _TOMBSTONE
+                else:
+                    entry = _dump(bucket.key, bucket.value)
+                    states[index] = _LIVE
+                    hashes[index] = bucket.hash
+                    position += len(entry)
+                    entries.append(entry)
+            offsets[index + 1] = position
+    except OverflowError:
+        raise ValueError("Only hashes between 0 and 2**64 - 1 can be saved") from None
+
+    _write(path, layout, flags, name, capacity, hash_map._size,
+           hash_map._tombstones, hash_map._max_load,
+           [hashes, offsets, states], entries)
+
+
+def save_perfect(frozen_map, path: str) -> None:
+    """
+    Saves a FrozenHashMap to a snapshot file with its displacements, so
+    loading it does not search for a perfect hash function again.
+
+    :param frozen_map:  map to save
+    :param path:        file to write
+
+    :return:            None
+    """
+    name, flags = _function_identity(frozen_map)
+    entries = [_dump(key, value)
+               for key, value in zip(frozen_map._keys, frozen_map._values)]
+    offsets = _hash_array(len(entries) + 1)
+    position = 0
+    for number, entry in enumerate(entries):
+        position += len(entry)
+        offsets[number + 1] = position
+
+    _write(path, PERFECT, flags, name, len(frozen_map._displacements),
+           len(entries), frozen_map._salt, 1.0,
+           [frozen_map._displacements, frozen_map._hashes, offsets], entries)
+
+
+# ------------------------- Reading ------------------------------------- #
+
+def _verify(view: memoryview) -> None:
+    """
+    Raises ValueError unless the checksum in the header of the snapshot in
+    view matches its contents.
+    """
+    crc = _PREFIX.unpack_from(view)[4]
+    with view[_PREFIX.size:] as body:
+        if zlib.crc32(body) != crc:
+            raise ValueError("Snapshot checksum does not match, "
+                             "the file is damaged")
+
+
+class _Snapshot:
+    """
+    Parsed view of a snapshot held in a buffer: the header fields and
+    memoryviews of its sections, which are not copied.
+    """
+
+    def __init__(self, buffer, verify: bool = True) -> None:
+        """
+        Parse the snapshot in the buffer, checking its checksum if verify.
+        """
+        self.starts = self.hashes = self.offsets = self.states = None
+        self.entries = None
+        view = memoryview(buffer)
+        try:
+            self._parse(view, verify)
+        except BaseException:
+            self.release()
+            raise
+        finally:
+            view.release()
+
+    def _parse(self, view: memoryview, verify: bool) -> None:
+        """Read the header and create the section views."""
+        if len(view) < _PREFIX.size + _HEADER.size:
+            raise ValueError("File is too short to be a HashMap snapshot")
+        magic, version, layout, flags, crc = _PREFIX.unpack_from(view)
+        if magic != _MAGIC:
+            raise ValueError("File is not a HashMap snapshot")
+        if version != _VERSION:
+            raise ValueError(f"Unsupported snapshot version {version}")
+        if verify:
+            _verify(view)
+
+        (self.capacity, self.size, self.tombstones,
+         self.max_load, name_length) = _HEADER.unpack_from(view, _PREFIX.size)
+        self.layout = layout
+        self.flags = flags
+        position = _PREFIX.size + _HEADER.size
+        self.name = bytes(view[position:position + name_length]).decode()
+        position += name_length
+        position += -position % 8
+
+        def section(code: str, count: int) -> memoryview:
+            nonlocal position
+            width = 8 if code == 'Q' else 1
+            with view[position:position + width * count] as data:
+                if len(data) != width * count:
+                    raise ValueError("Snapshot is truncated")
+                data = data.cast(code)
+            position += width * count
+            position += -position % 8
+            return data
+
+        capacity = self.capacity
+        if layout == CHAINING:
+            self.starts = section('Q', capacity + 1)
+            self.hashes = section('Q', self.size)
+            self.offsets = section('Q', self.size + 1)
+        elif layout in (QUADRATIC, ROBIN_HOOD):
+            self.hashes = section('Q', capacity)
+            self.offsets = section('Q', capacity + 1)
+            self.states = section('B', capacity)
+        elif layout == PERFECT:
+            self.starts = section('Q', capacity)
+            self.hashes = section('Q', self.size)
+            self.offsets = section('Q', self.size + 1)
+        else:
+            raise ValueError(f"Unknown snapshot layout {layout}")
+        self.entries = view[position:]
+
+        # The last offset is where the entries end
+        if self.offsets[-1] > len(self.entries):
+            raise ValueError("Snapshot is truncated")
+
+    def function(self, function=None) -> callable:
+        """
+        Returns the hash function the map was built with: the given one, or
+        else the registered function the snapshot names. Mixing for a power
+        of two capacity is not applied.
+        """
+        if function is None:
+            if not self.name:
+                raise ValueError("The map was saved with an unregistered hash "
+                                 "function, which must be given to load it")
+            function = self.name
+        return get_hash_function(function)
+
+    def entry(self, number: int) -> tuple:
+        """Return the unpickled (key, value) pair of the given entry."""
+        return pickle.loads(self.entries[self.offsets[number]:self.offsets[number + 1]])
+
+    def release(self) -> None:
+        """Release the section views so the buffer can be closed."""
+        for name in ('starts', 'hashes', 'offsets', 'states', 'entries'):
+            data = getattr(self, name)
+            if data is not None:
+                data.release()
+
+
+def _read(path: str, layouts: tuple) -> _Snapshot:
+    """
+    Reads a whole snapshot file, which must have one of the given layouts.
+    """
+    with open(path, 'rb') as file:
+        snapshot = _Snapshot(file.read())
+    if snapshot.layout not in layouts:
+        raise ValueError("The snapshot holds a different kind of HashMap")
+    return snapshot
+
+
+def _check_capacity(hash_map, snapshot: _Snapshot) -> None:
+    """Make sure a new map got the capacity the snapshot was saved with."""
+    if hash_map._capacity != snapshot.capacity:
+        raise ValueError(f"Snapshot capacity {snapshot.capacity} is not a "
+                         f"capacity this HashMap can have")
+
+
+def load_chaining(cls, path: str, function=None):
+    """
+    Loads a separate chaining HashMap saved by save_chaining. Chains are
+    rebuilt from the cached hashes without calling the hash function.
+
+    :param cls:         HashMap class to create
+    :param path:        snapshot file
+    :param function:    hash function, if the saved one was not registered
+
+    :return:            the loaded map
+    """
+    snapshot = _read(path, (CHAINING,))
+    hash_map = cls(snapshot.capacity, snapshot.function(function),
+                   power_of_two=bool(snapshot.flags & _MIXED))
+    _check_capacity(hash_map, snapshot)
+
+    starts = snapshot.starts
+    hashes = snapshot.hashes
+    for index in range(snapshot.capacity):
+        start, end = starts[index], starts[index + 1]
+        if start == end:
+            continue
+
+        # Insert at the front in reverse to keep the saved chain order
+        bucket = hash_map._new_bucket(index)
+        for number in range(end - 1, start - 1, -1):
+            key, value = snapshot.entry(number)
+            bucket.insert(key, value, hashes[number])
+
+    hash_map._size = snapshot.size
+    snapshot.release()
+    return hash_map
+
+
+def load_open_addressing(cls, path: str, function=None, layout: int = QUADRATIC):
+    """
+    Loads an open addressing HashMap saved by save_open_addressing. Every
+    entry goes back to the slot it was saved from, so nothing is rehashed.
+
+    :param cls:         HashMap class to create
+    :param path:        snapshot file
+    :param function:    hash function, if the saved one was not registered
+    :param layout:      QUADRATIC or ROBIN_HOOD, how cls probes
+
+    :return:            the loaded map
+    """
+    snapshot = _read(path, (layout,))
+    function = snapshot.function(function)
+    if layout == ROBIN_HOOD:
+        hash_map = cls(snapshot.capacity, function, max_load=snapshot.max_load)
+    else:
+        hash_map = cls(snapshot.capacity, function)
+    _check_capacity(hash_map, snapshot)
+
+    buckets = hash_map._buckets._data
+    hashes = snapshot.hashes
+    states = snapshot.states
+    for index in range(snapshot.capacity):
+        state = states[index]
+        if state == _LIVE:
+            key, value = snapshot.entry(index)
+            buckets[index] = HashEntry(key, value, hashes[index])
+        elif state == _TOMBSTONE:
+            tombstone = HashEntry(None, None, 0)
+            tombstone.is_tombstone = True
+            buckets[index] = tombstone
+
+    hash_map._size = snapshot.size
+    hash_map._tombstones = snapshot.tombstones
+    snapshot.release()
+    return hash_map
+
+
+def load_perfect(cls, path: str, function=None):
+    """
+    Loads a FrozenHashMap saved by save_perfect.
+
+    :param cls:         FrozenHashMap class to create
+    :param path:        snapshot file
+    :param function:    hash function, if the saved one was not registered
+
+    :return:            the loaded map
+    """
+    snapshot = _read(path, (PERFECT,))
+    entries = [snapshot.entry(number) for number in range(snapshot.size)]
+    frozen_map = cls._from_table(snapshot.function(function), snapshot.tombstones,
+                                 array('Q', snapshot.starts),
+                                 array('Q', snapshot.hashes),
+                                 [key for key, _ in entries],
+                                 [value for _, value in entries])
+    snapshot.release()
+    return frozen_map
+
+
+# ------------------------- Memory mapped map --------------------------- #
+
+class MappedHashMap:
+    """
+    Read-only HashMap served from a memory mapped snapshot file. Opening it
+    only reads the header and checks that the sections fit in the file, and
+    each lookup probes the mapped table and unpickles just the entries whose
+    cached hash matches, so pages are read from disk as they are needed.
+    """
+
+    def __init__(self, path: str, function=None, verify: bool = False) -> None:
+        """
+        Map the snapshot file at path. The hash function is the one the
+        snapshot names unless another one is given.
+
+        Checksumming reads the whole file, so it is only done on opening when
+        verify is True; verify() checks it later.
+        """
+        with open(path, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._snapshot = _Snapshot(self._mmap, verify)
+            self._hash_function = self._snapshot.function(function)
+            if self._snapshot.flags & _MIXED:
+                self._hash_function = make_mixed_hash(self._hash_function)
+        except BaseException:
+            self._mmap.close()
+            raise
+
+    def __enter__(self) -> "MappedHashMap":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def verify(self) -> None:
+        """
+        Checks the whole file against the checksum in its header, raising
+        ValueError if it does not match.
+
+        :return:    None
+        """
+        with memoryview(self._mmap) as view:
+            _verify(view)
+
+    def close(self) -> None:
+        """
+        Unmaps the file. The map cannot be used afterwards.
+        """
+        if self._mmap is not None:
+            self._snapshot.release()
+            self._mmap.close()
+            self._mmap = None
+
+    def get_size(self) -> int:
+        """
+        Return size of map
+        """
+        return self._snapshot.size
+
+    def get_capacity(self) -> int:
+        """
+        Return capacity of map, the number of slots of a perfect hash table
+        """
+        if self._snapshot.layout == PERFECT:
+            return self._snapshot.size
+        return self._snapshot.capacity
+
+    def table_load(self) -> float:
+        """
+        Returns the hash table load factor.
+
+        :return:    load factor of hash table
+        """
+        if not self._snapshot.size:
+            return 0.0
+        return self._snapshot.size / self.get_capacity()
+
+    def _find(self, key: str) -> tuple:
+        """
+        Returns the (key, value) entry for the given key, or None.
+        """
+        snapshot = self._snapshot
+        hash = self._hash_function(key)
+        capacity = snapshot.capacity
+        hashes = snapshot.hashes
+        index = hash % capacity
+
+        if snapshot.layout == PERFECT:
+            # Displacements are per bucket, so index is the key's bucket
+            if not snapshot.size:
+                return None
+            slot = displaced_index(hash, snapshot.starts[index], snapshot.size,
+                                   snapshot.tombstones)
+            if hashes[slot] == hash:
+                entry = snapshot.entry(slot)
+                if entry[0] == key:
+                    return entry
+            return None
+
+        if snapshot.layout == CHAINING:
+            for number in range(snapshot.starts[index], snapshot.starts[index + 1]):
+                if hashes[number] == hash:
+                    entry = snapshot.entry(number)
+                    if entry[0] == key:
+                        return entry
+            return None
+
+        states = snapshot.states
+        for distance in range(capacity):
+            if snapshot.layout == QUADRATIC:
+                slot = (index + distance * distance) % capacity
+            else:
+                slot = (index + distance) % capacity
+            state = states[slot]
+            if state == _EMPTY:
+                return None
+            if state == _LIVE and hashes[slot] == hash:
+                entry = snapshot.entry(slot)
+                if entry[0] == key:
+                    return entry
+
+            # Robin Hood tables stop at an entry closer to its home bucket
+            if (snapshot.layout == ROBIN_HOOD
+                    and (slot - hashes[slot]) % capacity < distance):
+                return None
+        return None
+
+    def get(self, key: str) -> object:
+        """
+        Returns the value associated with the given key. If the key is not in
+        the hash map, the method returns None.
+
+        :param key: key to search for in hash map
+
+        :return:    value associated with key or None if key not found
+        """
+        entry = self._find(key)
+        return entry[1] if entry else None
+
+    def contains_key(self, key: str) -> bool:
+        """
+        Returns True if the given key is in the hash map, otherwise it returns False.
+
+        :param key: key to be searched for in hash map
+
+        :return:    True/False depending on if key is found
+        """
+        return self._find(key) is not None
+
+    def items(self):
+        """
+        Yields every (key, value) pair in table order.
+        """
+        snapshot = self._snapshot
+        if snapshot.layout in (CHAINING, PERFECT):
+            for number in range(snapshot.size):
+                yield snapshot.entry(number)
+            return
+        for slot in range(snapshot.capacity):
+            if snapshot.states[slot] == _LIVE:
+                yield snapshot.entry(slot)
@@ -11,34 +11,99 @@
 #               of a dynamic array using the hash map.
 
 
-from a6_include import (DynamicArray, LinkedList,
+import functools
+import multiprocessing
+
+from a6_include import (DynamicArray, LinkedList, SLNode,
                         hash_function_1, hash_function_2)
+from hash_functions import get_hash_function, hash_indices, make_mixed_hash
+from hash_map_frozen import FrozenHashMap
+import hash_map_persist
+from hash_map_stats import instrument
+import hash_map_ttl
+from primes import is_prime, next_prime
+
+
+# Shared stand-in for every empty bucket. Reads treat it like any empty
+# LinkedList, and writes replace it with a real one first, so nothing is
+# ever inserted into it and empty buckets cost no allocation
+_EMPTY_BUCKET = LinkedList()
 
 
 class HashMap:
+    # Non-empty buckets migrated per operation while an incremental resize is
+    # running; a step also gives up after visiting ten times as many empty ones
+    _REHASH_BUCKETS = 4
+
     def __init__(self,
                  capacity: int = 11,
-                 function: callable = hash_function_1) -> None:
+                 function: callable = hash_function_1,
+                 incremental: bool = False,
+                 expected_size: int = None,
+                 stats: bool = False,
+                 power_of_two: bool = False) -> None:
         """
         Initialize new HashMap that uses
         separate chaining for collision resolution
-        DO NOT CHANGE THIS METHOD IN ANY WAY
+
+        The hash function may be given as a callable or as the name of a
+        function registered in hash_functions, such as 'xxh64'.
+
+        When incremental is True, growing the table keeps the old bucket array
+        around and migrates a few buckets on every put / get / remove instead
+        of rehashing everything inside a single put.
+
+        When expected_size is given, the table starts out large enough to hold
+        that many entries without resizing.
+
+        When stats is True, the map records probe counts, resizes and hash
+        function time, which stats() returns.
+
+        When power_of_two is True, capacities are rounded up to a power of two
+        instead of a prime, and hashes are mixed so that their low bits, which
+        alone select the bucket, are well spread.
         """
-        self._buckets = DynamicArray()
+        # Size the table like put would grow it if it cannot hold the entries
+        if expected_size is not None and expected_size > 10 * capacity:
+            capacity = expected_size * 2
+
+        # capacity must be a prime number, or a power of two in that mode
+        self._power_of_two = power_of_two
+        if power_of_two:
+            self._capacity = self._table_capacity(capacity)
+        else:
+            self._capacity = self._next_prime(capacity)
+        self._buckets = self._new_buckets(self._capacity)
 
-        # capacity must be a prime number
-        self._capacity = self._next_prime(capacity)
-        for _ in range(self._capacity):
-            self._buckets.append(LinkedList())
+        # Number of non-empty buckets in the main table
+        self._used_buckets = 0
 
-        self._hash_function = function
+        # With a power of two capacity hash % capacity keeps only the low bits
+        self._hash_function = get_hash_function(function)
+        if power_of_two:
+            self._hash_function = make_mixed_hash(self._hash_function)
         self._size = 0
 
+        # Structural changes so far, iterators use it to fail fast
+        self._modifications = 0
+
+        # Old bucket array that is still being migrated, if any
+        self._incremental = incremental
+        self._old_buckets = None
+        self._old_capacity = 0
+        self._rehash_index = 0
+
+        # Deadlines of keys put with a ttl, created by the first such put
+        self._expiry = None
+
+        self._stats = instrument(self) if stats else None
+
     def __str__(self) -> str:
         """
         Override string method to provide more readable output
         DO NOT CHANGE THIS METHOD IN ANY WAY
         """
+        self._finish_rehash()
         out = ''
         for i in range(self._buckets.length()):
             out += str(i) + ': ' + str(self._buckets[i]) + '\n'
@@ -47,35 +112,27 @@ class HashMap:
     def _next_prime(self, capacity: int) -> int:
         """
         Increment from given number and the find the closest prime number
-        DO NOT CHANGE THIS METHOD IN ANY WAY
         """
-        if capacity % 2 == 0:
-            capacity += 1
-
-        while not self._is_prime(capacity):
-            capacity += 2
-
-        return capacity
+        return next_prime(capacity)
 
     @staticmethod
     def _is_prime(capacity: int) -> bool:
         """
         Determine if given integer is a prime number and return boolean
-        DO NOT CHANGE THIS METHOD IN ANY WAY
         """
-        if capacity == 2 or capacity == 3:
-            return True
-
-        if capacity == 1 or capacity % 2 == 0:
-            return False
-
-        factor = 3
-        while factor ** 2 <= capacity:
-            if capacity % factor == 0:
-                return False
-            factor += 2
+        return is_prime(capacity)
 
-        return True
+    def _table_capacity(self, capacity: int) -> int:
+        """
+        Returns the capacity a table resized to the given capacity gets: the
+        capacity itself if it is prime and otherwise the next prime, or the
+        next power of two (at least 2) in power of two mode.
+        """
+        if self._power_of_two:
+            return 1 << max(capacity - 1, 1).bit_length()
+        if self._is_prime(capacity):
+            return capacity
+        return self._next_prime(capacity)
 
     def get_size(self) -> int:
         """
@@ -93,38 +150,121 @@ class HashMap:
 
     # ------------------------------------------------------------------ #
 
-    def put(self, key: str, value: object, update_size: bool=True) -> None:
+    def put(self, key: str, value: object, update_size: bool=True,
+            ttl: float = None) -> None:
         """
         Updates the key / value pair in the hash map. If the given key already 
         exists in the hash map, its associated value is replaced with the new 
         value. If the given key is not in the hash map, a new key / value 
         pair is added.
 
+        With a ttl the key expires that many seconds later, see hash_map_ttl;
+        without one, any ttl the key had is dropped.
+
+        :param key:         key to be used in the key / value pair
+        :param value:       value to be used in the key / value pair
+        :param update_size: boolean value to determine if size is auto adujusted
+        :param ttl:         seconds until the key expires, or None
+
+        :return:        None
+        """
+        if ttl is not None or self._expiry is not None:
+            hash_map_ttl.set_ttl(self, key, ttl)
+        if self._old_buckets is not None:
+            self._rehash_step()
+        self._put(key, value, self._hash_function(key), update_size)
+
+    def _put(self, key: str, value: object, hash: int, update_size: bool) -> None:
+        """
+        Updates the key / value pair in the hash map using an already computed
+        hash of the key, which is cached in the bucket's node.
+
         :param key:         key to be used in the key / value pair
         :param value:       value to be used in the key / value pair
+        :param hash:        hash of the key
         :param update_size: boolean value to determine if size is auto adujusted
 
         :return:        None
         """
+        # Update the key in place if it still lives in the old bucket array
+        if self._old_buckets is not None:
+            node = self._find_old(key, hash)
+            if node:
+                node.value = value
+                return
+
         # Determine the index of the given key
-        hash = self._hash_function(key)
         index = hash % self._capacity
 
         # Find the bucket the key / value pair will be located
         bucket = self._buckets.get_at_index(index)
 
         # Check if bucket contains key / value pair and update or add accordingly
-        node = bucket.contains(key)
+        node = bucket.contains(key, hash)
         if node:
             node.value = value
         else:
-            bucket.insert(key, value)
+            if bucket is _EMPTY_BUCKET:
+                bucket = self._new_bucket(index)
+            bucket.insert(key, value, hash)
             self._size += 1
+            self._modifications += 1
 
         # Resizes table if load factor gets too high by default
         if update_size and self.table_load() > 10:
             new_capacity = self._size * 2
-            self.resize_table(new_capacity)
+            if self._incremental:
+                self._start_rehash(new_capacity)
+            else:
+                self.resize_table(new_capacity)
+
+    def increment(self, key: str, amount: int = 1) -> int:
+        """
+        Adds amount to the value associated with the given key, which starts
+        at 0 if the key is not in the hash map, with a single search for the
+        key. It is the counting step of find_mode.
+
+        :param key:     key whose count is increased
+        :param amount:  number to add to the key's value
+
+        :return:        new value associated with the key
+        """
+        if self._expiry is not None:
+            hash_map_ttl.expire_key(self, key)
+        if self._old_buckets is not None:
+            self._rehash_step()
+        hash = self._hash_function(key)
+
+        # Count the key in place if it still lives in the old bucket array
+        if self._old_buckets is not None:
+            node = self._find_old(key, hash)
+            if node:
+                node.value += amount
+                return node.value
+
+        # Find the bucket the key belongs to
+        index = hash % self._capacity
+        bucket = self._buckets.get_at_index(index)
+
+        # Check if bucket contains the key and count it or add it accordingly
+        node = bucket.contains(key, hash)
+        if node:
+            node.value += amount
+            return node.value
+
+        if bucket is _EMPTY_BUCKET:
+            bucket = self._new_bucket(index)
+        bucket.insert(key, amount, hash)
+        self._size += 1
+        self._modifications += 1
+
+        # Resizes table if load factor gets too high
+        if self.table_load() > 10:
+            if self._incremental:
+                self._start_rehash(self._size * 2)
+            else:
+                self.resize_table(self._size * 2)
+        return amount
 
     def empty_buckets(self) -> int:
         """
@@ -132,15 +272,10 @@ class HashMap:
 
         :return:    empty buckets in the hash table
         """
-        # Iterate through buckets tracking the empty ones
-        empty_buckets = 0
-        for num in range(self._capacity):
-            bucket = self._buckets.get_at_index(num)
-            if bucket.length() == 0:
-                empty_buckets += 1
+        self._finish_rehash()
 
-        # Return the number of empty buckets
-        return empty_buckets
+        # Non-empty buckets are counted as they fill up and empty out
+        return self._capacity - self._used_buckets
 
     def table_load(self) -> float:
         """
@@ -161,12 +296,44 @@ class HashMap:
 
         :return:    None
         """
-        # Iterate through buckets and clear out the underlying linked lists
-        for num in range(self._capacity):
-            self._buckets.set_at_index(num, LinkedList())
-        
+        # Drop any old bucket array that was still being migrated
+        self._old_buckets = None
+        self._expiry = None
+
+        # Start over with a fresh array of empty buckets, unless every bucket
+        # is still empty
+        if self._used_buckets:
+            self._buckets = self._new_buckets(self._capacity)
+            self._used_buckets = 0
+
         # Reset size to zero when finished
         self._size = 0
+        self._modifications += 1
+
+    def _new_buckets(self, capacity: int) -> DynamicArray:
+        """
+        Returns a bucket array of the given capacity where every bucket is the
+        shared empty bucket.
+
+        :param capacity:    number of buckets
+
+        :return:            new bucket array
+        """
+        return DynamicArray([_EMPTY_BUCKET] * capacity)
+
+    def _new_bucket(self, index: int) -> LinkedList:
+        """
+        Replaces the shared empty bucket at the given index of the main table
+        with a LinkedList of its own, which a node is about to be added to.
+
+        :param index:   index of an empty bucket
+
+        :return:        the new bucket
+        """
+        bucket = LinkedList()
+        self._buckets.set_at_index(index, bucket)
+        self._used_buckets += 1
+        return bucket
 
     def resize_table(self, new_capacity: int) -> None:
         """
@@ -182,28 +349,217 @@ class HashMap:
         if new_capacity < 1:
             return
 
+        self._finish_rehash()
+
         # Store old array and capacity
         old_map = self._buckets
         old_capacity = self._capacity
 
         # Create new hash map with updated capacity and size
-        self._buckets = DynamicArray()
+        self._capacity = self._table_capacity(new_capacity)
+        self._buckets = self._new_buckets(self._capacity)
+        self._used_buckets = 0
+        self._modifications += 1
 
-        if self._is_prime(new_capacity):
-            self._capacity = new_capacity
-        else:
-            self._capacity = self._next_prime(new_capacity)
+        # Move every node from the old array straight into the new table
+        self._relocate(old_map, old_capacity)
 
-        for _ in range(self._capacity):
-            self._buckets.append(LinkedList())
+    def reserve(self, size: int) -> None:
+        """
+        Makes room for the given total number of entries, so that inserting
+        up to that many keys never resizes the table. If that many entries
+        would push the load factor above 10, the table is resized the same way
+        put grows it, to twice the number of entries.
 
-        self._size = 0
+        :param size:    number of entries the hash map should hold
+
+        :return:        None
+        """
+        if size > 10 * self._capacity:
+            self.resize_table(size * 2)
+
+    def _relocate(self, old_map: DynamicArray, old_capacity: int) -> None:
+        """
+        Moves all nodes of an old bucket array into the current, empty table in
+        one pass. Keys are known to be unique, so nodes are relinked into their
+        new buckets by cached hash without duplicate checks, load checks or
+        size updates.
+
+        :param old_map:         bucket array to move nodes out of
+        :param old_capacity:    number of buckets in the old array
+
+        :return:                None
+        """
+        buckets = self._buckets._data
+        capacity = self._capacity
+        used = 0
 
-        # Iterate through all buckets in old array and rehash values to new table
         for num in range(old_capacity):
-            bucket = old_map.get_at_index(num)
+            # The iterator steps past each node before it is relinked
+            for node in old_map.get_at_index(num):
+                index = node.hash % capacity
+                bucket = buckets[index]
+                if bucket is _EMPTY_BUCKET:
+                    bucket = buckets[index] = LinkedList()
+                    used += 1
+                bucket.insert_node(node)
+
+        self._used_buckets += used
+
+    def _start_rehash(self, new_capacity: int) -> None:
+        """
+        Begins an incremental resize. A new bucket array of the new capacity
+        becomes the main table and the current array is kept as the old table,
+        whose buckets are moved over a few at a time by _rehash_step.
+
+        :param new_capacity:    new capacity of the hash map
+
+        :return:                None
+        """
+        # Only one migration runs at a time
+        self._finish_rehash()
+
+        self._old_buckets = self._buckets
+        self._old_capacity = self._capacity
+        self._rehash_index = 0
+
+        self._capacity = self._table_capacity(new_capacity)
+        self._buckets = self._new_buckets(self._capacity)
+        self._used_buckets = 0
+        self._modifications += 1
+
+    def _rehash_step(self, buckets: int = _REHASH_BUCKETS) -> None:
+        """
+        Migrates up to the given number of non-empty buckets from the old
+        bucket array into the main table, skipping a bounded number of empty
+        buckets along the way. Ends the migration once the old array is done.
+
+        :param buckets: number of non-empty buckets to migrate
+
+        :return:        None
+        """
+        old_map = self._old_buckets
+        new_map = self._buckets._data
+        capacity = self._capacity
+        used = 0
+        empty_visits = buckets * 10
+        index = self._rehash_index
+
+        while buckets > 0 and index < self._old_capacity:
+            bucket = old_map.get_at_index(index)
+            index += 1
+            if bucket.length() == 0:
+                empty_visits -= 1
+                if empty_visits == 0:
+                    break
+                continue
+
+            # The iterator steps past each node before it is relinked
             for node in bucket:
-                self.put(node.key, node.value, False)
+                new_index = node.hash % capacity
+                new_bucket = new_map[new_index]
+                if new_bucket is _EMPTY_BUCKET:
+                    new_bucket = new_map[new_index] = LinkedList()
+                    used += 1
+                new_bucket.insert_node(node)
+            buckets -= 1
+
+        self._used_buckets += used
+        self._rehash_index = index
+        if index >= self._old_capacity:
+            self._old_buckets = None
+
+    def _finish_rehash(self) -> None:
+        """
+        Completes any incremental resize that is still running.
+
+        :return:    None
+        """
+        if self._old_buckets is not None:
+            self._rehash_step(self._old_capacity)
+
+    def _find_old(self, key: str, hash: int) -> object:
+        """
+        Returns the node for the given key if it is still in a bucket of the
+        old bucket array that has not been migrated yet, otherwise None.
+
+        :param key:     key to search for
+        :param hash:    hash of the key
+
+        :return:        node with matching key or None
+        """
+        index = hash % self._old_capacity
+        if index < self._rehash_index:
+            return None
+        return self._old_buckets.get_at_index(index).contains(key, hash)
+
+    def _find(self, key: str, hash: int) -> SLNode:
+        """
+        Returns the node for the given key, in the main table or a bucket of
+        the old bucket array that has not been migrated yet, or None.
+
+        :param key:     key to search for
+        :param hash:    hash of the key
+
+        :return:        node with matching key or None
+        """
+        node = self._buckets.get_at_index(hash % self._capacity).contains(key, hash)
+        if not node and self._old_buckets is not None:
+            node = self._find_old(key, hash)
+        return node
+
+    def _insert_node(self, node: SLNode) -> None:
+        """
+        Adds a node whose key is not in the hash map, with its hash already
+        cached, and grows the table like put. Nodes are only ever relinked
+        afterwards, so subclasses of SLNode keep their extra fields.
+
+        :param node:    node to add
+
+        :return:        None
+        """
+        if self._old_buckets is not None:
+            self._rehash_step()
+
+        index = node.hash % self._capacity
+        bucket = self._buckets.get_at_index(index)
+        if bucket is _EMPTY_BUCKET:
+            bucket = self._new_bucket(index)
+        bucket.insert_node(node)
+        self._size += 1
+        self._modifications += 1
+
+        if self.table_load() > 10:
+            if self._incremental:
+                self._start_rehash(self._size * 2)
+            else:
+                self.resize_table(self._size * 2)
+
+    def _remove_node(self, node: SLNode) -> None:
+        """
+        Removes a node added by _insert_node, using its cached hash instead of
+        hashing the key again. A key with a ttl should be removed with remove.
+
+        :param node:    node to remove
+
+        :return:        None
+        """
+        if self._old_buckets is not None:
+            self._rehash_step()
+
+        index = node.hash % self._capacity
+        bucket = self._buckets.get_at_index(index)
+        result = bucket.remove_node(node)
+        if result and bucket.length() == 0:
+            self._buckets.set_at_index(index, _EMPTY_BUCKET)
+            self._used_buckets -= 1
+        if not result and self._old_buckets is not None:
+            old_index = node.hash % self._old_capacity
+            if old_index >= self._rehash_index:
+                result = self._old_buckets.get_at_index(old_index).remove_node(node)
+        if result:
+            self._size -= 1
+            self._modifications += 1
 
     def get(self, key: str) -> object:
         """
@@ -214,6 +570,11 @@ class HashMap:
 
         :return:    value associated with key or None if key not found
         """
+        if self._expiry is not None and hash_map_ttl.expire_key(self, key):
+            return None
+        if self._old_buckets is not None:
+            self._rehash_step()
+
         # Determine the index of the given key
         hash = self._hash_function(key)
         index = hash % self._capacity
@@ -222,7 +583,9 @@ class HashMap:
         bucket = self._buckets.get_at_index(index)
 
         # Check if bucket contains key / value pair and return value if found
-        node = bucket.contains(key)
+        node = bucket.contains(key, hash)
+        if not node and self._old_buckets is not None:
+            node = self._find_old(key, hash)
         if node:
             return node.value
 
@@ -238,6 +601,11 @@ class HashMap:
         if self._size == 0:
             return False
 
+        if self._expiry is not None and hash_map_ttl.expire_key(self, key):
+            return False
+        if self._old_buckets is not None:
+            self._rehash_step()
+
         # Determine the index of the given key
         hash = self._hash_function(key)
         index = hash % self._capacity
@@ -246,7 +614,9 @@ class HashMap:
         bucket = self._buckets.get_at_index(index)
 
         # Check if bucket contains key / value pair and return results
-        node = bucket.contains(key)
+        node = bucket.contains(key, hash)
+        if not node and self._old_buckets is not None:
+            node = self._find_old(key, hash)
         if node:
             return True
         else:
@@ -261,6 +631,11 @@ class HashMap:
 
         :return:    None
         """
+        if self._expiry is not None:
+            self._expiry.discard(key)
+        if self._old_buckets is not None:
+            self._rehash_step()
+
         # Determine the index of the given key
         hash = self._hash_function(key)
         index = hash % self._capacity
@@ -269,9 +644,43 @@ class HashMap:
         bucket = self._buckets.get_at_index(index)
 
         # Check if bucket contains key / value and remove if found
-        result = bucket.remove(key)
+        result = bucket.remove(key, hash)
+        if result and bucket.length() == 0:
+            self._buckets.set_at_index(index, _EMPTY_BUCKET)
+            self._used_buckets -= 1
+        if not result and self._old_buckets is not None:
+            old_index = hash % self._old_capacity
+            if old_index >= self._rehash_index:
+                result = self._old_buckets.get_at_index(old_index).remove(key, hash)
         if result:
             self._size -= 1
+            self._modifications += 1
+
+    def get_ttl(self, key: str) -> float:
+        """
+        Returns the number of seconds before the given key expires, or None if
+        it was not put with a ttl.
+
+        :param key: key to look up
+
+        :return:    seconds left, 0 once the key has expired
+        """
+        if self._expiry is None:
+            return None
+        return self._expiry.remaining(key)
+
+    def expire(self, limit: int = None) -> int:
+        """
+        Removes up to limit keys whose ttl has passed, found on a timing wheel
+        without scanning the map. Expired keys are otherwise only removed as
+        they are looked up or by later puts, so until then they still count
+        towards the size and appear when iterating.
+
+        :param limit:   most keys to remove, or None for all expired keys
+
+        :return:        number of keys removed
+        """
+        return hash_map_ttl.expire(self, limit)
 
     def get_keys_and_values(self) -> DynamicArray:
         """
@@ -288,49 +697,360 @@ class HashMap:
                 key_val_pair = (node.key, node.value)
                 key_val_arr.append(key_val_pair)
 
+        # Include buckets of an old array that have not been migrated yet
+        if self._old_buckets is not None:
+            for num in range(self._rehash_index, self._old_capacity):
+                for node in self._old_buckets.get_at_index(num):
+                    key_val_arr.append((node.key, node.value))
+
         # Return array of key / value pairs
         return key_val_arr
 
-def find_mode(da: DynamicArray) -> (DynamicArray, int):
+    def keys(self):
+        """
+        Returns a generator over the keys of the hash map, see items().
+
+        :return:    generator of keys
+        """
+        for key, _ in self.items():
+            yield key
+
+    def values(self):
+        """
+        Returns a generator over the values of the hash map, see items().
+
+        :return:    generator of values
+        """
+        for _, value in self.items():
+            yield value
+
+    def items(self):
+        """
+        Returns a generator over the key / value pairs of the hash map, in the
+        same order as get_keys_and_values but without building an array of
+        them first.
+
+        Any incremental resize that is still running is completed first, so
+        that lookups made while iterating do not move nodes.
+
+        Updating the value of an existing key while iterating is allowed, but
+        adding or removing keys, clearing or resizing the map makes the next
+        step of the generator raise RuntimeError.
+
+        :return:    generator of (key, value) tuples
+        """
+        self._finish_rehash()
+        modifications = self._modifications
+        for bucket in self._buckets._data:
+            for node in bucket:
+                if self._modifications != modifications:
+                    raise RuntimeError("HashMap changed during iteration")
+                yield node.key, node.value
+
+        # Changes made after the last pair was returned may have hidden pairs
+        if self._modifications != modifications:
+            raise RuntimeError("HashMap changed during iteration")
+
+    def iter_batches(self, n: int):
+        """
+        Returns a generator over the key / value pairs of the hash map in
+        dynamic arrays of n pairs each (the last one may be shorter), with the
+        same modification checks as items().
+
+        :param n:   number of pairs per batch
+
+        :return:    generator of dynamic arrays of (key, value) tuples
+        """
+        if n < 1:
+            raise ValueError("Batch size must be at least 1")
+
+        batch = []
+        for item in self.items():
+            batch.append(item)
+            if len(batch) == n:
+                yield DynamicArray(batch)
+                batch = []
+        if batch:
+            yield DynamicArray(batch)
+
+    # ------------------------------------------------------------------ #
+
+    def put_many(self, pairs) -> None:
+        """
+        Updates the hash map with every key / value pair of the given iterable,
+        like calling put for each of them. The table is resized at most once,
+        up front, to fit the whole batch.
+
+        :param pairs:   iterable of key / value pairs
+
+        :return:        None
+        """
+        pairs = list(pairs)
+        self._finish_rehash()
+
+        # Like put without a ttl, every key loses any ttl it had
+        if self._expiry is not None:
+            for key, _ in pairs:
+                self._expiry.discard(key)
+
+        # Size the table for the batch as if every key were new
+        self.reserve(self._size + len(pairs))
+
+        # Hash the whole batch up front, then index the underlying list
+        # directly, every index is in range
+        buckets = self._buckets._data
+        hashes, indices = hash_indices([key for key, _ in pairs],
+                                       self._hash_function, self._capacity)
+        added = 0
+
+        for (key, value), hash, index in zip(pairs, hashes, indices):
+            bucket = buckets[index]
+            node = bucket.contains(key, hash)
+            if node:
+                node.value = value
+            else:
+                if bucket is _EMPTY_BUCKET:
+                    bucket = buckets[index] = LinkedList()
+                    self._used_buckets += 1
+                bucket.insert(key, value, hash)
+                added += 1
+
+        self._size += added
+        self._modifications += added
+
+    def get_many(self, keys) -> DynamicArray:
+        """
+        Returns a dynamic array with the value associated with each of the
+        given keys, or None for keys that are not in the hash map.
+
+        :param keys:    iterable of keys to search for
+
+        :return:        dynamic array of values in the same order as the keys
+        """
+        keys = list(keys)
+        if self._expiry is not None:
+            hash_map_ttl.expire_keys(self, keys)
+        self._finish_rehash()
+        buckets = self._buckets._data
+        hashes, indices = hash_indices(keys, self._hash_function, self._capacity)
+
+        values = []
+        for key, hash, index in zip(keys, hashes, indices):
+            node = buckets[index].contains(key, hash)
+            values.append(node.value if node else None)
+        return DynamicArray(values)
+
+    def contains_many(self, keys) -> DynamicArray:
+        """
+        Returns a dynamic array with True or False for each of the given keys
+        depending on if the key is in the hash map.
+
+        :param keys:    iterable of keys to search for
+
+        :return:        dynamic array of booleans in the same order as the keys
+        """
+        keys = list(keys)
+        if self._expiry is not None:
+            hash_map_ttl.expire_keys(self, keys)
+        self._finish_rehash()
+        buckets = self._buckets._data
+        hashes, indices = hash_indices(keys, self._hash_function, self._capacity)
+
+        results = []
+        for key, hash, index in zip(keys, hashes, indices):
+            results.append(buckets[index].contains(key, hash) is not None)
+        return DynamicArray(results)
+
+    def remove_many(self, keys) -> None:
+        """
+        Removes each of the given keys and its associated value from the hash
+        map. Keys that are not in the hash map are ignored.
+
+        :param keys:    iterable of keys to remove
+
+        :return:        None
+        """
+        keys = list(keys)
+        if self._expiry is not None:
+            for key in keys:
+                self._expiry.discard(key)
+        self._finish_rehash()
+        buckets = self._buckets._data
+        hashes, indices = hash_indices(keys, self._hash_function, self._capacity)
+
+        removed = 0
+        for key, hash, index in zip(keys, hashes, indices):
+            bucket = buckets[index]
+            if bucket.remove(key, hash):
+                removed += 1
+                if bucket.length() == 0:
+                    buckets[index] = _EMPTY_BUCKET
+                    self._used_buckets -= 1
+        self._size -= removed
+        self._modifications += removed
+
+    def freeze(self, function: callable = 'xxh64') -> FrozenHashMap:
+        """
+        Returns an immutable copy of the hash map that finds every key with a
+        single probe, using a minimal perfect hash built with the given hash
+        function. See hash_map_frozen.
+
+        :param function:    hash function or registered name for the copy
+
+        :return:            frozen copy of the hash map
+        """
+        return FrozenHashMap(self.items(), function)
+
+    def save(self, path: str) -> None:
+        """
+        Saves the hash map to a snapshot file, from which load rebuilds it
+        without rehashing. The hash function must give the same hashes in
+        every process, so maps using 'builtin' or 'siphash' cannot be saved.
+
+        :param path:    file to write
+
+        :return:        None
+        """
+        hash_map_persist.save_chaining(self, path)
+
+    @classmethod
+    def load(cls, path: str, function: callable = None) -> "HashMap":
+        """
+        Returns the hash map saved in a snapshot file. The function is only
+        needed if the saved map's hash function was not registered.
+
+        :param path:        file to read
+        :param function:    hash function of the saved map
+
+        :return:            the loaded hash map
+        """
+        return hash_map_persist.load_chaining(cls, path, function)
+
+    def stats(self) -> dict:
+        """
+        Returns the statistics recorded since the map was created, or None if
+        it was created without stats=True.
+
+        :return:    dictionary of operation probe counts, chain lengths,
+                    resizes and hash function time, or None
+        """
+        if self._stats is None:
+            return None
+        return self._stats.snapshot(self)
+
+    def _probe_length(self, key: str, hash: int) -> int:
+        """
+        Returns the number of nodes a lookup of the given key visits in its
+        bucket, which is the whole chain when the key is not in it.
+
+        :param key:     key to search for
+        :param hash:    hash of the key
+
+        :return:        number of nodes visited
+        """
+        probes = 0
+        for node in self._buckets.get_at_index(hash % self._capacity):
+            probes += 1
+            if node.hash == hash and node.key == key:
+                break
+        return probes
+
+    def _length_histogram(self) -> dict:
+        """
+        Returns a dictionary of chain length to the number of buckets whose
+        chain has that length.
+
+        :return:    chain length histogram
+        """
+        self._finish_rehash()
+        histogram = {}
+        for bucket in self._buckets._data:
+            length = bucket.length()
+            histogram[length] = histogram.get(length, 0) + 1
+        return histogram
+
+
+def _count_chunk(values: list, function: callable) -> list:
+    """
+    Counts the values of one chunk in a new HashMap and returns its
+    (value, frequency) pairs. Runs in the worker processes of find_mode.
+    """
+    counts = HashMap(max(11, len(values) // 2), function)
+    increment = counts.increment
+    for value in values:
+        increment(value)
+    return list(counts.items())
+
+
+def find_mode(da: DynamicArray,
+              processes: int = None,
+              chunk_size: int = None,
+              function: callable = 'builtin') -> (DynamicArray, int):
     """
     Returns a tuple containing, in this order, a dynamic array comprising the 
     mode (most occurring) value/s of the array, and an integer that represents 
     the highest frequency (how many times they appear).
 
-    :param da:  dynamic array to used to search for mode
+    Frequencies are counted with one increment per value into a hash map
+    sized for the input, which therefore never resizes, and the mode(s) are
+    tracked while counting. With processes, the array is split into chunks
+    of chunk_size values that a pool of that many processes counts
+    separately, and the partial counts are merged here.
+
+    The frequency maps use the seeded built-in hash by default, which is far
+    better spread than hash_function_1 and accepts any hashable value. A
+    custom hash function must be picklable to be used with processes.
+
+    :param da:          dynamic array to used to search for mode
+    :param processes:   number of worker processes, or None to count here
+    :param chunk_size:  values per chunk, by default four chunks per process
+    :param function:    hash function or registered name for the
+                        frequency maps
 
     :return:    tuple containing a new dynamic array of most occuring values 
                 and an integer representing the highest frequency
     """
-    #Initialize hash map to store frequencies
-    map = HashMap()
+    values = da._data
 
-    # Iterate through dynamic array tracking frequency of values in hash map
-    for num in range(da.length()):
-        key = da.get_at_index(num)
-        current_freq = map.get(key)
+    # Frequency map with a bucket for every two values, so chains stay short
+    # even if every value is distinct
+    map = HashMap(max(11, len(values) // 2), function)
+    increment = map.increment
 
-        if not current_freq:
-            current_freq = 0
-        
-        map.put(key, current_freq + 1)
-
-    # Convert hash map of frequencies into array
-    map_arr = map.get_keys_and_values()
-
-    # Iterate through array of frequencies and find/store the mode(s)
+    # Every count passes through each frequency once, so a value is added to
+    # the modes when it reaches the highest frequency so far and the modes
+    # start over when it passes it
+    modes = []
     highest_freq = 0
-    for num in range(map_arr.length()):
-        key_val_pair = map_arr.get_at_index(num)
-        if key_val_pair[1] > highest_freq:
-            highest_freq = key_val_pair[1]
-            modes_arr = DynamicArray()
-            modes_arr.append(key_val_pair[0])
-        elif key_val_pair[1] == highest_freq:
-            modes_arr.append(key_val_pair[0])
-
-    # Return the mode(s) and frequency
-    return (modes_arr, highest_freq)
+
+    if processes is None or processes < 2 or len(values) < 2:
+        for value in values:
+            freq = increment(value)
+            if freq > highest_freq:
+                highest_freq = freq
+                modes = [value]
+            elif freq == highest_freq:
+                modes.append(value)
+        return (DynamicArray(modes), highest_freq)
+
+    # Count chunks in parallel and merge their counts as they arrive
+    if chunk_size is None:
+        chunk_size = -(-len(values) // (processes * 4))
+    chunks = (values[start:start + chunk_size]
+              for start in range(0, len(values), chunk_size))
+
+    with multiprocessing.Pool(processes) as pool:
+        for pairs in pool.imap_unordered(functools.partial(_count_chunk, function=function),
+                                         chunks):
+            for value, count in pairs:
+                freq = increment(value, count)
+                if freq > highest_freq:
+                    highest_freq = freq
+                    modes = [value]
+                elif freq == highest_freq:
+                    modes.append(value)
+
+    return (DynamicArray(modes), highest_freq)
 
 # ------------------- BASIC TESTING ---------------------------------------- #
 
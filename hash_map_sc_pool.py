@@ -0,0 +1,766 @@
+# Course: CS261 - Data Structures
+# Assignment: 6
+# Description:  This program contains a class for implementing hash maps that
+#               utilizes chaining to deal with hash collisions, like
+#               hash_map_sc.HashMap. Instead of a LinkedList object per bucket
+#               and an SLNode object per entry, all chains share one node pool
+#               stored as parallel flat arrays (keys, values, cached hashes and
+#               the index of the next node), and each bucket is a single int
+#               holding the index of its first node. Removed nodes are reused
+#               from a free list, and resizing only relinks the existing nodes.
+
+
+from array import array
+
+from a6_include import (DynamicArray,
+                        hash_function_1, hash_function_2)
+from hash_functions import get_hash_function, hash_many
+from hash_map_stats import instrument
+from primes import is_prime, next_prime
+
+
+# Index marking the end of a chain, an empty bucket or an empty free list
+_NIL = -1
+
+# Cached hashes are stored as unsigned 64 bit values
+_HASH_MASK = (1 << 64) - 1
+
+
+class HashMap:
+    def __init__(self,
+                 capacity: int = 11,
+                 function: callable = hash_function_1,
+                 expected_size: int = None,
+                 stats: bool = False) -> None:
+        """
+        Initialize new HashMap that uses separate chaining for collision
+        resolution and a shared node pool for storage
+
+        The hash function may be given as a callable or as the name of a
+        function registered in hash_functions, such as 'xxh64'.
+
+        When expected_size is given, the table starts out large enough to hold
+        that many entries without resizing.
+
+        When stats is True, the map records probe counts, resizes and hash
+        function time, which stats() returns.
+        """
+        # Size the table like put would grow it if it cannot hold the entries
+        if expected_size is not None and expected_size > 10 * capacity:
+            capacity = expected_size * 2
+
+        # capacity must be a prime number
+        self._capacity = self._next_prime(capacity)
+        self._heads = array('q', [_NIL]) * self._capacity
+
+        # Node pool, node i is (_keys[i], _values[i], _hashes[i], _next[i])
+        self._keys = []
+        self._values = []
+        self._hashes = array('Q')
+        self._next = array('q')
+        self._free = _NIL
+
+        self._hash_function = get_hash_function(function)
+        self._size = 0
+
+        # Structural changes so far, iterators use it to fail fast
+        self._modifications = 0
+
+        self._stats = instrument(self) if stats else None
+
+    def __str__(self) -> str:
+        """
+        Override string method to provide more readable output
+        """
+        keys, values, next = self._keys, self._values, self._next
+        out = ''
+        for i in range(self._capacity):
+            chain = []
+            node = self._heads[i]
+            while node != _NIL:
+                chain.append('(' + str(keys[node]) + ': ' + str(values[node]) + ')')
+                node = next[node]
+            out += str(i) + ': SLL [' + ' -> '.join(chain) + ']\n'
+        return out
+
+    def _next_prime(self, capacity: int) -> int:
+        """
+        Increment from given number and the find the closest prime number
+        """
+        return next_prime(capacity)
+
+    @staticmethod
+    def _is_prime(capacity: int) -> bool:
+        """
+        Determine if given integer is a prime number and return boolean
+        """
+        return is_prime(capacity)
+
+    def get_size(self) -> int:
+        """
+        Return size of map
+        """
+        return self._size
+
+    def get_capacity(self) -> int:
+        """
+        Return capacity of map
+        """
+        return self._capacity
+
+    # ------------------------------------------------------------------ #
+
+    def _find(self, key: str, hash: int) -> int:
+        """
+        Returns the pool index of the node holding the given key, or _NIL if
+        the key is not in the hash map.
+
+        :param key:     key to search for
+        :param hash:    masked hash of the key
+
+        :return:        node index of the key or _NIL if not found
+        """
+        hashes, keys, next = self._hashes, self._keys, self._next
+        node = self._heads[hash % self._capacity]
+
+        # Walk the chain, only comparing keys whose cached hash matches
+        while node != _NIL:
+            if hashes[node] == hash and keys[node] == key:
+                return node
+            node = next[node]
+        return _NIL
+
+    def put(self, key: str, value: object) -> None:
+        """
+        Updates the key / value pair in the hash map. If the given key already
+        exists in the hash map, its associated value is replaced with the new
+        value. If the given key is not in the hash map, a new key / value
+        pair is added.
+
+        :param key:     key to be used in the key / value pair
+        :param value:   value to be used in the key / value pair
+
+        :return:        None
+        """
+        self._put(key, value, self._hash_function(key) & _HASH_MASK)
+
+    def _put(self, key: str, value: object, hash: int) -> None:
+        """
+        Updates the key / value pair in the hash map using an already computed
+        masked hash of the key.
+
+        :param key:     key to be used in the key / value pair
+        :param value:   value to be used in the key / value pair
+        :param hash:    masked hash of the key
+
+        :return:        None
+        """
+        node = self._find(key, hash)
+        if node != _NIL:
+            self._values[node] = value
+            return
+
+        self._link(key, value, hash)
+        self._size += 1
+        self._modifications += 1
+
+        # Resizes table if load factor gets too high
+        if self._size > 10 * self._capacity:
+            self.resize_table(self._size * 2)
+
+    def _link(self, key: str, value: object, hash: int) -> None:
+        """
+        Takes a node from the free list, or appends one to the pool, and links
+        it at the front of its bucket's chain. Does not check for the key or
+        update the size.
+
+        :param key:     key to be used in the key / value pair
+        :param value:   value to be used in the key / value pair
+        :param hash:    masked hash of the key
+
+        :return:        None
+        """
+        node = self._free
+        if node != _NIL:
+            self._free = self._next[node]
+            self._keys[node] = key
+            self._values[node] = value
+            self._hashes[node] = hash
+        else:
+            node = len(self._keys)
+            self._keys.append(key)
+            self._values.append(value)
+            self._hashes.append(hash)
+            self._next.append(_NIL)
+
+        index = hash % self._capacity
+        self._next[node] = self._heads[index]
+        self._heads[index] = node
+
+    def empty_buckets(self) -> int:
+        """
+        Returns the number of empty buckets in the hash table.
+
+        :return:    empty buckets in the hash table
+        """
+        return self._heads.count(_NIL)
+
+    def table_load(self) -> float:
+        """
+        Returns the current hash table load factor.
+
+        :return:    load factor of hash table
+        """
+        return self._size / self._capacity
+
+    def clear(self) -> None:
+        """
+        Clears the contents of the hash map. It does not change the underlying
+        hash table capacity.
+
+        :return:    None
+        """
+        self._heads = array('q', [_NIL]) * self._capacity
+        self._keys = []
+        self._values = []
+        self._hashes = array('Q')
+        self._next = array('q')
+        self._free = _NIL
+        self._size = 0
+        self._modifications += 1
+
+    def resize_table(self, new_capacity: int) -> None:
+        """
+        Changes the capacity of the internal hash table. All existing key / value
+        pairs will remain in the new hash map, and all hash table links will be
+        rehashed.
+
+        :param new_capacity:    new capacity of the hash map
+
+        :return:                None
+        """
+        # Check if new capacity is valid
+        if new_capacity < 1:
+            return
+
+        old_heads = self._heads
+
+        if self._is_prime(new_capacity):
+            self._capacity = new_capacity
+        else:
+            self._capacity = self._next_prime(new_capacity)
+        self._heads = array('q', [_NIL]) * self._capacity
+        self._modifications += 1
+
+        # Relink the existing nodes into the new buckets
+        self._relocate(old_heads)
+
+    def reserve(self, size: int) -> None:
+        """
+        Makes room for the given total number of entries, so that inserting
+        up to that many keys never resizes the table. If that many entries
+        would push the load factor above 10, the table is resized the same way
+        put grows it, to twice the number of entries.
+
+        :param size:    number of entries the hash map should hold
+
+        :return:        None
+        """
+        if size > 10 * self._capacity:
+            self.resize_table(size * 2)
+
+    def _relocate(self, old_heads: array) -> None:
+        """
+        Moves every chain of the old bucket heads into the current, empty
+        table. Nodes stay where they are in the pool, only their next links
+        and the new bucket heads are rewritten, using each node's cached hash.
+
+        :param old_heads:   bucket heads of the old table
+
+        :return:            None
+        """
+        heads, hashes, next = self._heads, self._hashes, self._next
+        capacity = self._capacity
+
+        for node in old_heads:
+            while node != _NIL:
+                following = next[node]
+                index = hashes[node] % capacity
+                next[node] = heads[index]
+                heads[index] = node
+                node = following
+
+    def get(self, key: str) -> object:
+        """
+        Returns the value associated with the given key. If the key is not in
+        the hash map, the method returns None.
+
+        :param key: key to search for in hash map
+
+        :return:    value associated with key or None if key not found
+        """
+        node = self._find(key, self._hash_function(key) & _HASH_MASK)
+        if node != _NIL:
+            return self._values[node]
+
+    def contains_key(self, key: str) -> bool:
+        """
+        Returns True if the given key is in the hash map, otherwise it returns False.
+
+        :param key: key to be searched for in hash map
+
+        :return:    True/False depending on if key is found
+        """
+        if self._size == 0:
+            return False
+        return self._find(key, self._hash_function(key) & _HASH_MASK) != _NIL
+
+    def remove(self, key: str) -> None:
+        """
+        Removes the given key and its associated value from the hash map. If
+        the key is not in the hash map, the method does nothing.
+
+        :param key: key of key / value pair to be removed from hash map
+
+        :return:    None
+        """
+        self._unlink(key, self._hash_function(key) & _HASH_MASK)
+
+    def _unlink(self, key: str, hash: int) -> bool:
+        """
+        Unlinks the node holding the given key from its chain and puts it on
+        the free list.
+
+        :param key:     key of key / value pair to be removed
+        :param hash:    masked hash of the key
+
+        :return:        True if the key was found and removed
+        """
+        hashes, keys, next = self._hashes, self._keys, self._next
+        index = hash % self._capacity
+        previous = _NIL
+        node = self._heads[index]
+
+        while node != _NIL:
+            if hashes[node] == hash and keys[node] == key:
+                if previous == _NIL:
+                    self._heads[index] = next[node]
+                else:
+                    next[previous] = next[node]
+
+                # Drop the references so the key and value can be collected
+                keys[node] = None
+                self._values[node] = None
+                next[node] = self._free
+                self._free = node
+                self._size -= 1
+                self._modifications += 1
+                return True
+            previous = node
+            node = next[node]
+        return False
+
+    def get_keys_and_values(self) -> DynamicArray:
+        """
+        Returns a dynamic array where each index contains a tuple of a
+        key / value pair stored in the hash map.
+
+        :return:    dynamic array containing all key / value pairs in hash map
+        """
+        keys, values, next = self._keys, self._values, self._next
+        key_val_arr = DynamicArray()
+        for node in self._heads:
+            while node != _NIL:
+                key_val_arr.append((keys[node], values[node]))
+                node = next[node]
+        return key_val_arr
+
+    def keys(self):
+        """
+        Returns a generator over the keys of the hash map, see items().
+
+        :return:    generator of keys
+        """
+        for key, _ in self.items():
+            yield key
+
+    def values(self):
+        """
+        Returns a generator over the values of the hash map, see items().
+
+        :return:    generator of values
+        """
+        for _, value in self.items():
+            yield value
+
+    def items(self):
+        """
+        Returns a generator over the key / value pairs of the hash map, in the
+        same order as get_keys_and_values but without building an array of
+        them first. Updating the value of an existing key while iterating is
+        allowed, but adding or removing keys, clearing or resizing the map
+        makes the next step of the generator raise RuntimeError.
+
+        :return:    generator of (key, value) tuples
+        """
+        keys, values, next = self._keys, self._values, self._next
+        modifications = self._modifications
+        for node in self._heads:
+            while node != _NIL:
+                if self._modifications != modifications:
+                    raise RuntimeError("HashMap changed during iteration")
+                yield keys[node], values[node]
+                node = next[node]
+
+        # Changes made after the last pair was returned may have hidden pairs
+        if self._modifications != modifications:
+            raise RuntimeError("HashMap changed during iteration")
+
+    def iter_batches(self, n: int):
+        """
+        Returns a generator over the key / value pairs of the hash map in
+        dynamic arrays of n pairs each (the last one may be shorter), with the
+        same modification checks as items().
+
+        :param n:   number of pairs per batch
+
+        :return:    generator of dynamic arrays of (key, value) tuples
+        """
+        if n < 1:
+            raise ValueError("Batch size must be at least 1")
+
+        batch = []
+        for item in self.items():
+            batch.append(item)
+            if len(batch) == n:
+                yield DynamicArray(batch)
+                batch = []
+        if batch:
+            yield DynamicArray(batch)
+
+    # ------------------------------------------------------------------ #
+
+    def put_many(self, pairs) -> None:
+        """
+        Updates the hash map with every key / value pair of the given iterable,
+        like calling put for each of them. The table is resized at most once,
+        up front, to fit the whole batch.
+
+        :param pairs:   iterable of key / value pairs
+
+        :return:        None
+        """
+        pairs = list(pairs)
+
+        # Size the table for the batch as if every key were new
+        self.reserve(self._size + len(pairs))
+
+        find = self._find
+        link = self._link
+        values = self._values
+        added = 0
+
+        hashes = self._hash_batch([key for key, _ in pairs])
+        for (key, value), hash in zip(pairs, hashes):
+            node = find(key, hash)
+            if node != _NIL:
+                values[node] = value
+            else:
+                link(key, value, hash)
+                added += 1
+
+        self._size += added
+        self._modifications += added
+
+    def _hash_batch(self, keys: list) -> list:
+        """
+        Returns the masked hash of every key, hashing the whole batch at once.
+
+        :param keys:    list of keys to hash
+
+        :return:        list of masked hashes in the same order as the keys
+        """
+        return [hash & _HASH_MASK for hash in hash_many(keys, self._hash_function)]
+
+    def get_many(self, keys) -> DynamicArray:
+        """
+        Returns a dynamic array with the value associated with each of the
+        given keys, or None for keys that are not in the hash map.
+
+        :param keys:    iterable of keys to search for
+
+        :return:        dynamic array of values in the same order as the keys
+        """
+        keys = list(keys)
+        find = self._find
+        node_values = self._values
+
+        values = []
+        for key, hash in zip(keys, self._hash_batch(keys)):
+            node = find(key, hash)
+            values.append(node_values[node] if node != _NIL else None)
+        return DynamicArray(values)
+
+    def contains_many(self, keys) -> DynamicArray:
+        """
+        Returns a dynamic array with True or False for each of the given keys
+        depending on if the key is in the hash map.
+
+        :param keys:    iterable of keys to search for
+
+        :return:        dynamic array of booleans in the same order as the keys
+        """
+        keys = list(keys)
+        find = self._find
+        return DynamicArray([find(key, hash) != _NIL for key, hash
+                             in zip(keys, self._hash_batch(keys))])
+
+    def remove_many(self, keys) -> None:
+        """
+        Removes each of the given keys and its associated value from the hash
+        map. Keys that are not in the hash map are ignored.
+
+        :param keys:    iterable of keys to remove
+
+        :return:        None
+        """
+        keys = list(keys)
+        unlink = self._unlink
+        for key, hash in zip(keys, self._hash_batch(keys)):
+            unlink(key, hash)
+
+    def stats(self) -> dict:
+        """
+        Returns the statistics recorded since the map was created, or None if
+        it was created without stats=True.
+
+        :return:    dictionary of operation probe counts, chain lengths,
+                    resizes and hash function time, or None
+        """
+        if self._stats is None:
+            return None
+        return self._stats.snapshot(self)
+
+    def _probe_length(self, key: str, hash: int) -> int:
+        """
+        Returns the number of nodes a lookup of the given key visits in its
+        bucket, which is the whole chain when the key is not in it.
+
+        :param key:     key to search for
+        :param hash:    hash of the key
+
+        :return:        number of nodes visited
+        """
+        hashes, keys, next = self._hashes, self._keys, self._next
+        hash &= _HASH_MASK
+        probes = 0
+        node = self._heads[hash % self._capacity]
+        while node != _NIL:
+            probes += 1
+            if hashes[node] == hash and keys[node] == key:
+                break
+            node = next[node]
+        return probes
+
+    def _length_histogram(self) -> dict:
+        """
+        Returns a dictionary of chain length to the number of buckets whose
+        chain has that length.
+
+        :return:    chain length histogram
+        """
+        next = self._next
+        histogram = {}
+        for node in self._heads:
+            length = 0
+            while node != _NIL:
+                length += 1
+                node = next[node]
+            histogram[length] = histogram.get(length, 0) + 1
+        return histogram
+
+
+# ------------------- BASIC TESTING ---------------------------------------- #
+
+if __name__ == "__main__":
+
+    print("\nPDF - put example 1")
+    print("-------------------")
+    m = HashMap(53, hash_function_1)
+    for i in range(150):
+        m.put('str' + str(i), i * 100)
+        if i % 25 == 24:
+            print(m.empty_buckets(), round(m.table_load(), 2), m.get_size(), m.get_capacity())
+
+    print("\nPDF - put example 2")
+    print("-------------------")
+    m = HashMap(41, hash_function_2)
+    for i in range(50):
+        m.put('str' + str(i // 3), i * 100)
+        if i % 10 == 9:
+            print(m.empty_buckets(), round(m.table_load(), 2), m.get_size(), m.get_capacity())
+
+    print("\nPDF - empty_buckets example 1")
+    print("-----------------------------")
+    m = HashMap(101, hash_function_1)
+    print(m.empty_buckets(), m.get_size(), m.get_capacity())
+    m.put('key1', 10)
+    print(m.empty_buckets(), m.get_size(), m.get_capacity())
+    m.put('key2', 20)
+    print(m.empty_buckets(), m.get_size(), m.get_capacity())
+    m.put('key1', 30)
+    print(m.empty_buckets(), m.get_size(), m.get_capacity())
+    m.put('key4', 40)
+    print(m.empty_buckets(), m.get_size(), m.get_capacity())
+
+    print("\nPDF - empty_buckets example 2")
+    print("-----------------------------")
+    m = HashMap(53, hash_function_1)
+    for i in range(150):
+        m.put('key' + str(i), i * 100)
+        if i % 30 == 0:
+            print(m.empty_buckets(), m.get_size(), m.get_capacity())
+
+    print("\nPDF - table_load example 1")
+    print("--------------------------")
+    m = HashMap(101, hash_function_1)
+    print(round(m.table_load(), 2))
+    m.put('key1', 10)
+    print(round(m.table_load(), 2))
+    m.put('key2', 20)
+    print(round(m.table_load(), 2))
+    m.put('key1', 30)
+    print(round(m.table_load(), 2))
+
+    print("\nPDF - table_load example 2")
+    print("--------------------------")
+    m = HashMap(53, hash_function_1)
+    for i in range(50):
+        m.put('key' + str(i), i * 100)
+        if i % 10 == 0:
+            print(round(m.table_load(), 2), m.get_size(), m.get_capacity())
+
+    print("\nPDF - clear example 1")
+    print("---------------------")
+    m = HashMap(101, hash_function_1)
+    print(m.get_size(), m.get_capacity())
+    m.put('key1', 10)
+    m.put('key2', 20)
+    m.put('key1', 30)
+    print(m.get_size(), m.get_capacity())
+    m.clear()
+    print(m.get_size(), m.get_capacity())
+
+    print("\nPDF - clear example 2")
+    print("---------------------")
+    m = HashMap(53, hash_function_1)
+    print(m.get_size(), m.get_capacity())
+    m.put('key1', 10)
+    print(m.get_size(), m.get_capacity())
+    m.put('key2', 20)
+    print(m.get_size(), m.get_capacity())
+    m.resize_table(100)
+    print(m.get_size(), m.get_capacity())
+    m.clear()
+    print(m.get_size(), m.get_capacity())
+
+    print("\nPDF - resize example 1")
+    print("----------------------")
+    m = HashMap(23, hash_function_1)
+    m.put('key1', 10)
+    print(m.get_size(), m.get_capacity(), m.get('key1'), m.contains_key('key1'))
+    m.resize_table(30)
+    print(m.get_size(), m.get_capacity(), m.get('key1'), m.contains_key('key1'))
+
+    print("\nPDF - resize example 2")
+    print("----------------------")
+    m = HashMap(79, hash_function_2)
+    keys = [i for i in range(1, 1000, 13)]
+    for key in keys:
+        m.put(str(key), key * 42)
+    print(m.get_size(), m.get_capacity())
+
+    for capacity in range(111, 1000, 117):
+        m.resize_table(capacity)
+
+        m.put('some key', 'some value')
+        result = m.contains_key('some key')
+        m.remove('some key')
+
+        for key in keys:
+            # all inserted keys must be present
+            result &= m.contains_key(str(key))
+            # NOT inserted keys must be absent
+            result &= not m.contains_key(str(key + 1))
+        print(capacity, result, m.get_size(), m.get_capacity(), round(m.table_load(), 2))
+
+    print("\nPDF - get example 1")
+    print("-------------------")
+    m = HashMap(31, hash_function_1)
+    print(m.get('key'))
+    m.put('key1', 10)
+    print(m.get('key1'))
+
+    print("\nPDF - get example 2")
+    print("-------------------")
+    m = HashMap(151, hash_function_2)
+    for i in range(200, 300, 7):
+        m.put(str(i), i * 10)
+    print(m.get_size(), m.get_capacity())
+    for i in range(200, 300, 21):
+        print(i, m.get(str(i)), m.get(str(i)) == i * 10)
+        print(i + 1, m.get(str(i + 1)), m.get(str(i + 1)) == (i + 1) * 10)
+
+    print("\nPDF - contains_key example 1")
+    print("----------------------------")
+    m = HashMap(53, hash_function_1)
+    print(m.contains_key('key1'))
+    m.put('key1', 10)
+    m.put('key2', 20)
+    m.put('key3', 30)
+    print(m.contains_key('key1'))
+    print(m.contains_key('key4'))
+    print(m.contains_key('key2'))
+    print(m.contains_key('key3'))
+    m.remove('key3')
+    print(m.contains_key('key3'))
+
+    print("\nPDF - contains_key example 2")
+    print("----------------------------")
+    m = HashMap(79, hash_function_2)
+    keys = [i for i in range(1, 1000, 20)]
+    for key in keys:
+        m.put(str(key), key * 42)
+    print(m.get_size(), m.get_capacity())
+    result = True
+    for key in keys:
+        # all inserted keys must be present
+        result &= m.contains_key(str(key))
+        # NOT inserted keys must be absent
+        result &= not m.contains_key(str(key + 1))
+    print(result)
+
+    print("\nPDF - remove example 1")
+    print("----------------------")
+    m = HashMap(53, hash_function_1)
+    print(m.get('key1'))
+    m.put('key1', 10)
+    print(m.get('key1'))
+    m.remove('key1')
+    print(m.get('key1'))
+    m.remove('key4')
+
+    print("\nPDF - get_keys_and_values example 1")
+    print("------------------------")
+    m = HashMap(11, hash_function_2)
+    for i in range(1, 6):
+        m.put(str(i), str(i * 10))
+    print(m.get_keys_and_values())
+
+    m.resize_table(1)
+    print(m.get_keys_and_values())
+
+    m.put('20', '200')
+    m.remove('1')
+    m.resize_table(2)
+    print(m.get_keys_and_values())
@@ -0,0 +1,621 @@
+# Course: CS261 - Data Structures
+# Assignment: 6
+# Description:  This program contains a hash map sharded across worker
+#               processes. Keys are partitioned by hash, every worker process
+#               owns a flat open addressing HashMap for its shard, and batches
+#               of operations are split up and run by all workers in parallel.
+#               A read-only snapshot of the whole map can be published to
+#               shared memory in a flat open addressing layout, where any
+#               process on the machine can look keys up without going through
+#               the workers. Workers are forked, so this needs Linux (or
+#               another platform with the fork start method).
+
+
+import multiprocessing
+import os
+import pickle
+import struct
+from multiprocessing import resource_tracker, shared_memory
+
+from a6_include import (DynamicArray,
+                        hash_function_1, hash_function_2)
+from hash_functions import PROCESS_LOCAL, get_hash_function, hash_function_name
+import hash_map_oa_flat
+import hash_map_sc
+from primes import next_prime
+
+
+# Cached hashes are stored as unsigned 64 bit values
+_HASH_MASK = (1 << 64) - 1
+
+# Snapshot layout: header with the registered name of the hash function
+# ('' if it is not registered), then capacity hashes, entry offsets and entry
+# lengths (8 bytes each), capacity state bytes, and the pickled entries
+_SNAPSHOT_MAGIC = b'HMS2'
+_HEADER = struct.Struct('<4sQQ32s')
+
+
+# ------------------------- Workers ------------------------------------- #
+
+def _to_list(da: DynamicArray) -> list:
+    """Return the contents of a dynamic array as a list."""
+    return [da.get_at_index(num) for num in range(da.length())]
+
+
+def _snapshot_bytes(hash_map, function: callable, name: str) -> bytes:
+    """
+    Returns the snapshot layout of the given map. Entries are placed with the
+    same quadratic probing as the open addressing maps, in a table kept at a
+    load factor below 0.5 so every probe sequence ends at an empty slot.
+    """
+    pairs = list(hash_map.items())
+    capacity = next_prime(2 * len(pairs) + 1)
+    hashes = [0] * capacity
+    offsets = [0] * capacity
+    lengths = [0] * capacity
+    states = bytearray(capacity)
+    entries = bytearray()
+
+    for key, value in pairs:
+        hash = function(key) & _HASH_MASK
+        init_index = hash % capacity
+        for j in range(capacity):
+            quad_index = (init_index + j * j) % capacity
+            if not states[quad_index]:
+                break
+
+        entry = pickle.dumps((key, value), pickle.HIGHEST_PROTOCOL)
+        states[quad_index] = 1
+        hashes[quad_index] = hash
+        offsets[quad_index] = len(entries)
+        lengths[quad_index] = len(entry)
+        entries += entry
+
+    table = struct.pack('<%dQ' % (3 * capacity), *hashes, *offsets, *lengths)
+    return (_HEADER.pack(_SNAPSHOT_MAGIC, capacity, len(pairs), name.encode())
+            + table + bytes(states) + bytes(entries))
+
+
+def _worker(connection, function: callable) -> None:
+    """
+    Runs in each worker process: owns one shard's HashMap and answers
+    (command, argument) requests until told to close.
+    """
+    hash_map = hash_map_oa_flat.HashMap(11, function)
+
+    while True:
+        command, argument = connection.recv()
+        if command == 'close':
+            break
+        try:
+            if command == 'put_many':
+                result = hash_map.put_many(argument)
+            elif command == 'get_many':
+                result = _to_list(hash_map.get_many(argument))
+            elif command == 'contains_many':
+                result = _to_list(hash_map.contains_many(argument))
+            elif command == 'remove_many':
+                result = hash_map.remove_many(argument)
+            elif command == 'items':
+                result = list(hash_map.items())
+            elif command == 'size':
+                result = hash_map.get_size()
+            elif command == 'clear':
+                result = hash_map.clear()
+            elif command == 'find_mode':
+                modes, frequency = hash_map_sc.find_mode(DynamicArray(argument))
+                result = (_to_list(modes), frequency)
+            elif command == 'snapshot':
+                result = _snapshot_bytes(hash_map, function, argument)
+            else:
+                raise ValueError(f"Unknown command: {command!r}")
+        except Exception as error:
+            connection.send((False, error))
+        else:
+            connection.send((True, result))
+
+    connection.close()
+
+
+# ------------------------- Sharded map --------------------------------- #
+
+class ShardedHashMap:
+    """
+    HashMap partitioned across worker processes. The batch methods split
+    their keys by shard, send every worker its part at once and merge the
+    answers, so the workers run in parallel; the single key methods are
+    batches of one. Use it as a context manager, or call close(), to stop
+    the workers.
+    """
+
+    def __init__(self, shards: int = None, function=hash_function_1) -> None:
+        """
+        Start one worker process per shard, by default one per CPU.
+
+        The hash function must give the same result in every process, which
+        all registered functions do for forked workers.
+        """
+        self._hash_function = get_hash_function(function)
+        shards = shards or os.cpu_count() or 1
+
+        # Set once a request fails halfway, after which the replies on the
+        # pipes no longer match the requests
+        self._broken = False
+
+        context = multiprocessing.get_context('fork')
+        self._connections = []
+        self._processes = []
+        for _ in range(shards):
+            parent_end, child_end = context.Pipe()
+            process = context.Process(target=_worker,
+                                      args=(child_end, self._hash_function),
+                                      daemon=True)
+            process.start()
+            child_end.close()
+            self._connections.append(parent_end)
+            self._processes.append(process)
+
+    def __enter__(self) -> "ShardedHashMap":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Stops the worker processes. The map cannot be used afterwards, but
+        published snapshots stay readable until they are closed.
+        """
+        for connection in self._connections:
+            if not self._broken:
+                try:
+                    connection.send(('close', None))
+                except OSError:
+                    pass
+            connection.close()
+
+        # Workers of a broken map may be stuck sending an unread reply
+        for process in self._processes:
+            if self._broken:
+                process.terminate()
+            process.join()
+        self._connections = []
+        self._processes = []
+
+    def _partition(self, keys: list) -> list:
+        """
+        Returns, for every shard, the list of positions in keys of the keys
+        that belong to it.
+        """
+        function = self._hash_function
+        shards = len(self._connections)
+        positions = [[] for _ in range(shards)]
+        for position, key in enumerate(keys):
+            positions[function(key) % shards].append(position)
+        return positions
+
+    def _dispatch(self, command: str, arguments: list) -> list:
+        """
+        Sends command to every shard whose argument is not None, then waits
+        for all of their answers, so the shards work at the same time.
+
+        :return:    list of each shard's result, None for skipped shards
+        """
+        if self._broken:
+            raise RuntimeError("A worker failed during an earlier request, "
+                               "so this ShardedHashMap can only be closed")
+
+        results = []
+        error = None
+        try:
+            for connection, argument in zip(self._connections, arguments):
+                if argument is not None:
+                    connection.send((command, argument))
+
+            for connection, argument in zip(self._connections, arguments):
+                result = None
+                if argument is not None:
+                    succeeded, result = connection.recv()
+                    if not succeeded:
+                        error = result
+                results.append(result)
+        except BaseException:
+            # A dead worker or an interrupted wait leaves replies unread
+            self._broken = True
+            raise
+
+        if error is not None:
+            raise error
+        return results
+
+    def _scatter(self, command: str, keys) -> list:
+        """
+        Runs a per key command on the shards and returns the answers in the
+        order of the keys.
+        """
+        keys = list(keys)
+        positions = self._partition(keys)
+        answers = self._dispatch(command, [[keys[position] for position in shard]
+                                           if shard else None
+                                           for shard in positions])
+
+        results = [None] * len(keys)
+        for shard, answer in zip(positions, answers):
+            for position, result in zip(shard, answer or ()):
+                results[position] = result
+        return results
+
+    def get_size(self) -> int:
+        """
+        Return size of map
+        """
+        return sum(self._dispatch('size', [True] * len(self._connections)))
+
+    # ------------------------------------------------------------------ #
+
+    def put_many(self, pairs) -> None:
+        """
+        Updates the hash map with every key / value pair of the given iterable,
+        like calling put for each of them.
+
+        :param pairs:   iterable of key / value pairs
+
+        :return:        None
+        """
+        pairs = list(pairs)
+        positions = self._partition([key for key, _ in pairs])
+        self._dispatch('put_many', [[pairs[position] for position in shard]
+                                    if shard else None
+                                    for shard in positions])
+
+    def get_many(self, keys) -> DynamicArray:
+        """
+        Returns a dynamic array with the value associated with each of the
+        given keys, or None for keys that are not in the hash map.
+
+        :param keys:    iterable of keys to search for
+
+        :return:        dynamic array of values in the same order as the keys
+        """
+        return DynamicArray(self._scatter('get_many', keys))
+
+    def contains_many(self, keys) -> DynamicArray:
+        """
+        Returns a dynamic array with True or False for each of the given keys
+        depending on if the key is in the hash map.
+
+        :param keys:    iterable of keys to search for
+
+        :return:        dynamic array of booleans in the same order as the keys
+        """
+        return DynamicArray(self._scatter('contains_many', keys))
+
+    def remove_many(self, keys) -> None:
+        """
+        Removes each of the given keys and its associated value from the hash
+        map. Keys that are not in the hash map are ignored.
+
+        :param keys:    iterable of keys to remove
+
+        :return:        None
+        """
+        keys = list(keys)
+        positions = self._partition(keys)
+        self._dispatch('remove_many', [[keys[position] for position in shard]
+                                       if shard else None
+                                       for shard in positions])
+
+    def put(self, key: str, value: object) -> None:
+        """
+        Updates the key / value pair in the hash map.
+
+        :param key:     key to be used in the key / value pair
+        :param value:   value to be used in the key / value pair
+
+        :return:        None
+        """
+        self.put_many([(key, value)])
+
+    def get(self, key: str) -> object:
+        """
+        Returns the value associated with the given key, or None.
+
+        :param key: key to search for in hash map
+
+        :return:    value associated with key or None if key not found
+        """
+        return self._scatter('get_many', [key])[0]
+
+    def contains_key(self, key: str) -> bool:
+        """
+        Returns True if the given key is in the hash map, otherwise it returns False.
+
+        :param key: key to be searched for in hash map
+
+        :return:    True/False depending on if key is found
+        """
+        return self._scatter('contains_many', [key])[0]
+
+    def remove(self, key: str) -> None:
+        """
+        Removes the given key and its associated value from the hash map.
+
+        :param key: key of key / value pair to be removed from hash map
+
+        :return:    None
+        """
+        self.remove_many([key])
+
+    def clear(self) -> None:
+        """
+        Clears the contents of every shard.
+
+        :return:    None
+        """
+        self._dispatch('clear', [True] * len(self._connections))
+
+    def get_keys_and_values(self) -> DynamicArray:
+        """
+        Returns a dynamic array where each index contains a tuple of a
+        key / value pair stored in the hash map, shard by shard.
+
+        :return:    dynamic array containing all key / value pairs in hash map
+        """
+        key_val_arr = DynamicArray()
+        for pairs in self._dispatch('items', [True] * len(self._connections)):
+            for pair in pairs:
+                key_val_arr.append(pair)
+        return key_val_arr
+
+    def find_mode(self, da: DynamicArray) -> (DynamicArray, int):
+        """
+        Returns the mode(s) of the given dynamic array and their frequency,
+        like hash_map_sc.find_mode. Values are partitioned like keys, so each
+        value is counted by exactly one shard and the shards' modes can be
+        merged by frequency.
+
+        :param da:  dynamic array to search for the mode
+
+        :return:    tuple containing a new dynamic array of most occurring
+                    values and an integer representing the highest frequency
+        """
+        modes_arr = DynamicArray()
+        highest_freq = 0
+        for result in self._scatter_values('find_mode', _to_list(da)):
+            modes, frequency = result
+            if frequency > highest_freq:
+                highest_freq = frequency
+                modes_arr = DynamicArray(modes)
+            elif frequency == highest_freq:
+                for mode in modes:
+                    modes_arr.append(mode)
+        return (modes_arr, highest_freq)
+
+    def _scatter_values(self, command: str, values: list) -> list:
+        """
+        Runs a command that takes a shard's whole part of values at once and
+        returns the results of the shards that got any values.
+        """
+        positions = self._partition(values)
+        results = self._dispatch(command, [[values[position] for position in shard]
+                                           if shard else None
+                                           for shard in positions])
+        return [result for shard, result in zip(positions, results) if shard]
+
+    def publish(self) -> "SharedSnapshot":
+        """
+        Copies every shard into a shared memory block in the snapshot layout
+        and returns a SharedSnapshot reading them. Other processes can open
+        the same snapshot from its names. The snapshot does not see later
+        changes to the map; close() it to free the shared memory.
+
+        :return:    snapshot of the current contents
+        """
+        name = hash_function_name(self._hash_function) or ''
+        blocks = []
+        try:
+            for data in self._dispatch('snapshot',
+                                       [name] * len(self._connections)):
+                block = shared_memory.SharedMemory(create=True, size=len(data))
+                blocks.append(block)
+                block.buf[:len(data)] = data
+        except BaseException:
+            for block in blocks:
+                block.close()
+                block.unlink()
+            raise
+        return SharedSnapshot(blocks, self._hash_function, owner=True)
+
+
+# ------------------------- Shared snapshot ----------------------------- #
+
+class SharedSnapshot:
+    """
+    Read-only view of a published ShardedHashMap. Lookups probe the shared
+    memory of the key's shard directly and only unpickle the entries whose
+    cached hash matches, so no worker is involved.
+    """
+
+    def __init__(self, blocks: list, function, owner: bool = False) -> None:
+        """
+        Wrap opened shared memory blocks, one per shard in shard order. The
+        owner unlinks the blocks when the snapshot is closed.
+        """
+        headers = []
+        for block in blocks:
+            magic, capacity, size, name = _HEADER.unpack_from(block.buf)
+            if magic != _SNAPSHOT_MAGIC:
+                raise ValueError(f"{block.name} is not a HashMap snapshot")
+            headers.append((capacity, size, name.rstrip(b'\0').decode()))
+        self._hash_function = self._snapshot_function(
+            headers[0][2] if headers else '', function, owner)
+
+        self._blocks = blocks
+        self._owner = owner
+        self._shards = []
+        for block, (capacity, size, _) in zip(blocks, headers):
+            start = _HEADER.size
+            table = block.buf[start:start + 24 * capacity].cast('Q')
+            states_start = start + 24 * capacity
+            self._shards.append((capacity, size, table,
+                                 block.buf[states_start:states_start + capacity],
+                                 states_start + capacity))
+
+    @staticmethod
+    def _snapshot_function(name: str, function, owner: bool) -> callable:
+        """
+        Returns the hash function to search a snapshot with, checked against
+        the registered name it was published with.
+        """
+        if not owner and name in PROCESS_LOCAL:
+            raise ValueError(f"The {name!r} hash function gives different hashes "
+                             f"in every process, so this snapshot can only be "
+                             f"read by the process that published it")
+        if function is None:
+            if not name:
+                raise ValueError("The snapshot's hash function is not "
+                                 "registered, so it must be given")
+            return get_hash_function(name)
+
+        function = get_hash_function(function)
+        if name and hash_function_name(function) != name:
+            raise ValueError(f"The snapshot was published with the {name!r} "
+                             f"hash function")
+        return function
+
+    @classmethod
+    def attach(cls, names: list, function: callable = None) -> "SharedSnapshot":
+        """
+        Opens a snapshot published by another process from the names of its
+        blocks, in shard order. The function is only needed if the map's hash
+        function was not registered. Snapshots of maps using the per process
+        'builtin' or 'siphash' functions cannot be attached.
+        """
+        blocks = []
+        for name in names:
+            try:
+                block = shared_memory.SharedMemory(name=name, track=False)
+            except TypeError:
+                # Before Python 3.13 attaching registers the block with the
+                # resource tracker, which would unlink it when this process
+                # exits. Unregistering afterwards is no better, because a
+                # process started by the publisher shares its tracker and
+                # would drop the publisher's registration instead.
+                register = resource_tracker.register
+                resource_tracker.register = lambda name, rtype: None
+                try:
+                    block = shared_memory.SharedMemory(name=name)
+                finally:
+                    resource_tracker.register = register
+            blocks.append(block)
+
+        try:
+            return cls(blocks, function)
+        except BaseException:
+            for block in blocks:
+                block.close()
+            raise
+
+    def names(self) -> list:
+        """Return the names of the shared memory blocks, in shard order."""
+        return [block.name for block in self._blocks]
+
+    def close(self) -> None:
+        """
+        Releases the shared memory, and unlinks it if this snapshot was
+        created by publish.
+        """
+        for capacity, size, table, states, entries_start in self._shards:
+            table.release()
+            states.release()
+        self._shards = []
+        for block in self._blocks:
+            block.close()
+            if self._owner:
+                block.unlink()
+        self._blocks = []
+
+    def __enter__(self) -> "SharedSnapshot":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def get_size(self) -> int:
+        """
+        Return size of map
+        """
+        return sum(shard[1] for shard in self._shards)
+
+    def _find(self, key: str) -> tuple:
+        """
+        Returns the (key, value) entry for the given key, or None.
+        """
+        raw_hash = self._hash_function(key)
+        block = self._blocks[raw_hash % len(self._blocks)]
+        capacity, size, table, states, entries_start = \
+            self._shards[raw_hash % len(self._blocks)]
+        hash = raw_hash & _HASH_MASK
+        init_index = hash % capacity
+
+        for j in range(capacity):
+            quad_index = (init_index + j * j) % capacity
+            if not states[quad_index]:
+                return None
+            if table[quad_index] == hash:
+                offset = entries_start + table[capacity + quad_index]
+                length = table[2 * capacity + quad_index]
+                entry = pickle.loads(block.buf[offset:offset + length])
+                if entry[0] == key:
+                    return entry
+        return None
+
+    def get(self, key: str) -> object:
+        """
+        Returns the value associated with the given key, or None.
+
+        :param key: key to search for in hash map
+
+        :return:    value associated with key or None if key not found
+        """
+        entry = self._find(key)
+        return entry[1] if entry else None
+
+    def contains_key(self, key: str) -> bool:
+        """
+        Returns True if the given key is in the snapshot, otherwise False.
+
+        :param key: key to be searched for in hash map
+
+        :return:    True/False depending on if key is found
+        """
+        return self._find(key) is not None
+
+
+# ------------------- BASIC TESTING ---------------------------------------- #
+
+if __name__ == "__main__":
+
+    print("\nSharded put_many / get_many")
+    print("---------------------------")
+    with ShardedHashMap(4, hash_function_2) as m:
+        m.put_many(('str' + str(i), i * 100) for i in range(1000))
+        m.remove_many('str' + str(i) for i in range(0, 1000, 2))
+        print(m.get_size())
+        values = m.get_many(['str1', 'str2', 'str3', 'missing'])
+        print([values[i] for i in range(values.length())])
+        print(m.get('str999'), m.contains_key('str998'))
+        print(m.get_keys_and_values().length())
+
+        print("\nSharded find_mode")
+        print("-----------------")
+        da = DynamicArray(["2", "4", "2", "6", "8", "4", "1", "3", "4", "5", "7", "3", "3", "2"])
+        mode, frequency = m.find_mode(da)
+        print(f"Input: {da}\nMode : {sorted(_to_list(mode))}, Frequency: {frequency}")
+
+        print("\nShared memory snapshot")
+        print("----------------------")
+        with m.publish() as snapshot:
+            m.put('str1', 'changed after publishing')
+            print(snapshot.get_size(), snapshot.get('str1'), snapshot.get('str2'),
+                  snapshot.contains_key('str3'))
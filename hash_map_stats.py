@@ -0,0 +1,144 @@
+# Course: CS261 - Data Structures
+# Assignment: 6
+# Description:  This program contains the opt-in statistics mode shared by the
+#               HashMap implementations. Instrumenting a map replaces a few of
+#               its methods on that one instance with wrappers that record
+#               probe counts, resizes and hash function time, so maps created
+#               without stats keep their original methods and pay nothing.
+
+
+import time
+
+
+class MapStats:
+    """
+    Counters collected for one instrumented HashMap
+    """
+
+    def __init__(self, hash_function: callable) -> None:
+        """Initialize empty counters for a map using the given hash function."""
+        self.hash_function = hash_function
+        self.operations = {}
+        self.resizes = 0
+        self.resize_seconds = 0.0
+        self.hash_calls = 0
+        self.hash_seconds = 0.0
+
+    def record(self, operation: str, probes: int) -> None:
+        """Record one operation that inspected the given number of buckets."""
+        counters = self.operations.get(operation)
+        if counters is None:
+            counters = {'count': 0, 'probes': 0, 'max_probes': 0, 'histogram': {}}
+            self.operations[operation] = counters
+
+        counters['count'] += 1
+        counters['probes'] += probes
+        if probes > counters['max_probes']:
+            counters['max_probes'] = probes
+        histogram = counters['histogram']
+        histogram[probes] = histogram.get(probes, 0) + 1
+
+    def snapshot(self, hash_map) -> dict:
+        """
+        Returns a copy of the counters together with the current table shape.
+        Chain (SC) or cluster (OA) lengths are measured by scanning the table.
+        """
+        lengths = hash_map._length_histogram()
+        operations = {}
+        for operation, counters in self.operations.items():
+            operations[operation] = dict(counters,
+                                         histogram=dict(counters['histogram']),
+                                         mean_probes=counters['probes'] / counters['count'])
+
+        return {
+            'size': hash_map.get_size(),
+            'capacity': hash_map.get_capacity(),
+            'load': hash_map.table_load(),
+            'tombstones': getattr(hash_map, '_tombstones', 0),
+            'operations': operations,
+            'max_length': max(lengths) if lengths else 0,
+            'length_histogram': lengths,
+            'resizes': self.resizes,
+            'resize_seconds': self.resize_seconds,
+            'hash_calls': self.hash_calls,
+            'hash_seconds': self.hash_seconds,
+        }
+
+
+def instrument(hash_map) -> MapStats:
+    """
+    Installs statistics wrappers on a single HashMap instance and returns the
+    counters they update. The map must provide _probe_length(key, hash),
+    which counts the buckets a lookup of the key inspects, and
+    _length_histogram(). Batch operations are only counted in the hash
+    function totals.
+    """
+    timer = time.perf_counter
+    raw_hash = hash_map._hash_function
+    stats = MapStats(raw_hash)
+    probe_length = hash_map._probe_length
+
+    def timed_hash(key):
+        start = timer()
+        hash = raw_hash(key)
+        stats.hash_seconds += timer() - start
+        stats.hash_calls += 1
+        return hash
+
+    hash_map._hash_function = timed_hash
+
+    def counted_lookup(name):
+        original = getattr(hash_map, name)
+
+        def lookup(key):
+            result = original(key)
+            stats.record(name, probe_length(key, raw_hash(key)))
+            return result
+        return lookup
+
+    hash_map.get = counted_lookup('get')
+    hash_map.contains_key = counted_lookup('contains_key')
+
+    original_put = hash_map.put
+    original_remove = hash_map.remove
+
+    # Updates are counted before the call, so they measure the search for the
+    # key rather than where the new entry ended up
+    def put(key, value, *args, **kwargs):
+        stats.record('put', probe_length(key, raw_hash(key)))
+        original_put(key, value, *args, **kwargs)
+
+    def remove(key):
+        stats.record('remove', probe_length(key, raw_hash(key)))
+        original_remove(key)
+
+    hash_map.put = put
+    hash_map.remove = remove
+
+    # Every resize, compaction and incremental rehash step is timed, nested
+    # calls such as finishing a migration inside resize_table only once
+    active = [False]
+
+    def timed_resize(name, counted):
+        original = getattr(hash_map, name)
+
+        def resize(*args):
+            if active[0]:
+                return original(*args)
+            active[0] = True
+            start = timer()
+            try:
+                original(*args)
+            finally:
+                active[0] = False
+                stats.resize_seconds += timer() - start
+            if counted:
+                stats.resizes += 1
+        return resize
+
+    hash_map.resize_table = timed_resize('resize_table', True)
+    if hasattr(hash_map, '_start_rehash'):
+        hash_map._start_rehash = timed_resize('_start_rehash', True)
+        hash_map._rehash_step = timed_resize('_rehash_step', False)
+
+    return stats
@@ -0,0 +1,368 @@
+# Course: CS261 - Data Structures
+# Assignment: 6
+# Description:  This program contains the per-key expiry (TTL) support of the
+#               chaining and open addressing HashMaps. A map that is given a
+#               ttl in put keeps an ExpiryTable with the deadline of every key
+#               that has one. Reads check the deadline of the key they look up
+#               and remove it once it has passed, and the deadlines are also
+#               scheduled on a hierarchical timing wheel, so expired keys that
+#               are never read again can be found and reclaimed a bounded
+#               number at a time, without scanning the map.
+
+
+from collections import OrderedDict
+import time
+
+
+# Length in seconds of one tick of the timing wheel
+RESOLUTION = 0.1
+
+# Expired keys reclaimed by every put into a map that uses TTLs
+RECLAIM_PER_PUT = 2
+
+
+class Timer:
+    """
+    Timer of a TimingWheel, returned by schedule so that it can be cancelled.
+    """
+
+    __slots__ = ('tick', 'deadline', 'item', 'slot', 'level')
+
+    def __init__(self, tick: int, deadline: float, item: object) -> None:
+        """
+        Initialize a timer that is not in a wheel yet.
+        """
+        self.tick = tick
+        self.deadline = deadline
+        self.item = item
+
+        # Slot the timer is in and the level of that slot, which is -1 for
+        # the due timers and the number of levels for the overflow. slot is
+        # None once the timer has been popped or cancelled
+        self.slot = None
+        self.level = None
+
+
+class TimingWheel:
+    """
+    Hierarchical timing wheel. Level 0 has one slot per tick, and every slot
+    of level L covers a whole turn of level L - 1. A timer goes in the slot
+    of the highest level on which its tick differs from the current one, and
+    moves down a level whenever the wheel below comes round to that slot, so
+    scheduling and cancelling are O(1) and every timer moves at most once
+    per level. Timers further out than the top level can reach wait in an
+    overflow slot.
+    """
+
+    def __init__(self, resolution: float = RESOLUTION, start: float = 0.0,
+                 slots: int = 64, levels: int = 4) -> None:
+        """
+        Initialize an empty wheel whose current time is start. slots must be
+        a power of two.
+        """
+        if slots < 2 or slots & (slots - 1):
+            raise ValueError("The number of slots must be a power of two")
+        self._resolution = resolution
+        self._bits = slots.bit_length() - 1
+        self._mask = slots - 1
+        self._levels = levels
+        self._now = int(start // resolution)
+
+        # Slots map their timers to None, so that cancelling one is O(1)
+        self._wheels = [[{} for _ in range(slots)] for _ in range(levels)]
+        self._counts = [0] * levels
+        self._overflow = {}
+
+        # Timers whose tick has come, oldest first
+        self._due = OrderedDict()
+
+    def __len__(self) -> int:
+        """Return the number of timers in the wheel, due or not."""
+        return sum(self._counts) + len(self._overflow) + len(self._due)
+
+    def schedule(self, deadline: float, item: object) -> Timer:
+        """
+        Adds a timer for item that becomes due once the wheel is advanced to
+        a time after deadline.
+
+        :param deadline:    time the timer expires at
+        :param item:        object that pop_due returns with the deadline
+
+        :return:            the timer, for cancel
+        """
+        timer = Timer(int(deadline // self._resolution) + 1, deadline, item)
+        self._place(timer)
+        return timer
+
+    def cancel(self, timer: Timer) -> None:
+        """
+        Removes a timer from the wheel. Timers that were already popped or
+        cancelled are ignored.
+        """
+        slot = timer.slot
+        if slot is None:
+            return
+        del slot[timer]
+        if 0 <= timer.level < self._levels:
+            self._counts[timer.level] -= 1
+        timer.slot = None
+
+    def _place(self, timer: Timer) -> None:
+        """Put a timer in its slot."""
+        tick = timer.tick
+        if tick <= self._now:
+            level = -1
+            slot = self._due
+        else:
+            level = ((tick ^ self._now).bit_length() - 1) // self._bits
+            if level >= self._levels:
+                level = self._levels
+                slot = self._overflow
+            else:
+                slot = self._wheels[level][(tick >> (self._bits * level)) & self._mask]
+                self._counts[level] += 1
+        slot[timer] = None
+        timer.slot = slot
+        timer.level = level
+
+    def _cascade(self, level: int, index: int) -> None:
+        """Move the timers of one slot down to the levels below it."""
+        timers = self._wheels[level][index]
+        self._wheels[level][index] = {}
+        self._counts[level] -= len(timers)
+        for timer in timers:
+            self._place(timer)
+
+    def _step(self) -> None:
+        """Advance by one tick."""
+        self._now += 1
+        now = self._now
+
+        # Every wheel that just finished a turn moves the next slot of the
+        # wheel above it down, and a full turn of the top one the overflow
+        level = 1
+        while level <= self._levels and not (now >> (self._bits * (level - 1))) & self._mask:
+            if level == self._levels:
+                overflow, self._overflow = self._overflow, {}
+                for timer in overflow:
+                    self._place(timer)
+            else:
+                self._cascade(level, (now >> (self._bits * level)) & self._mask)
+            level += 1
+
+        index = now & self._mask
+        slot = self._wheels[0][index]
+        if slot:
+            self._counts[0] -= len(slot)
+            self._wheels[0][index] = {}
+            due = self._due
+            for timer in slot:
+                due[timer] = None
+                timer.slot = due
+                timer.level = -1
+
+    def advance(self, now: float) -> None:
+        """
+        Advances the wheel to the given time, moving every timer whose
+        deadline has passed to the due timers.
+
+        :param now: current time, as given to schedule
+
+        :return:    None
+        """
+        target = int(now // self._resolution)
+        while self._now < target:
+
+            # Nothing happens before the next tick that cascades a slot of the
+            # lowest level with timers, so the ticks before it are skipped
+            level = 0
+            while level < self._levels and not self._counts[level]:
+                level += 1
+            if level == self._levels and not self._overflow:
+                self._now = target
+                break
+            if level:
+                span = 1 << (self._bits * level)
+                boundary = (self._now // span + 1) * span
+                if boundary > target:
+                    self._now = target
+                    break
+                self._now = boundary - 1
+            self._step()
+
+    def pop_due(self) -> tuple:
+        """
+        Removes and returns the (deadline, item) of the oldest due timer, or
+        None if no timer is due.
+        """
+        if not self._due:
+            return None
+        timer, _ = self._due.popitem(last=False)
+        timer.slot = None
+        return timer.deadline, timer.item
+
+
+class ExpiryTable:
+    """
+    Deadlines of the keys of one HashMap that were put with a ttl. Keys must
+    be hashable. Every key has a single timer on the wheel, which is
+    cancelled when the key gets a new deadline or loses it, so the wheel
+    never holds more timers than there are keys with a deadline.
+    """
+
+    def __init__(self, clock: callable = time.monotonic,
+                 resolution: float = RESOLUTION) -> None:
+        """
+        Initialize an empty table measuring time with clock, in seconds.
+        """
+        self._clock = clock
+
+        # Key -> its timer, which keeps the deadline after it is popped
+        self._timers = {}
+        self._wheel = TimingWheel(resolution, clock())
+
+    def __len__(self) -> int:
+        """Return the number of keys with a deadline."""
+        return len(self._timers)
+
+    def set(self, key: object, ttl: float) -> None:
+        """Give key a deadline ttl seconds from now."""
+        timers = self._timers
+        timer = timers.get(key)
+        if timer is not None:
+            self._wheel.cancel(timer)
+        timers[key] = self._wheel.schedule(self._clock() + ttl, key)
+
+    def discard(self, key: object) -> None:
+        """Drop the deadline of key, if it has one."""
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            self._wheel.cancel(timer)
+
+    def expired(self, key: object) -> bool:
+        """Return True if key has a deadline that has passed."""
+        timer = self._timers.get(key)
+        return timer is not None and timer.deadline <= self._clock()
+
+    def remaining(self, key: object) -> float:
+        """Return the seconds left before key expires, or None."""
+        timer = self._timers.get(key)
+        if timer is None:
+            return None
+        return max(0.0, timer.deadline - self._clock())
+
+    def due(self, limit: int = None) -> list:
+        """
+        Returns up to limit keys whose deadlines have passed, oldest first,
+        as found by the timing wheel. Their deadlines are kept until the map
+        removes them.
+
+        :param limit:   most keys to return, or None for all of them
+
+        :return:        list of expired keys
+        """
+        wheel = self._wheel
+        wheel.advance(self._clock())
+        keys = []
+        while limit is None or len(keys) < limit:
+            timer = wheel.pop_due()
+            if timer is None:
+                break
+            keys.append(timer[1])
+        return keys
+
+
+# ------------------------- HashMap support ----------------------------- #
+
+def set_ttl(hash_map, key: object, ttl: float) -> None:
+    """
+    Records the ttl a key is being put with, or that it has none, and
+    reclaims a few expired keys of the map. Called by put before it stores
+    the key.
+
+    :param hash_map:    map the key is put into
+    :param key:         key being put
+    :param ttl:         seconds the key lives, or None to keep it until removed
+
+    :return:            None
+    """
+    expiry = hash_map._expiry
+    if expiry is None:
+        expiry = hash_map._expiry = ExpiryTable()
+    else:
+        for expired in expiry.due(RECLAIM_PER_PUT):
+            hash_map.remove(expired)
+
+    if ttl is None:
+        expiry.discard(key)
+    else:
+        expiry.set(key, ttl)
+
+
+def expire_key(hash_map, key: object) -> bool:
+    """
+    Removes the key from the map if its deadline has passed.
+
+    :param hash_map:    map holding the key
+    :param key:         key that is being looked up
+
+    :return:            True if the key was expired
+    """
+    if hash_map._expiry.expired(key):
+        hash_map.remove(key)
+        return True
+    return False
+
+
+def expire_keys(hash_map, keys: list) -> None:
+    """
+    Removes those of the given keys whose deadline has passed, before a
+    batch lookup of them.
+    """
+    expired = hash_map._expiry.expired
+    for key in keys:
+        if expired(key):
+            hash_map.remove(key)
+
+
+def expire(hash_map, limit: int = None) -> int:
+    """
+    Removes up to limit keys of the map whose deadline has passed.
+
+    :param hash_map:    map to reclaim expired keys from
+    :param limit:       most keys to remove, or None for every expired key
+
+    :return:            number of keys removed
+    """
+    if hash_map._expiry is None:
+        return 0
+    keys = hash_map._expiry.due(limit)
+    for key in keys:
+        hash_map.remove(key)
+    return len(keys)
+
+
+# ------------------- BASIC TESTING ---------------------------------------- #
+
+if __name__ == "__main__":
+
+    import hash_map_oa
+    import hash_map_sc
+
+    for m in (hash_map_sc.HashMap(11, 'builtin'), hash_map_oa.HashMap(11, 'builtin')):
+        print(f"\n{type(m).__module__} ttl")
+        print("-" * (len(type(m).__module__) + 4))
+        for i in range(100):
+            m.put('session' + str(i), i, ttl=0.2 if i % 2 else None)
+        print(m.get_size(), m.get('session1'), m.get_ttl('session1') > 0,
+              m.get_ttl('session2'))
+
+        time.sleep(0.3)
+        print(m.get('session1'), m.contains_key('session3'), m.get('session2'),
+              m.get_size())
+        print(m.expire(10), m.get_size(), m.expire(), m.get_size())
+
+        # Refreshing a ttl moves the key's timer instead of adding one
+        for _ in range(1000):
+            m.put('refreshed', 0, ttl=60)
+        print(len(m._expiry), len(m._expiry._wheel))
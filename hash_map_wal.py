@@ -0,0 +1,528 @@
+# Course: CS261 - Data Structures
+# Assignment: 6
+# Description:  This program contains a durability layer for the chaining and
+#               open addressing HashMaps. DurableHashMap applies every put,
+#               remove and clear to an in-memory HashMap and appends it to a
+#               write-ahead log, so the map can be rebuilt after a crash by
+#               loading the newest snapshot and replaying the logs written
+#               since. Log writes are buffered and synced to disk in groups,
+#               and compaction writes a new snapshot from a forked copy of the
+#               map while the parent keeps serving writes.
+#
+#               Files, for a map at path p:
+#                   p.<n>.log       records written while log n was current
+#                   p.<n>.snapshot  the map after every record of logs <= n
+#               Each record is op (u8), payload length (u32) and CRC-32 of
+#               both and the payload (u32), then the pickled key or
+#               (key, value) pair. Replay stops at the first torn or damaged
+#               record of a log.
+
+
+import os
+import pickle
+import re
+import struct
+import threading
+import zlib
+
+from a6_include import hash_function_1, hash_function_2
+import hash_map_sc
+
+
+# Record operations
+_PUT = 1
+_REMOVE = 2
+_CLEAR = 3
+
+_RECORD = struct.Struct('<BII')
+
+# Buffer of the open log file
+_BUFFER_SIZE = 1 << 16
+
+# Replayed puts and removes are applied in batches of at most this many
+_REPLAY_BATCH = 1 << 16
+
+
+def _record(op: int, payload: bytes = b'') -> bytes:
+    """Return the encoded log record for an operation."""
+    crc = zlib.crc32(payload, zlib.crc32(_RECORD.pack(op, len(payload), 0)))
+    return _RECORD.pack(op, len(payload), crc) + payload
+
+
+def _read_log(path: str):
+    """
+    Yields the (op, payload) records of a log file, stopping at the end of
+    the file or at the first record that is incomplete or damaged.
+    """
+    with open(path, 'rb') as file:
+        data = file.read()
+
+    position = 0
+    while position + _RECORD.size <= len(data):
+        op, length, crc = _RECORD.unpack_from(data, position)
+        start = position + _RECORD.size
+        payload = data[start:start + length]
+        if (len(payload) != length
+                or zlib.crc32(payload, zlib.crc32(_RECORD.pack(op, length, 0))) != crc):
+            return
+        yield op, payload
+        position = start + length
+
+
+class DurableHashMap:
+    """
+    HashMap whose changes survive a crash. Writes are applied to the map and
+    appended to the current log; the log is flushed and fsynced every
+    sync_every records, every sync_interval seconds by a background thread,
+    and on sync() and close(). A crash loses at most the records written
+    since the last sync.
+
+    Only the log is guarded against the background thread, so like the
+    HashMaps themselves the map should be used from one thread at a time.
+    """
+
+    def __init__(self,
+                 path: str,
+                 map_class: type = hash_map_sc.HashMap,
+                 capacity: int = 11,
+                 function: callable = hash_function_1,
+                 sync_every: int = 1000,
+                 sync_interval: float = 1.0) -> None:
+        """
+        Open the durable map stored at path, rebuilding it from the newest
+        snapshot and the logs after it, or start an empty one.
+
+        map_class is hash_map_sc.HashMap, hash_map_oa.HashMap or another map
+        with the same constructor, batch methods, save and load. Snapshots
+        need a hash function that save accepts; see hash_map_persist.
+
+        sync_every = 1 makes every write durable before it returns; None
+        leaves syncing to the background thread, which sync_interval = None
+        turns off.
+        """
+        self._path = path
+        self._function = function
+        self._sync_every = sync_every
+        self._lock = threading.Lock()
+        self._pending = 0
+
+        # Held for the whole of compact, which stops and restarts the syncer
+        self._compact_lock = threading.Lock()
+        self._compaction = None
+        self._compaction_error = None
+
+        self._hash_map, self._log_number = self._recover(map_class, capacity)
+        self._file = open(self._log_path(self._log_number), 'ab',
+                          buffering=_BUFFER_SIZE)
+
+        self._closed = threading.Event()
+        self._sync_interval = sync_interval
+        self._syncer = None
+        self._syncer_stop = None
+        self._start_syncer()
+
+    # ------------------------- Files ----------------------------------- #
+
+    def _log_path(self, number: int) -> str:
+        """Return the path of the numbered log."""
+        return f"{self._path}.{number}.log"
+
+    def _snapshot_path(self, number: int) -> str:
+        """Return the path of the snapshot covering logs up to number."""
+        return f"{self._path}.{number}.snapshot"
+
+    def _files(self) -> (list, list):
+        """
+        Returns the sorted numbers of the existing logs and snapshots.
+        """
+        directory, name = os.path.split(os.path.abspath(self._path))
+        pattern = re.compile(re.escape(name) + r'\.(\d+)\.(log|snapshot)$')
+        logs, snapshots = [], []
+        for file_name in os.listdir(directory):
+            match = pattern.match(file_name)
+            if match:
+                numbers = logs if match.group(2) == 'log' else snapshots
+                numbers.append(int(match.group(1)))
+        return sorted(logs), sorted(snapshots)
+
+    def _remove_covered(self, number: int) -> None:
+        """
+        Deletes the logs and older snapshots that the snapshot with the given
+        number makes unnecessary.
+        """
+        logs, snapshots = self._files()
+        for log in logs:
+            if log <= number:
+                os.remove(self._log_path(log))
+        for snapshot in snapshots:
+            if snapshot < number:
+                os.remove(self._snapshot_path(snapshot))
+
+    def _recover(self, map_class: type, capacity: int) -> tuple:
+        """
+        Returns the map rebuilt from the files on disk and the number of the
+        log new records go to.
+        """
+        logs, snapshots = self._files()
+        if snapshots:
+            covered = snapshots[-1]
+            hash_map = map_class.load(self._snapshot_path(covered), self._function)
+            self._remove_covered(covered)
+        else:
+            covered = -1
+            hash_map = map_class(capacity, self._function)
+
+        # A crash can leave a torn record at the end of a log, so new records
+        # always start a fresh log rather than following it
+        replayed = [log for log in logs if log > covered]
+        for log in replayed:
+            self._replay(hash_map, self._log_path(log))
+        return hash_map, max(replayed + [covered]) + 1
+
+    @staticmethod
+    def _replay(hash_map, path: str) -> None:
+        """
+        Applies the records of a log to the map. Runs of puts and runs of
+        removes are applied with put_many and remove_many.
+        """
+        batch_op, batch = None, []
+
+        def flush():
+            if batch_op == _PUT:
+                hash_map.put_many(batch)
+            elif batch_op == _REMOVE:
+                hash_map.remove_many(batch)
+            batch.clear()
+
+        for op, payload in _read_log(path):
+            if op != batch_op or len(batch) >= _REPLAY_BATCH:
+                flush()
+                batch_op = op
+            if op == _CLEAR:
+                hash_map.clear()
+            else:
+                batch.append(pickle.loads(payload))
+        flush()
+
+    # ------------------------- Logging --------------------------------- #
+
+    def _append(self, records: bytes, count: int = 1) -> None:
+        """
+        Appends encoded records to the log, syncing it once sync_every
+        records are waiting.
+        """
+        with self._lock:
+            self._file.write(records)
+            self._pending += count
+            if self._sync_every and self._pending >= self._sync_every:
+                self._sync_locked()
+
+    def _sync_locked(self) -> None:
+        """Flushes and fsyncs the log; the caller holds the lock."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+
+    def _sync_periodically(self, interval: float, stop: threading.Event) -> None:
+        """Syncs waiting records every interval seconds until stopped."""
+        while not stop.wait(interval):
+            with self._lock:
+                if self._pending and not self._file.closed:
+                    self._sync_locked()
+
+    def _start_syncer(self) -> None:
+        """Starts the background sync thread, unless it is turned off."""
+        if self._sync_interval is None or self._closed.is_set():
+            return
+        self._syncer_stop = threading.Event()
+        self._syncer = threading.Thread(target=self._sync_periodically,
+                                        args=(self._sync_interval,
+                                              self._syncer_stop),
+                                        daemon=True)
+        self._syncer.start()
+
+    def _stop_syncer(self) -> None:
+        """Stops the background sync thread and waits for it to exit."""
+        if self._syncer is not None:
+            self._syncer_stop.set()
+            self._syncer.join()
+            self._syncer = None
+
+    def sync(self) -> None:
+        """
+        Makes every write so far durable.
+
+        :return:    None
+        """
+        with self._lock:
+            self._sync_locked()
+
+    # ------------------------- Map API --------------------------------- #
+
+    def put(self, key: str, value: object) -> None:
+        """
+        Updates the key / value pair in the hash map and logs it. A pair the
+        map rejects, for example a key the hash function cannot hash, raises
+        without being logged, so that replaying the log cannot fail on it.
+
+        :param key:     key to be used in the key / value pair
+        :param value:   value to be used in the key / value pair
+
+        :return:        None
+        """
+        record = _record(_PUT, pickle.dumps((key, value), pickle.HIGHEST_PROTOCOL))
+        self._hash_map.put(key, value)
+        self._append(record)
+
+    def put_many(self, pairs) -> None:
+        """
+        Updates the hash map with every key / value pair of the given iterable
+        and logs them with a single write.
+
+        :param pairs:   iterable of key / value pairs
+
+        :return:        None
+        """
+        pairs = list(pairs)
+        records = b''.join(_record(_PUT, pickle.dumps(pair, pickle.HIGHEST_PROTOCOL))
+                           for pair in pairs)
+        self._hash_map.put_many(pairs)
+        self._append(records, len(pairs))
+
+    def remove(self, key: str) -> None:
+        """
+        Removes the given key and its associated value from the hash map and
+        logs the removal.
+
+        :param key: key of key / value pair to be removed from hash map
+
+        :return:    None
+        """
+        record = _record(_REMOVE, pickle.dumps(key, pickle.HIGHEST_PROTOCOL))
+        self._hash_map.remove(key)
+        self._append(record)
+
+    def remove_many(self, keys) -> None:
+        """
+        Removes each of the given keys from the hash map and logs them with a
+        single write.
+
+        :param keys:    iterable of keys to remove
+
+        :return:        None
+        """
+        keys = list(keys)
+        records = b''.join(_record(_REMOVE, pickle.dumps(key, pickle.HIGHEST_PROTOCOL))
+                           for key in keys)
+        self._hash_map.remove_many(keys)
+        self._append(records, len(keys))
+
+    def clear(self) -> None:
+        """
+        Clears the contents of the hash map and logs it.
+
+        :return:    None
+        """
+        self._hash_map.clear()
+        self._append(_record(_CLEAR))
+
+    def get(self, key: str) -> object:
+        """
+        Returns the value associated with the given key, or None.
+
+        :param key: key to search for in hash map
+
+        :return:    value associated with key or None if key not found
+        """
+        return self._hash_map.get(key)
+
+    def contains_key(self, key: str) -> bool:
+        """
+        Returns True if the given key is in the hash map, otherwise it returns False.
+
+        :param key: key to be searched for in hash map
+
+        :return:    True/False depending on if key is found
+        """
+        return self._hash_map.contains_key(key)
+
+    def get_size(self) -> int:
+        """
+        Return size of map
+        """
+        return self._hash_map.get_size()
+
+    def get_keys_and_values(self):
+        """
+        Returns a dynamic array of every key / value pair in the hash map.
+        """
+        return self._hash_map.get_keys_and_values()
+
+    def items(self):
+        """
+        Yields every (key, value) pair in the hash map.
+        """
+        return self._hash_map.items()
+
+    # ------------------------- Compaction ------------------------------ #
+
+    def compact(self, wait: bool = False) -> bool:
+        """
+        Writes a snapshot of the map and deletes the logs it covers. The
+        current log is closed and new records go to the next one, then a
+        forked child process saves its copy-on-write view of the map while
+        this process carries on. Where fork is not available the snapshot
+        is written before compact returns.
+
+        A crash during compaction at worst leaves logs that the new snapshot
+        already covers; replaying them again gives the same map, since only
+        the last put, remove or clear of each key counts.
+
+        The background sync thread is stopped while forking, since a child
+        forked from a multi-threaded process can deadlock on a lock another
+        thread held. Other threads of the program should not be using the
+        map, or anything the snapshot writer needs, at the time.
+
+        :param wait:    wait for the snapshot to be written
+
+        :return:        False if a compaction was already running
+        """
+        with self._compact_lock:
+            if self._compaction is not None and self._compaction.is_alive():
+                return False
+            self._raise_compaction_error()
+
+            self._stop_syncer()
+            try:
+                pid, covered = self._fork_snapshot()
+            finally:
+                self._start_syncer()
+            if pid is None:
+                return True
+
+            self._compaction = threading.Thread(target=self._finish_compaction,
+                                                args=(pid, covered), daemon=True)
+            self._compaction.start()
+        if wait:
+            self._compaction.join()
+            self._raise_compaction_error()
+        return True
+
+    def _fork_snapshot(self) -> (int, int):
+        """
+        Seals the current log and forks a child that saves the snapshot
+        covering it, or saves it directly where fork is not available.
+
+        :return:    the child's pid, or None if the snapshot is written, and
+                    the number of the sealed log
+        """
+        with self._lock:
+
+            # Seal the current log; the snapshot covers it and all before it
+            self._sync_locked()
+            self._file.close()
+            covered = self._log_number
+            self._log_number += 1
+            self._file = open(self._log_path(self._log_number), 'ab',
+                              buffering=_BUFFER_SIZE)
+
+            if not hasattr(os, 'fork'):
+                self._hash_map.save(self._snapshot_path(covered))
+                self._remove_covered(covered)
+                return None, covered
+
+            pid = os.fork()
+            if pid == 0:
+                # Child: write the snapshot from the map as it was and leave
+                # without running any of the parent's cleanup
+                status = 1
+                try:
+                    self._hash_map.save(self._snapshot_path(covered))
+                    status = 0
+                finally:
+                    os._exit(status)
+        return pid, covered
+
+    def _finish_compaction(self, pid: int, covered: int) -> None:
+        """
+        Waits for the snapshot child and deletes the covered files once it
+        has written the snapshot.
+        """
+        _, status = os.waitpid(pid, 0)
+        if os.waitstatus_to_exitcode(status) == 0:
+            self._remove_covered(covered)
+        else:
+            self._compaction_error = RuntimeError(
+                f"Writing snapshot {self._snapshot_path(covered)} failed")
+
+    def _raise_compaction_error(self) -> None:
+        """Raises the error of a failed background compaction once."""
+        error, self._compaction_error = self._compaction_error, None
+        if error is not None:
+            raise error
+
+    def close(self) -> None:
+        """
+        Syncs the log, waits for a running compaction and stops the
+        background thread. The map cannot be used afterwards.
+
+        :return:    None
+        """
+        self._closed.set()
+        with self._compact_lock:
+            self._stop_syncer()
+        if self._compaction is not None:
+            self._compaction.join()
+        with self._lock:
+            if not self._file.closed:
+                self._sync_locked()
+                self._file.close()
+
+    def __enter__(self) -> "DurableHashMap":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+# ------------------- BASIC TESTING ---------------------------------------- #
+
+if __name__ == "__main__":
+
+    import shutil
+    import tempfile
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'map')
+    try:
+        print("\nDurable put / remove and recovery")
+        print("---------------------------------")
+        with DurableHashMap(path, function=hash_function_2) as m:
+            for i in range(1000):
+                m.put('str' + str(i), i * 100)
+            m.remove_many('str' + str(i) for i in range(0, 1000, 2))
+            print(m.get_size(), m.get('str1'), m.get('str2'))
+
+        with DurableHashMap(path, function=hash_function_2) as m:
+            print(m.get_size(), m.get('str1'), m.get('str2'))
+
+            print("\nCompaction")
+            print("----------")
+            m.compact(wait=True)
+            m.put('str2', 'after compaction')
+            print(sorted(os.listdir(directory)))
+
+        with DurableHashMap(path, function=hash_function_2) as m:
+            print(m.get_size(), m.get('str1'), m.get('str2'))
+
+            print("\nRejected put")
+            print("------------")
+            try:
+                m.put(123, 'not a string key')
+            except TypeError as error:
+                print("TypeError:", error)
+
+        with DurableHashMap(path, function=hash_function_2) as m:
+            print(m.get_size(), m.get('str1'), m.get('str2'))
+    finally:
+        shutil.rmtree(directory)
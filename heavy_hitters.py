@@ -0,0 +1,299 @@
+# Course: CS261 - Data Structures
+# Assignment: 6
+# Description:  This program contains a streaming companion to find_mode that
+#               finds the most frequent values of a stream in bounded memory.
+#               It keeps a Space-Saving summary: a chaining HashMap of at most
+#               capacity monitored values with their counts, where a new value
+#               replaces the value with the lowest count and inherits that
+#               count as its possible overestimate. While no value has been
+#               replaced, every count is exact.
+
+
+import heapq
+import math
+
+from a6_include import DynamicArray
+import hash_map_sc
+
+
+class SpaceSaving:
+    """
+    Space-Saving summary of a stream of hashable values.
+
+    With capacity counters, every reported count is at most N / capacity
+    higher than the true count after N values, and every value that occurs
+    more than N / capacity times is monitored. Giving epsilon instead sizes
+    the summary for an error of at most epsilon * N. Without either, the
+    summary keeps every distinct value and all counts are exact, like
+    find_mode.
+    """
+
+    def __init__(self,
+                 capacity: int = None,
+                 epsilon: float = None,
+                 function: callable = 'builtin') -> None:
+        """
+        Initialize an empty summary that monitors at most capacity values,
+        or ceil(1 / epsilon) values when epsilon is given.
+        """
+        if epsilon is not None:
+            if not 0 < epsilon < 1:
+                raise ValueError("epsilon must be between 0 and 1")
+            capacity = math.ceil(1 / epsilon)
+        if capacity is not None and capacity < 1:
+            raise ValueError("A SpaceSaving summary needs at least one counter")
+
+        self._capacity = capacity
+
+        # Monitored value -> [count, overestimate]
+        self._counters = hash_map_sc.HashMap(
+            11 if capacity is None else max(11, capacity // 2), function)
+
+        # (count, order, value) for every monitored value. Counts that went
+        # up since the entry was pushed are only fixed when it reaches the top
+        self._heap = []
+        self._order = 0
+        self._total = 0
+        self._replacements = 0
+
+    def get_capacity(self) -> int:
+        """
+        Return the number of counters, or None if the summary is unbounded
+        """
+        return self._capacity
+
+    def get_size(self) -> int:
+        """
+        Return the number of monitored values
+        """
+        return self._counters.get_size()
+
+    def total(self) -> int:
+        """
+        Return the number of values counted so far
+        """
+        return self._total
+
+    def is_exact(self) -> bool:
+        """
+        Returns True while no monitored value has been replaced, in which case
+        every count is exact and every value seen is monitored.
+        """
+        return self._replacements == 0
+
+    def error_bound(self) -> int:
+        """
+        Returns the most any reported count can exceed the true count.
+        """
+        if self._replacements == 0:
+            return 0
+        return self._total // self._capacity
+
+    def add(self, value: object, count: int = 1) -> None:
+        """
+        Counts count more occurrences of the given value.
+
+        :param value:   value to be counted
+        :param count:   number of occurrences
+
+        :return:        None
+        """
+        self._total += count
+        counter = self._counters.get(value)
+        if counter is not None:
+            counter[0] += count
+            return
+
+        # Monitor the new value while there are free counters
+        if self._capacity is None or self._counters.get_size() < self._capacity:
+            self._counters.put(value, [count, 0])
+            if self._capacity is not None:
+                self._push(count, value)
+            return
+
+        # Replace the value with the lowest count, whose count the new value
+        # may have had before it was dropped
+        lowest = self._pop_lowest()
+        self._counters.remove(lowest[2])
+        self._counters.put(value, [lowest[0] + count, lowest[0]])
+        self._push(lowest[0] + count, value)
+        self._replacements += 1
+
+    def _drop(self, count: int) -> None:
+        """
+        Counts count occurrences of a value that is left unmonitored, as if
+        it had been replaced. Its count must not exceed the lowest monitored
+        count, so that it stays within the error bounds.
+        """
+        self._total += count
+        self._replacements += 1
+
+    def update(self, values) -> None:
+        """
+        Counts every value of the given iterable or dynamic array.
+
+        :param values:  iterable of values to be counted
+
+        :return:        None
+        """
+        if isinstance(values, DynamicArray):
+            values = values._data
+        add = self.add
+        for value in values:
+            add(value)
+
+    def _push(self, count: int, value: object) -> None:
+        """Adds a heap entry for a monitored value."""
+        heapq.heappush(self._heap, (count, self._order, value))
+        self._order += 1
+
+    def _pop_lowest(self) -> tuple:
+        """
+        Removes and returns the heap entry of the monitored value with the
+        lowest count, refreshing entries whose count has gone up on the way.
+        """
+        while True:
+            count, order, value = heapq.heappop(self._heap)
+            current = self._counters.get(value)[0]
+            if current == count:
+                return (count, order, value)
+            self._push(current, value)
+
+    def estimate(self, value: object) -> int:
+        """
+        Returns the reported count of the given value. Values that are not
+        monitored have occurred at most error_bound() times.
+
+        :param value:   value to look up
+
+        :return:        count of the value, 0 if it is not monitored
+        """
+        counter = self._counters.get(value)
+        return counter[0] if counter is not None else 0
+
+    def top(self, k: int) -> DynamicArray:
+        """
+        Returns a dynamic array of up to k (value, count) tuples for the
+        values with the highest counts, highest first.
+
+        :param k:   number of values to return
+
+        :return:    dynamic array of (value, count) tuples
+        """
+        if k < 1:
+            raise ValueError("k must be at least 1")
+        pairs = heapq.nlargest(k, ((value, counter[0])
+                                   for value, counter in self._counters.items()),
+                               key=lambda pair: pair[1])
+        return DynamicArray(pairs)
+
+    def guaranteed(self, k: int) -> DynamicArray:
+        """
+        Returns the (value, count) tuples of top(k) whose place in the top k
+        is certain: each value's count minus its overestimate is at least the
+        reported count of the (k + 1)-th value, and of any value that is not
+        monitored.
+
+        :param k:   number of values to consider
+
+        :return:    dynamic array of (value, count) tuples
+        """
+        pairs = self.top(k + 1)._data
+        if len(pairs) > k:
+            threshold = pairs[k][1]
+        elif self._replacements:
+            # Dropped values may have occurred as often as the lowest count
+            threshold = min(counter[0] for counter in self._counters.values())
+        else:
+            threshold = 0
+        result = DynamicArray()
+        for value, count in pairs[:k]:
+            if count - self._counters.get(value)[1] >= threshold:
+                result.append((value, count))
+        return result
+
+
+def find_top_k(values, k: int,
+               capacity: int = None,
+               epsilon: float = None,
+               exact_limit: int = None) -> (DynamicArray, bool):
+    """
+    Returns the k most frequent values of an iterable or dynamic array with
+    their frequencies, counting in bounded memory when capacity or epsilon
+    is given. See SpaceSaving for the error bounds.
+
+    When exact_limit is given, counts stay exact until more than exact_limit
+    distinct values have been seen, and only then is the summary cut down to
+    capacity counters, so small streams get exact answers.
+
+    :param values:      iterable of values to count
+    :param k:           number of values to return
+    :param capacity:    number of counters, by default 10 * k
+    :param epsilon:     maximum overestimate as a fraction of the stream
+    :param exact_limit: number of distinct values counted exactly
+
+    :return:    tuple containing a dynamic array of (value, frequency) tuples,
+                highest first, and True if the frequencies are exact
+    """
+    if capacity is None and epsilon is None:
+        capacity = 10 * k
+
+    if exact_limit is None:
+        summary = SpaceSaving(capacity, epsilon)
+        summary.update(values)
+        return (summary.top(k), summary.is_exact())
+
+    if isinstance(values, DynamicArray):
+        values = values._data
+    values = iter(values)
+
+    # Count exactly until the stream turns out to have too many values
+    counts = SpaceSaving()
+    for value in values:
+        counts.add(value)
+        if counts.get_size() > exact_limit:
+            break
+    else:
+        return (counts.top(k), True)
+
+    # Keep the largest exact counts as they are in a bounded summary and drop
+    # the rest, which folding them in one by one would let replace the
+    # largest ones and inherit their counts. Count the rest of the stream there
+    summary = SpaceSaving(capacity, epsilon)
+    pairs = counts.top(counts.get_size())._data
+    for value, count in pairs[:summary.get_capacity()]:
+        summary.add(value, count)
+    for _, count in pairs[summary.get_capacity():]:
+        summary._drop(count)
+    summary.update(values)
+    return (summary.top(k), summary.is_exact())
+
+
+# ------------------- BASIC TESTING ---------------------------------------- #
+
+if __name__ == "__main__":
+
+    print("\nfind_top_k example 1")
+    print("--------------------")
+    da = DynamicArray(["apple", "apple", "grape", "melon", "melon", "peach"])
+    top, exact = find_top_k(da, 2)
+    print(f"Input: {da}\nTop 2: {top}, Exact: {exact}")
+
+    print("\nfind_top_k example 2")
+    print("--------------------")
+    stream = (str(i % 7) if i % 3 else str(i) for i in range(30000))
+    top, exact = find_top_k(stream, 3, capacity=50)
+    print(f"Top 3: {top}, Exact: {exact}")
+
+    print("\nfind_top_k example 3")
+    print("--------------------")
+    stream = ['a'] * 100 + ['b'] * 90 + ['c'] * 80 + ['d'] * 5 + ['e']
+    top, exact = find_top_k(stream, 3, capacity=3, exact_limit=4)
+    print(f"Top 3: {top}, Exact: {exact}")
+
+    print("\nSpaceSaving example 1")
+    print("---------------------")
+    summary = SpaceSaving(epsilon=0.01)
+    summary.update(str(i % 5) if i % 2 else str(i) for i in range(10000))
+    print(summary.get_capacity(), summary.get_size(), summary.total(),
+          summary.error_bound(), summary.guaranteed(5))
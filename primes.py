@@ -0,0 +1,78 @@
+# Course: CS261 - Data Structures
+# Assignment: 6
+# Description:  This program contains the prime number helpers behind the
+#               HashMaps' _is_prime and _next_prime methods. Capacities below
+#               _TABLE_LIMIT are answered from a table of primes built once at
+#               import, larger ones are tested with a deterministic
+#               Miller-Rabin test instead of trial division.
+
+
+import bisect
+
+
+# Primes below this limit are precomputed
+_TABLE_LIMIT = 1 << 16
+
+# Miller-Rabin with these bases is exact for every n below 3.3 * 10**24
+_WITNESSES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37)
+
+
+def _sieve(limit: int) -> bytearray:
+    """Return a bytearray whose entry n is 1 exactly when n is prime."""
+    flags = bytearray([1]) * limit
+    flags[0] = flags[1] = 0
+    for n in range(2, int(limit ** 0.5) + 1):
+        if flags[n]:
+            flags[n * n::n] = bytes(len(range(n * n, limit, n)))
+    return flags
+
+
+_FLAGS = _sieve(_TABLE_LIMIT)
+PRIMES = [n for n in range(_TABLE_LIMIT) if _FLAGS[n]]
+
+
+def is_prime(n: int) -> bool:
+    """
+    Returns True if n is a prime number. Exact for every n below 3.3 * 10**24,
+    beyond which Miller-Rabin with fixed bases could in principle accept a
+    composite.
+    """
+    if n < _TABLE_LIMIT:
+        return n >= 2 and _FLAGS[n] == 1
+
+    for witness in _WITNESSES:
+        if n % witness == 0:
+            return False
+
+    # Write n - 1 as d * 2**s with d odd
+    d, s = n - 1, 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+
+    for witness in _WITNESSES:
+        x = pow(witness, d, n)
+        if x == 1 or x == n - 1:
+            continue
+        for _ in range(s - 1):
+            x = x * x % n
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
+
+
+def next_prime(n: int) -> int:
+    """
+    Returns the smallest odd prime that is at least n, the same search the
+    HashMaps have always used (so next_prime(2) is 3).
+    """
+    if n <= PRIMES[-1]:
+        return PRIMES[bisect.bisect_left(PRIMES, max(n, 3))]
+
+    if n % 2 == 0:
+        n += 1
+    while not is_prime(n):
+        n += 2
+    return n